@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Hashable, Optional
+
+from colorama import Fore, Style
+
+
+# Colore del tag in console, per livello o per tag esplicito (extra={"tag": ...}).
+LEVEL_COLORS = {
+    logging.DEBUG: Fore.LIGHTBLACK_EX,
+    logging.INFO: Fore.GREEN,
+    logging.WARNING: Fore.YELLOW,
+    logging.ERROR: Fore.RED,
+    logging.CRITICAL: Fore.RED,
+}
+TAG_COLORS = {
+    "OCR": Fore.GREEN,
+    "AZIONE": Fore.MAGENTA,
+    "STOP": Fore.RED,
+}
+
+# Attributi standard di LogRecord (e chiave di deduplica): tutto il resto e' un campo extra.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "dedup_key"}
+
+
+def _suppressed_suffix(record: logging.LogRecord) -> str:
+    suppressed = getattr(record, "suppressed", 0)
+    if not suppressed:
+        return ""
+    return f" (ripetuto altre {suppressed} volte negli ultimi {record.suppressed_seconds:.0f} s)"
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Riga colorata `HH:MM:SS [TAG] messaggio`, come le vecchie print."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        tag = getattr(record, "tag", None) or record.levelname
+        color = TAG_COLORS.get(tag, LEVEL_COLORS.get(record.levelno, ""))
+        clock = datetime.fromtimestamp(record.created).strftime("%H:%M:%S")
+        line = f"{Fore.LIGHTBLACK_EX}{clock}{Style.RESET_ALL} {color}[{tag}]{Style.RESET_ALL} {record.getMessage()}"
+        line += _suppressed_suffix(record)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Un oggetto JSON per riga, con i campi extra del record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Limita i record ripetuti: quelli con la stessa `dedup_key` (es. lo
+    stesso insieme di testi OCR) passano al massimo una volta ogni
+    `interval` secondi. Il primo record dopo la pausa riporta quante
+    ripetizioni sono state soppresse nel frattempo.
+    """
+
+    def __init__(self, interval: float = 5.0, max_keys: int = 1024, clock=time.monotonic):
+        super().__init__()
+        self.interval = max(float(interval), 0.0)
+        self.max_keys = max(int(max_keys), 1)
+        self.clock = clock
+        self.suppressed_total = 0
+        self._seen: Dict[Hashable, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "dedup_key", None)
+        if key is None or self.interval <= 0:
+            return True
+        now = self.clock()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                self.suppressed_total += 1
+                return False
+            if entry is not None and entry[1]:
+                record.suppressed = entry[1]
+                record.suppressed_seconds = now - entry[0]
+            if entry is None and len(self._seen) >= self.max_keys:
+                # Chiave piu' vecchia fuori: i dict mantengono l'ordine di inserimento.
+                self._seen.pop(next(iter(self._seen)))
+            self._seen.pop(key, None)
+            self._seen[key] = [now, 0]
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler che non formatta nel thread chiamante: il record va in
+    coda cosi' com'e' e messaggio e argomenti vengono uniti dal listener.
+    Con la coda piena il record viene scartato e contato, mai atteso.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogService:
+    """Handler in coda sul logger root e listener che scrive su console e file."""
+
+    def __init__(self, handler: NonBlockingQueueHandler, listener: QueueListener, repeat_filter: RepeatFilter):
+        self.handler = handler
+        self.listener = listener
+        self.repeat_filter = repeat_filter
+        self._stopped = False
+
+    def stop(self) -> None:
+        """Svuota la coda e ferma il thread di scrittura."""
+        if self._stopped:
+            return
+        self._stopped = True
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "suppressed": self.repeat_filter.suppressed_total,
+        }
+
+
+def configure_logging(cfg: Optional[Dict[str, Any]] = None) -> LogService:
+    """
+    Installa sul logger root un QueueHandler: chi logga accoda il record
+    in tempo costante, un thread in background lo formatta e lo scrive su
+    console (colorama) e su file JSON lines a rotazione.
+    """
+    cfg = cfg or {}
+    level = getattr(logging, str(cfg.get("level", "INFO")).upper(), logging.INFO)
+
+    handlers = []
+    if cfg.get("console", True):
+        console = logging.StreamHandler()
+        console.setFormatter(ConsoleFormatter())
+        handlers.append(console)
+    file_cfg = cfg.get("file", {})
+    if file_cfg.get("enabled", True):
+        path = str(file_cfg.get("path", "logs/tello.jsonl"))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            path,
+            maxBytes=int(file_cfg.get("max_bytes", 5 * 1024 * 1024)),
+            backupCount=int(file_cfg.get("backup_count", 5)),
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(file_handler)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max(int(cfg.get("queue_size", 10000)), 1))
+    handler = NonBlockingQueueHandler(log_queue)
+    repeat_filter = RepeatFilter(float(cfg.get("repeat_interval", 5.0)))
+    handler.addFilter(repeat_filter)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    # Una sola coda anche se il modulo viene configurato di nuovo.
+    for existing in list(root.handlers):
+        if isinstance(existing, NonBlockingQueueHandler):
+            root.removeHandler(existing)
+    root.addHandler(handler)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    service = LogService(handler, listener, repeat_filter)
+    atexit.register(service.stop)
+    return service
@@ -0,0 +1,235 @@
+"""
+Throughput dei comandi contro il Tello simulato.
+
+Avvia l'app Flask con `drone.backend: mock` (MockTello in-process) e
+invia migliaia di sequenze a POST /api/commands tramite il test client,
+come farebbe la chat. Ogni sequenza decolla, esegue movimenti, rotazioni
+e capriole casuali e atterra. Riporta:
+
+- comandi al secondo eseguiti dalla coda
+- latenza per comando (executor -> simulatore), p50/p95/p99/max
+- durata di ogni sequenza (inizio -> fine del job) e latenza dalla POST,
+  che include l'attesa in coda
+- tempo di risposta della POST (accodamento)
+- con --text, lo stesso per execute_command su frasi in linguaggio naturale
+
+Con --time-scale 0 il simulatore non attende: si misura solo il costo del
+codice del progetto (parsing, coda, executor, client).
+
+Uso:
+    python benchmarks/bench_commands.py --sequences 2000 --steps 8 --time-scale 0
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_loader import config  # noqa: E402
+
+
+STEP_ACTIONS = (
+    ("move_forward", (20, 200)),
+    ("move_backward", (20, 200)),
+    ("move_left", (20, 200)),
+    ("move_right", (20, 200)),
+    ("move_up", (20, 60)),
+    ("move_down", (20, 40)),
+    ("rotate_clockwise", (15, 180)),
+    ("rotate_counterclockwise", (15, 180)),
+    ("perform_flip", ("forward", "back", "left", "right")),
+)
+TEXT_COMMANDS = ("AVANTI 50", "RUOTA DESTRA 90", "SU 30", "GIU 20", "INDIETRO 40", "SINISTRA 30", "DESTRA 30")
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    data = sorted(values)
+
+    def at(fraction):
+        return data[min(int(len(data) * fraction), len(data) - 1)] * 1000.0
+
+    return {
+        "count": len(data),
+        "mean_ms": statistics.fmean(data) * 1000.0,
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": data[-1] * 1000.0,
+    }
+
+
+def make_sequence(rng, steps):
+    sequence = [{"action": "takeoff"}]
+    # Quota simulata dopo il decollo: le discese non devono scendere sotto i 20 cm.
+    height = 80
+    for _ in range(steps):
+        action, values = rng.choice(STEP_ACTIONS)
+        if isinstance(values[0], int):
+            argument = rng.randint(*values)
+        else:
+            argument = rng.choice(values)
+        if action == "move_down" and height - argument < 20:
+            action = "move_up"
+        height += argument if action == "move_up" else -argument if action == "move_down" else 0
+        sequence.append({"action": action, "argument": argument})
+    sequence.append({"action": "land"})
+    return sequence
+
+
+def configure_mock(args):
+    """Config del backend mock prima di importare server (che la legge all'import)."""
+    data = config.data
+    data["drone"] = dict(data.get("drone", {}), backend="mock")
+    data["drone"]["mock"] = dict(
+        data["drone"].get("mock", {}),
+        time_scale=args.time_scale,
+        latency=args.latency,
+        jitter=args.jitter,
+        drain_per_second=args.drain,
+        drain_per_command=0.0 if args.drain == 0 else 0.02,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        udp={"enabled": False},
+    )
+    # Nessun OCR: si misurano solo i comandi.
+    data["text_detection"] = dict(data.get("text_detection", {}), enabled=False)
+    data["commands"] = dict(data.get("commands", {}), optimize=args.optimize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequences", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=8, help="passi tra takeoff e land")
+    parser.add_argument("--time-scale", type=float, default=0.0, help="0 = nessuna attesa, 1 = tempi reali")
+    parser.add_argument("--latency", type=float, default=0.05, help="ack simulato per comando (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--drain", type=float, default=0.0, help="%% di batteria per secondo di volo simulato")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--optimize", action="store_true", help="compila le sequenze (commands.optimize)")
+    parser.add_argument("--text", type=int, default=0, help="chiamate a execute_command dopo le sequenze")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    configure_mock(args)
+    import server as app_module  # noqa: E402
+
+    client = app_module.app.test_client()
+    executor = app_module.get_action_executor()
+    simulator = app_module.tello_client.simulator
+
+    command_times = []
+    previous_hook = executor.command_hook
+
+    def command_hook(action, seconds):
+        command_times.append(seconds)
+        if previous_hook is not None:
+            previous_hook(action, seconds)
+
+    executor.command_hook = command_hook
+
+    submitted = {}
+    finished = {}
+    all_done = threading.Event()
+    lock = threading.Lock()
+
+    def on_job(job, step):
+        if step is None and job.finished:
+            service = (job.finished_at - job.started_at) if job.started_at else 0.0
+            with lock:
+                finished[job.id] = (time.perf_counter(), job.status, len(job.results), service)
+                if len(finished) >= args.sequences:
+                    all_done.set()
+
+    app_module.command_queue.add_listener(on_job)
+
+    rng = random.Random(args.seed)
+    sequences = [make_sequence(rng, args.steps) for _ in range(args.sequences)]
+    post_times = []
+
+    started = time.perf_counter()
+    for sequence in sequences:
+        sent = time.perf_counter()
+        response = client.post("/api/commands", json={"commands": sequence, "delay": 0})
+        post_times.append(time.perf_counter() - sent)
+        if response.status_code != 202:
+            raise RuntimeError(f"POST /api/commands -> {response.status_code}: {response.get_json()}")
+        submitted[response.get_json()["job_id"]] = sent
+    all_done.wait()
+    elapsed = time.perf_counter() - started
+
+    # Dalla POST alla fine del job: include l'attesa in coda dietro le sequenze precedenti.
+    sequence_times = [finished[job_id][0] - sent for job_id, sent in submitted.items() if job_id in finished]
+    service_times = [item[3] for item in finished.values()]
+    executed = sum(item[2] for item in finished.values())
+    failed = sum(1 for item in finished.values() if item[1] != "done")
+
+    text_report = None
+    if args.text:
+        text_times = []
+        for index in range(args.text):
+            if not simulator.flying:
+                executor.execute_action("takeoff")
+            sent = time.perf_counter()
+            executor.execute_command(TEXT_COMMANDS[index % len(TEXT_COMMANDS)])
+            text_times.append(time.perf_counter() - sent)
+        text_report = percentiles(text_times)
+        text_report["commands_per_second"] = len(text_times) / max(sum(text_times), 1e-9)
+
+    report = {
+        "sequences": args.sequences,
+        "steps_per_sequence": args.steps + 2,
+        "time_scale": args.time_scale,
+        "elapsed_s": elapsed,
+        "commands_executed": executed,
+        "commands_per_second": executed / max(elapsed, 1e-9),
+        "failed_sequences": failed,
+        "command_latency": percentiles(command_times),
+        "sequence_service": percentiles(service_times),
+        "sequence_latency": percentiles(sequence_times),
+        "post_latency": percentiles(post_times),
+        "execute_command": text_report,
+        "drone": simulator.snapshot(),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(
+        f"Sequenze: {report['sequences']} x {report['steps_per_sequence']} comandi "
+        f"(time_scale {args.time_scale}), {report['failed_sequences']} con errori"
+    )
+    print(f"Comandi eseguiti: {executed} in {elapsed:.2f} s -> {report['commands_per_second']:.0f} comandi/s")
+    rows = (
+        ("Comando", "command_latency"),
+        ("Sequenza", "sequence_service"),
+        ("Coda+seq", "sequence_latency"),
+        ("POST", "post_latency"),
+    )
+    for label, key in rows:
+        row = report[key]
+        print(
+            f"{label:<9} p50 {row['p50_ms']:.2f} ms, p95 {row['p95_ms']:.2f} ms, "
+            f"p99 {row['p99_ms']:.2f} ms, max {row['max_ms']:.2f} ms"
+        )
+    if text_report is not None:
+        print(
+            f"execute_command: {text_report['commands_per_second']:.0f} comandi/s, "
+            f"p99 {text_report['p99_ms']:.2f} ms"
+        )
+    print(f"Drone simulato: {report['drone']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Verifica della latenza dell'arresto di emergenza.
+
+Contro il Tello simulato di mock_tello (ogni comando di volo blocca per la
+latenza dell'ack, con jitter casuale, piu' il tempo di volo) accoda
+sequenze lunghe e invoca la corsia prioritaria in istanti casuali. Misura:
+
+- latenza di stop: da emergency_stop() alla ricezione di `emergency`
+  da parte del drone simulato
+- latenza di abort: da emergency_stop() alla chiusura del job in corso
+  (al massimo la durata del comando gia' in volo; il simulatore, come il
+  drone, lo interrompe con "error Motor stop")
+
+Esce con codice 1 se la latenza di stop peggiore supera --max-stop-ms.
+
+Uso:
+    python benchmarks/bench_emergency_stop.py --trials 50 --max-stop-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_queue import CommandQueue  # noqa: E402
+from execute import DroneActionExecutor  # noqa: E402
+from mock_tello import MockTello, TelloSimulator  # noqa: E402
+
+
+def make_tello(args, seed):
+    """Drone simulato gia' in volo, in tempo reale."""
+    simulator = TelloSimulator(
+        time_scale=1.0,
+        latency=args.min_latency,
+        jitter=args.max_latency - args.min_latency,
+        speed=args.speed,
+        airborne=True,
+        seed=seed,
+    )
+    return MockTello(simulator)
+
+
+def run_trial(rng, tello, args):
+    executor = DroneActionExecutor(tello)
+    queue = CommandQueue(lambda: executor)
+
+    steps = [{"action": "move_forward", "argument": args.distance} for _ in range(args.steps)]
+    running = queue.submit(steps, delay=args.delay)
+    for _ in range(args.queued):
+        queue.submit(steps, delay=args.delay)
+
+    # Stop in un istante casuale: durante un comando o durante la pausa.
+    time.sleep(rng.uniform(0.0, args.max_wait))
+    simulator = tello.simulator
+    started = time.perf_counter()
+    outcome = queue.emergency_stop(source="bench")
+    running.done_event.wait(timeout=30.0)
+    aborted = time.perf_counter()
+
+    if simulator.emergency_at is None or simulator.emergency_at < started:
+        raise RuntimeError("emergency non ricevuto dal drone simulato")
+    return {
+        "stop_ms": (simulator.emergency_at - started) * 1000.0,
+        "abort_ms": (aborted - started) * 1000.0,
+        "cancelled_jobs": len(outcome["cancelled_jobs"]),
+        "status": running.status,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--queued", type=int, default=3, help="sequenze in attesa dietro quella in corso")
+    parser.add_argument("--delay", type=float, default=0.8, help="delay_between della sequenza")
+    parser.add_argument("--min-latency", type=float, default=0.2, help="ack minimo di un comando simulato (s)")
+    parser.add_argument("--max-latency", type=float, default=1.5, help="ack massimo di un comando simulato (s)")
+    parser.add_argument("--distance", type=int, default=20, help="cm per passo (tempo di volo = distanza / velocita')")
+    parser.add_argument("--speed", type=float, default=100.0, help="velocita' simulata (cm/s)")
+    parser.add_argument("--max-wait", type=float, default=3.0, help="istante massimo dello stop dopo l'avvio (s)")
+    parser.add_argument("--max-stop-ms", type=float, default=20.0, help="soglia sulla latenza di stop peggiore")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Un drone nuovo per prova: dopo l'emergency quello precedente e' a terra.
+    trials = [run_trial(rng, make_tello(args, args.seed + index), args) for index in range(args.trials)]
+
+    stop = [trial["stop_ms"] for trial in trials]
+    abort = [trial["abort_ms"] for trial in trials]
+    report = {
+        "trials": len(trials),
+        "stop_ms": {"mean": statistics.fmean(stop), "max": max(stop)},
+        "abort_ms": {"mean": statistics.fmean(abort), "max": max(abort)},
+        "abort_bound_ms": (args.max_latency + args.distance / args.speed) * 1000.0,
+        "all_cancelled": all(trial["status"] == "cancelled" for trial in trials),
+        "max_stop_ms": args.max_stop_ms,
+        "passed": max(stop) <= args.max_stop_ms,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Prove: {report['trials']}")
+        print(f"Stop  (emergency ricevuto): medio {report['stop_ms']['mean']:.2f} ms, peggiore {report['stop_ms']['max']:.2f} ms")
+        print(
+            f"Abort (job chiuso):         medio {report['abort_ms']['mean']:.1f} ms, peggiore {report['abort_ms']['max']:.1f} ms"
+            f" (limite: comando in volo, {report['abort_bound_ms']:.0f} ms)"
+        )
+        print("OK" if report["passed"] else f"FALLITO: stop oltre {args.max_stop_ms} ms")
+
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark del riconoscimento dei comandi nel testo OCR.
+
+Genera un corpus di stringhe rumorose (scambi 0/O, 1/I, 5/S, 8/B,
+minuscole, accenti, parole di disturbo come SUD o SUPER, piu' comandi per
+stringa) e confronta la scansione lineare precedente con KeywordMatcher:
+
+- accuratezza sul primo comando (azione + argomento)
+- richiamo su tutti i comandi della stringa (solo KeywordMatcher)
+- tempo per stringa, anche con un vocabolario allargato (--extra-keywords)
+
+Uso:
+    python benchmarks/bench_keywords.py --strings 5000 --noise 0.15 --extra-keywords 0,200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execute import get_command_keywords  # noqa: E402
+from keyword_matcher import NUMERIC_ACTIONS, KeywordMatcher  # noqa: E402
+
+
+FILLERS = ["SUD", "SUPER", "CASUALE", "ZONA", "USCITA", "PIANO", "TEST", "ARENA", "DRONE"]
+NOISE = {"O": "0", "I": "1", "S": "5", "B": "8", "Z": "2", "A": "À", "U": "Ù"}
+
+
+def legacy_parse(text, keywords):
+    """Copia fedele della scansione precedente, usata come riferimento."""
+    if not text:
+        return None
+    text_upper = text.upper()
+    for keyword, action in keywords.items():
+        if keyword.upper() in text_upper:
+            argument = None
+            if action in NUMERIC_ACTIONS:
+                match = re.search(r"(\d+)", str(text))
+                argument = int(match.group(1)) if match else None
+            return action, argument
+    return None
+
+
+def add_noise(word, rng, probability):
+    chars = []
+    for char in word:
+        if char in NOISE and rng.random() < probability:
+            char = NOISE[char]
+        if rng.random() < probability / 2:
+            char = char.lower()
+        chars.append(char)
+    return "".join(chars)
+
+
+def make_corpus(count, probability, seed):
+    """Ritorna [(testo, [(azione, argomento), ...])]."""
+    rng = random.Random(seed)
+    keywords = list(get_command_keywords().items())
+    corpus = []
+    for _ in range(count):
+        words = []
+        expected = []
+        for _ in range(rng.choice((1, 1, 1, 2))):
+            if rng.random() < 0.5:
+                words.append(rng.choice(FILLERS))
+            keyword, action = rng.choice(keywords)
+            argument = rng.choice((20, 30, 45, 50, 90, 100, 180)) if action in NUMERIC_ACTIONS else None
+            words.append(add_noise(keyword, rng, probability))
+            if argument is not None:
+                # Anche le cifre subiscono scambi: 90 -> 9O, 100 -> 1OO.
+                digits = str(argument)
+                if rng.random() < probability:
+                    digits = digits.replace("0", "O")
+                words.append(digits + rng.choice(("", "", " CM")))
+            expected.append((action, argument))
+        if rng.random() < 0.3:
+            words.append(rng.choice(FILLERS))
+        corpus.append((" ".join(words), expected))
+    return corpus
+
+
+def extended_keywords(extra):
+    keywords = dict(get_command_keywords())
+    for index in range(extra):
+        keywords[f"COMANDO{index:04d}"] = "hover"
+    return keywords
+
+
+def timed(fn, corpus, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text, _ in corpus:
+            fn(text)
+        times.append((time.perf_counter() - started) / len(corpus) * 1e6)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strings", type=int, default=5000)
+    parser.add_argument("--noise", type=float, default=0.15, help="probabilita' di scambio per carattere")
+    parser.add_argument("--extra-keywords", default="0,200", help="keyword aggiuntivi per misurare la crescita")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.strings, args.noise, args.seed)
+    keywords = get_command_keywords()
+    matcher = KeywordMatcher(keywords)
+
+    legacy_first = sum(1 for text, expected in corpus if legacy_parse(text, keywords) == expected[0])
+    matcher_first = sum(1 for text, expected in corpus if matcher.match(text) == expected[0])
+    expected_total = sum(len(expected) for _, expected in corpus)
+    matcher_all = sum(
+        sum(1 for found, wanted in zip(matcher.find_all(text), expected) if found == wanted)
+        for text, expected in corpus
+    )
+
+    timing = []
+    for extra in (int(value) for value in args.extra_keywords.split(",") if value.strip()):
+        table = extended_keywords(extra)
+        compiled = KeywordMatcher(table)
+        timing.append(
+            {
+                "keywords": len(table),
+                "legacy_us": timed(lambda text, table=table: legacy_parse(text, table), corpus, args.repeat),
+                "matcher_us": timed(compiled.match, corpus, args.repeat),
+                "matcher_all_us": timed(compiled.find_all, corpus, args.repeat),
+            }
+        )
+
+    report = {
+        "strings": len(corpus),
+        "noise": args.noise,
+        "first_command_accuracy": {
+            "legacy": legacy_first / len(corpus),
+            "matcher": matcher_first / len(corpus),
+        },
+        "all_commands_recall": matcher_all / expected_total,
+        "timing": timing,
+        "example": corpus[: min(5, len(corpus))],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Stringhe: {report['strings']} (rumore {args.noise:.0%})")
+    print(
+        f"Primo comando corretto: scansione {report['first_command_accuracy']['legacy']:.1%}, "
+        f"matcher {report['first_command_accuracy']['matcher']:.1%}"
+    )
+    print(f"Tutti i comandi (matcher): {report['all_commands_recall']:.1%}")
+    for row in timing:
+        print(
+            f"{row['keywords']:5d} keyword: scansione {row['legacy_us']:.1f} us, "
+            f"matcher {row['matcher_us']:.1f} us (tutti {row['matcher_all_us']:.1f} us)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Benchmark end-to-end della pipeline video.
+
+Fa passare frame sintetici (o un video registrato) nella VideoPipeline reale
+(process_frame, OCR asincrono, cv2.imencode, hub MJPEG con un client) e
+riporta per ogni fase latenze p50/p95/p99, fps sostenuti e RSS di picco.
+Funziona headless su una macchina Linux solo CPU.
+
+Esegue tutte le combinazioni di risoluzione, contrasto, intervallo OCR e
+scala OCR indicate e scrive il risultato in JSON, confrontabile tra commit.
+
+Uso:
+    python benchmarks/bench_pipeline.py --duration 10 \\
+        --resolutions 640x360,960x720 --contrast on,off \\
+        --ocr-intervals 0.5,1.0 --ocr-scales 0.5,1.0 --output bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_loader import DEFAULT_CONFIG, _deep_merge  # noqa: E402
+from frame_source import SyntheticFrameSource, VideoFileSource  # noqa: E402
+from image_processor import ImageProcessor  # noqa: E402
+from ocr_worker import EASY_OCR_AVAILABLE  # noqa: E402
+from stream_hub import BroadcastHub  # noqa: E402
+from video_pipeline import VideoPipeline  # noqa: E402
+
+
+class TimedHub(BroadcastHub):
+    """Hub che ricorda l'istante di pubblicazione di ogni elemento."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.published_at = {}
+
+    def publish(self, item):
+        self.published_at[id(item)] = time.perf_counter()
+        if len(self.published_at) > 256:
+            self.published_at.pop(next(iter(self.published_at)))
+        return super().publish(item)
+
+
+class StageRecorder:
+    """Raccoglie le durate (secondi) per fase, thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def __call__(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+    def record_ocr(self, result):
+        self("ocr", result.duration)
+        self("ocr_age", result.completed_at - result.frame_timestamp)
+
+    def summary(self):
+        report = {}
+        with self._lock:
+            items = {stage: list(values) for stage, values in self.samples.items()}
+        for stage, values in items.items():
+            data = np.asarray(values) * 1000.0
+            report[stage] = {
+                "count": int(data.size),
+                "p50_ms": float(np.percentile(data, 50)),
+                "p95_ms": float(np.percentile(data, 95)),
+                "p99_ms": float(np.percentile(data, 99)),
+                "max_ms": float(data.max()),
+            }
+        return report
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as handle:
+            pages = int(handle.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb():
+    # ru_maxrss e' in KB su Linux, in byte su macOS.
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return value / (1024 * 1024) if platform.system() == "Darwin" else value / 1024
+
+
+def git_revision():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=root, text=True).strip()
+    except Exception:
+        return None
+
+
+def build_source(args, width, height):
+    if args.source == "file":
+        return VideoFileSource(args.file, realtime=not args.fast, loop=True)
+    return SyntheticFrameSource(width=width, height=height, fps=args.source_fps)
+
+
+def run_case(args, width, height, contrast, ocr_interval, ocr_scale):
+    cfg = _deep_merge(
+        DEFAULT_CONFIG,
+        {
+            "processing": {"enable_contrast": contrast},
+            "text_detection": {
+                "enabled": args.ocr,
+                "gpu": False,
+                "interval": ocr_interval,
+                "ocr_scale": ocr_scale,
+                "change_threshold": args.change_threshold,
+            },
+        },
+    )
+    processor = ImageProcessor(cfg)
+    recorder = StageRecorder()
+    if processor.ocr_worker is not None:
+        processor.ocr_worker.add_listener(recorder.record_ocr)
+        # Il caricamento del modello e il warm-up restano fuori dalla misura.
+        processor.ocr_worker.start()
+        while processor.ocr_worker.status in ("loading", "warming_up"):
+            time.sleep(0.1)
+
+    source = build_source(args, width, height)
+    hub = TimedHub(maxlen=2)
+    pipeline = VideoPipeline(processor, source.start, (width, height), args.target_fps, hub=hub)
+    pipeline.stage_hook = recorder
+
+    delivered = 0
+    rss_samples = []
+    stop = threading.Event()
+
+    def viewer():
+        # Stesso percorso di generate_mjpeg(): sottoscrizione + lettura.
+        nonlocal delivered
+        with hub.subscribe() as subscription:
+            while not stop.is_set():
+                chunk = subscription.get(timeout=0.5)
+                if chunk is None:
+                    continue
+                published = hub.published_at.get(id(chunk))
+                if published is not None:
+                    recorder("mjpeg_deliver", time.perf_counter() - published)
+                delivered += 1
+
+    viewer_thread = threading.Thread(target=viewer, daemon=True)
+    viewer_thread.start()
+    pipeline.start()
+
+    # Warm-up escluso dalle misure.
+    time.sleep(args.warmup)
+    recorder.reset()
+    delivered = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        rss = current_rss_mb()
+        if rss is not None:
+            rss_samples.append(rss)
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - started
+    frames = recorder.summary().get("process", {}).get("count", 0)
+
+    stop.set()
+    pipeline.stop()
+    source.stop()
+    viewer_thread.join(timeout=2.0)
+    if processor.ocr_worker is not None:
+        processor.ocr_worker.stop()
+
+    return {
+        "params": {
+            "width": width,
+            "height": height,
+            "contrast": contrast,
+            "ocr": args.ocr,
+            "ocr_interval": ocr_interval,
+            "ocr_scale": ocr_scale,
+        },
+        "duration_s": elapsed,
+        "frames_processed": frames,
+        "frames_delivered": delivered,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "skipped_frames": pipeline.skipped_frames,
+        "rss_max_mb": max(rss_samples) if rss_samples else None,
+        "rss_peak_mb": peak_rss_mb(),
+        "stages": recorder.summary(),
+    }
+
+
+def parse_list(value, cast):
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def parse_switch(value):
+    return value.lower() in ("1", "on", "true", "yes", "si")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("synthetic", "file"), default="synthetic")
+    parser.add_argument("--file", default="", help="video registrato per --source file")
+    parser.add_argument("--fast", action="store_true", help="file: ignora i timestamp originali")
+    parser.add_argument("--source-fps", type=float, default=30.0)
+    parser.add_argument("--target-fps", type=float, default=30.0)
+    parser.add_argument("--duration", type=float, default=10.0, help="secondi misurati per combinazione")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--resolutions", default="960x720")
+    parser.add_argument("--contrast", default="on,off")
+    parser.add_argument("--ocr", action="store_true", help="abilita easyocr (CPU)")
+    parser.add_argument("--ocr-intervals", default="1.0")
+    parser.add_argument("--ocr-scales", default="1.0")
+    parser.add_argument("--change-threshold", type=float, default=0.0)
+    parser.add_argument("--output", default="", help="file JSON di output (default: stdout)")
+    args = parser.parse_args()
+
+    if args.ocr and not EASY_OCR_AVAILABLE:
+        parser.error("easyocr non installato: rimuovere --ocr")
+    if args.source == "file" and not args.file:
+        parser.error("--source file richiede --file")
+
+    resolutions = parse_list(args.resolutions, parse_resolution)
+    contrasts = parse_list(args.contrast, parse_switch)
+    intervals = parse_list(args.ocr_intervals, float) if args.ocr else [0.0]
+    scales = parse_list(args.ocr_scales, float) if args.ocr else [1.0]
+
+    runs = []
+    for (width, height), contrast, interval, scale in itertools.product(resolutions, contrasts, intervals, scales):
+        print(
+            f"[bench] {width}x{height} contrast={'on' if contrast else 'off'} "
+            f"ocr={'on' if args.ocr else 'off'} interval={interval} scale={scale}",
+            file=sys.stderr,
+        )
+        run = run_case(args, width, height, contrast, interval, scale)
+        print(f"        {run['fps']:.1f} fps, rss max {run['rss_max_mb']} MB", file=sys.stderr)
+        runs.append(run)
+
+    report = {
+        "revision": git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "source": args.source,
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
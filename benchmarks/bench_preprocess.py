@@ -0,0 +1,130 @@
+"""
+Micro-benchmark del preprocessing di ImageProcessor.
+
+Confronta il percorso originale (resize + copy + cvtColor + copy +
+convertScaleAbs) con il percorso a buffer preallocati e LUT, misurando
+tempo per frame e memoria allocata per frame (picco tracemalloc).
+I due percorsi non sono identici bit a bit: la LUT arrotonda diversamente
+da convertScaleAbs e alcuni pixel differiscono di un livello; il report
+riporta la differenza massima e la quota di pixel diversi.
+
+Uso:
+    python benchmarks/bench_preprocess.py --frames 300 --width 960 --height 720
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_loader import DEFAULT_CONFIG, _deep_merge  # noqa: E402
+from image_processor import ImageProcessor  # noqa: E402
+
+
+def legacy_preprocess(frame, size, alpha, beta):
+    """Copia fedele del percorso precedente, usata come riferimento."""
+    working = cv2.resize(frame, size)
+    processed = cv2.cvtColor(working.copy(), cv2.COLOR_BGR2RGB)
+    ocr_frame = processed.copy()
+    processed = cv2.convertScaleAbs(processed, alpha=alpha, beta=beta)
+    return processed, ocr_frame
+
+
+def measure(fn, frames):
+    """Ritorna tempi (ms) e picco di memoria allocata (byte) per ogni frame."""
+    # Warm-up: alloca i buffer del percorso preallocato.
+    fn(frames[0])
+
+    times = []
+    peaks = []
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        fn(frame)
+        times.append((time.perf_counter() - started) * 1000.0)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+    return times, peaks
+
+
+def summarize(times, peaks, frame_bytes):
+    return {
+        "ms_mean": statistics.fmean(times),
+        "ms_p95": sorted(times)[int(len(times) * 0.95) - 1],
+        "alloc_bytes_per_frame": statistics.fmean(peaks),
+        "alloc_frames_per_frame": statistics.fmean(peaks) / frame_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--source-width", type=int, default=960)
+    parser.add_argument("--source-height", type=int, default=720)
+    parser.add_argument("--json", action="store_true", help="stampa il risultato in JSON")
+    args = parser.parse_args()
+
+    size = (args.width, args.height)
+    rng = np.random.default_rng(0)
+    frames = [
+        rng.integers(0, 256, (args.source_height, args.source_width, 3), dtype=np.uint8)
+        for _ in range(8)
+    ]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+
+    cfg = _deep_merge(DEFAULT_CONFIG, {"text_detection": {"enabled": False}, "processing": {"enable_contrast": True}})
+    processor = ImageProcessor(cfg)
+    alpha, beta = processor.contrast_alpha, processor.contrast_beta
+    frame_bytes = args.width * args.height * 3
+
+    legacy = summarize(*measure(lambda f: legacy_preprocess(f, size, alpha, beta), frames), frame_bytes)
+    pooled = summarize(*measure(lambda f: processor.process_frame(f, size=size), frames), frame_bytes)
+
+    # Stesso frame nei due percorsi: differenze dovute solo all'arrotondamento della LUT.
+    legacy_frame, _ = legacy_preprocess(frames[0], size, alpha, beta)
+    pooled_frame = processor.process_frame(frames[0], size=size).frame
+    difference = np.abs(legacy_frame.astype(np.int16) - pooled_frame.astype(np.int16))
+
+    report = {
+        "frames": args.frames,
+        "source": [args.source_width, args.source_height],
+        "size": list(size),
+        "legacy": legacy,
+        "pooled": pooled,
+        "max_level_diff": int(difference.max()),
+        "differing_pixels": float(np.count_nonzero(difference)) / difference.size,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Preprocessing {args.source_width}x{args.source_height} -> {args.width}x{args.height}, {args.frames} frame")
+    print(f"{'percorso':<10} {'ms medio':>10} {'ms p95':>10} {'byte/frame':>14} {'frame/frame':>12}")
+    for name, row in (("legacy", legacy), ("pooled", pooled)):
+        print(
+            f"{name:<10} {row['ms_mean']:>10.3f} {row['ms_p95']:>10.3f} "
+            f"{row['alloc_bytes_per_frame']:>14.0f} {row['alloc_frames_per_frame']:>12.2f}"
+        )
+    print(
+        f"Output non identico bit a bit: differenza massima {report['max_level_diff']} livelli "
+        f"su {report['differing_pixels']:.2%} dei valori"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+Detection = Tuple[Any, str, float]
+
+
+class BoxTracker:
+    """
+    Sposta i box dell'ultimo OCR tra un'inferenza e la successiva.
+    Per ogni box si scelgono pochi punti caratteristici al suo interno e li
+    si segue con optical flow Lucas-Kanade su un'immagine in scala di
+    grigi ridotta; il box trasla della mediana degli spostamenti.
+    Il risultato OCR arriva in ritardo rispetto al suo frame: uno storico
+    breve di frame permette di riportare i box dal frame analizzato a
+    quello corrente prima di seguirli.
+    """
+
+    def __init__(
+        self,
+        scale: float = 0.5,
+        history: int = 30,
+        points_per_box: int = 8,
+        win_size: int = 15,
+        max_level: int = 2,
+        min_points: int = 2,
+    ):
+        self.scale = min(max(float(scale), 0.1), 1.0)
+        self.points_per_box = max(int(points_per_box), 1)
+        self.min_points = max(int(min_points), 1)
+        self.lk_params = {
+            "winSize": (int(win_size), int(win_size)),
+            "maxLevel": int(max_level),
+            "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        }
+
+        self.source_timestamp: Optional[float] = None
+        self.tracked_frames = 0
+        self.lost_boxes = 0
+
+        self._history: Deque[Tuple[float, np.ndarray]] = deque(maxlen=max(int(history), 2))
+        self._detections: List[Detection] = []
+        # Per ogni box: angoli (4x2) e punti seguiti (Nx1x2), in coordinate ridotte.
+        self._corners: List[np.ndarray] = []
+        self._points: List[np.ndarray] = []
+
+    def update(self, frame: np.ndarray, timestamp: float) -> None:
+        """Aggiunge il frame corrente allo storico e sposta i box correnti."""
+        gray = self._gray(frame)
+        previous = self._history[-1][1] if self._history else None
+        if previous is not None and previous.shape != gray.shape:
+            # Risoluzione cambiata: storico e punti non sono piu' confrontabili.
+            self._history.clear()
+            self._points = []
+            previous = None
+        self._history.append((timestamp, gray))
+        if previous is not None and self._points:
+            self._track(previous, gray)
+            self.tracked_frames += 1
+
+    def reset(self, detections: Sequence[Detection], frame_timestamp: Optional[float]) -> None:
+        """
+        Nuovo risultato OCR sul frame `frame_timestamp`: i box vengono
+        agganciati a quel frame dello storico e riportati al frame corrente.
+        """
+        self.source_timestamp = frame_timestamp
+        self._detections = []
+        self._corners = []
+        self._points = []
+
+        reference = None
+        for timestamp, gray in self._history:
+            if timestamp == frame_timestamp:
+                reference = gray
+                break
+        # Frame non piu' nello storico: si parte dal frame corrente.
+        current = self._history[-1][1] if self._history else None
+        anchor = reference if reference is not None else current
+
+        for bbox, text, conf in detections:
+            corners = np.array(bbox, dtype=np.float32).reshape(-1, 2) * self.scale
+            if corners.shape[0] != 4:
+                continue
+            self._detections.append((bbox, text, conf))
+            self._corners.append(corners)
+            self._points.append(self._features(anchor, corners))
+
+        if reference is not None and reference is not current and self._points:
+            self._track(reference, current)
+
+    @property
+    def detections(self) -> List[Detection]:
+        """Detection dell'ultimo OCR con i box nella posizione attuale."""
+        tracked = []
+        for (_, text, conf), corners in zip(self._detections, self._corners):
+            bbox = np.rint(corners / self.scale).astype(np.int32).tolist()
+            tracked.append((bbox, text, conf))
+        return tracked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "boxes": len(self._detections),
+            "tracked_frames": self.tracked_frames,
+            "lost_boxes": self.lost_boxes,
+            "history": len(self._history),
+        }
+
+    def _gray(self, frame: np.ndarray) -> np.ndarray:
+        if self.scale < 1.0:
+            size = (max(int(frame.shape[1] * self.scale), 1), max(int(frame.shape[0] * self.scale), 1))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+        if frame.ndim == 3:
+            return cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        return frame
+
+    def _features(self, gray: Optional[np.ndarray], corners: np.ndarray) -> np.ndarray:
+        """Punti caratteristici dentro il box; in mancanza, angoli e centro."""
+        x, y, w, h = cv2.boundingRect(corners.astype(np.int32))
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = (min(x + w, gray.shape[1]), min(y + h, gray.shape[0])) if gray is not None else (x0, y0)
+        if x1 - x0 >= 3 and y1 - y0 >= 3:
+            features = cv2.goodFeaturesToTrack(
+                gray[y0:y1, x0:x1],
+                maxCorners=self.points_per_box,
+                qualityLevel=0.01,
+                minDistance=2,
+            )
+            if features is not None and len(features) >= self.min_points:
+                return (features + np.array([x0, y0], dtype=np.float32)).astype(np.float32)
+        fallback = np.vstack([corners, corners.mean(axis=0, keepdims=True)])
+        return fallback.reshape(-1, 1, 2).astype(np.float32)
+
+    def _track(self, previous: np.ndarray, current: np.ndarray) -> None:
+        # Un'unica chiamata LK per tutti i punti di tutti i box.
+        counts = [len(points) for points in self._points]
+        stacked = np.concatenate(self._points, axis=0)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(previous, current, stacked, None, **self.lk_params)
+        if moved is None:
+            return
+        status = status.reshape(-1).astype(bool)
+
+        start = 0
+        for index, count in enumerate(counts):
+            end = start + count
+            good = status[start:end]
+            if int(good.sum()) >= self.min_points:
+                shift = np.median((moved[start:end] - stacked[start:end])[good].reshape(-1, 2), axis=0)
+                self._corners[index] = self._corners[index] + shift
+                # Si continua solo con i punti ancora agganciati.
+                self._points[index] = moved[start:end][good]
+            else:
+                # Box perso: resta fermo fino al prossimo OCR.
+                self.lost_boxes += 1
+            start = end
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+@dataclass
+class CommandJob:
+    """Sequenza di comandi in coda, con stato e risultati per passo."""
+
+    id: str
+    commands: List[Any]
+    delay: float = 0.8
+    source: str = "api"
+    optimize: Optional[bool] = None
+    status: str = "queued"
+    success: Optional[bool] = None
+    message: str = "In coda"
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    plan: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    done_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINAL_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "source": self.source,
+            "status": self.status,
+            "success": self.success,
+            "message": self.message,
+            "commands": list(self.commands),
+            "results": list(self.results),
+            "plan": self.plan,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class CommandQueue:
+    """
+    Coda ordinata di sequenze di comandi, eseguite una alla volta da un
+    unico thread. Le richieste della chat e quelle generate dall'OCR passano
+    tutte da qui, quindi i comandi non si intrecciano sullo stesso client Tello.
+    """
+
+    def __init__(
+        self,
+        executor_factory: Callable[[], Any],
+        max_history: int = 200,
+        emergency_executor: Optional[Callable[[], Any]] = None,
+    ):
+        self.executor_factory = executor_factory
+        # Per l'arresto di emergenza serve l'executor gia' connesso, senza attese.
+        self.emergency_executor = emergency_executor or executor_factory
+        self.max_history = max(int(max_history), 1)
+        self.listeners: List[Callable[[CommandJob, Optional[Dict[str, Any]]], None]] = []
+
+        self._queue: "queue.Queue[CommandJob]" = queue.Queue()
+        self._jobs: "OrderedDict[str, CommandJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, callback: Callable[[CommandJob, Optional[Dict[str, Any]]], None]) -> None:
+        """Callback (job, passo) a ogni cambio di stato o passo completato."""
+        self.listeners.append(callback)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="command-queue", daemon=True)
+            self._thread.start()
+
+    def submit(
+        self,
+        commands: List[Any],
+        delay: float = 0.8,
+        source: str = "api",
+        optimize: Optional[bool] = None,
+    ) -> CommandJob:
+        """Accoda una sequenza e ritorna subito il job (optimize None = default dell'executor)."""
+        self.start()
+        job = CommandJob(
+            id=uuid.uuid4().hex[:12],
+            commands=list(commands),
+            delay=float(delay or 0),
+            source=source,
+            optimize=optimize,
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+        self._queue.put(job)
+        self._notify(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[CommandJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[CommandJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def cancel(self, job_id: str) -> bool:
+        """Annulla un job in coda o interrompe quello in esecuzione dopo il passo corrente."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        if job.status == "queued":
+            self._finish(job, "cancelled", False, "Sequenza annullata")
+        return True
+
+    def emergency_stop(self, source: str = "api") -> Dict[str, Any]:
+        """
+        Corsia prioritaria: invia subito `emergency` al drone dal thread
+        chiamante, senza passare dalla coda, poi annulla il job in corso e
+        tutti quelli in attesa.
+        """
+        started = time.perf_counter()
+        success = False
+        message = "Arresto di emergenza inviato"
+        try:
+            executor = self.emergency_executor()
+            if executor is None:
+                message = "Executor non disponibile"
+            else:
+                success = bool(executor.emergency_stop())
+                if not success:
+                    message = "Arresto di emergenza fallito"
+        except Exception as e:
+            message = f"Errore arresto di emergenza: {e}"
+        latency = time.perf_counter() - started
+
+        cancelled = []
+        for job in self.jobs():
+            if job.finished:
+                continue
+            job.cancel_event.set()
+            cancelled.append(job.id)
+            if job.status == "queued":
+                self._finish(job, "cancelled", False, "Annullato da arresto di emergenza")
+
+        return {
+            "success": success,
+            "message": message,
+            "source": source,
+            "latency_ms": latency * 1000.0,
+            "cancelled_jobs": cancelled,
+        }
+
+    def _trim_history(self) -> None:
+        # Si scartano solo job gia' conclusi, dal piu' vecchio.
+        excess = len(self._jobs) - self.max_history
+        for job_id in list(self._jobs.keys()):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _notify(self, job: CommandJob, step: Optional[Dict[str, Any]] = None) -> None:
+        for callback in self.listeners:
+            try:
+                callback(job, step)
+            except Exception:
+                continue
+
+    def _finish(self, job: CommandJob, status: str, success: bool, message: str) -> None:
+        job.status = status
+        job.success = success
+        job.message = message
+        job.finished_at = time.time()
+        job.done_event.set()
+        self._notify(job)
+
+    def _on_step(self, job: CommandJob, item: Dict[str, Any]) -> None:
+        job.results.append(item)
+        self._notify(job, item)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job.finished or job.cancel_event.is_set():
+                if not job.finished:
+                    self._finish(job, "cancelled", False, "Sequenza annullata")
+                continue
+
+            job.status = "running"
+            job.message = "In esecuzione"
+            job.started_at = time.time()
+            self._notify(job)
+
+            try:
+                executor = self.executor_factory()
+                if executor is None:
+                    raise RuntimeError("Executor non disponibile")
+                result = executor.execute_sequence(
+                    job.commands,
+                    delay_between=job.delay,
+                    on_step=lambda item, job=job: self._on_step(job, item),
+                    cancel_event=job.cancel_event,
+                    optimize=job.optimize,
+                )
+            except Exception as e:
+                self._finish(job, "failed", False, f"Errore durante l'esecuzione: {e}")
+                continue
+
+            job.plan = result.get("plan")
+            if result.get("cancelled"):
+                status = "cancelled"
+            else:
+                status = "done" if result.get("success") else "failed"
+            self._finish(job, status, bool(result.get("success")), result.get("message", ""))
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from collections import deque
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, Optional, Tuple
+
+
+Command = Tuple[str, Any]
+
+
+class CommandTrigger:
+    """
+    Filtro a consenso temporale tra OCR e coda comandi.
+    Ogni risultato OCR nuovo (non ogni frame renderizzato) vota per il
+    comando riconosciuto, o per nessuno; il comando scatta solo se compare
+    in almeno `required` degli ultimi `window` risultati, poi resta
+    silenziato per `cooldown` secondi. Le azioni in `immediate` (es. stop)
+    scattano al primo voto.
+    """
+
+    def __init__(
+        self,
+        parse: Callable[[str], Optional[Command]],
+        fire: Callable[[str, Any], None],
+        window: int = 3,
+        required: int = 2,
+        cooldown: float = 3.0,
+        threshold: float = 0.0,
+        immediate: Iterable[str] = ("emergency_stop",),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.parse = parse
+        self.fire = fire
+        self.window = max(int(window), 1)
+        self.required = min(max(int(required), 1), self.window)
+        self.cooldown = max(float(cooldown), 0.0)
+        self.threshold = float(threshold)
+        self.immediate = set(immediate)
+        self.clock = clock
+
+        # Contatori: risultati osservati, comandi scattati, soppressi dal cooldown.
+        self.observed = 0
+        self.fired = 0
+        self.suppressed = 0
+        self.last_fired: Optional[Dict[str, Any]] = None
+
+        self._votes: Deque[Optional[Hashable]] = deque(maxlen=self.window)
+        self._cooldowns: Dict[str, float] = {}
+        self._last_timestamp: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe_text(self, text: str, timestamp: Optional[float] = None) -> Optional[Command]:
+        """
+        Registra il testo di un risultato OCR e ritorna il comando se scatta.
+        Risultati con timestamp gia' visto (cache riusata) vengono ignorati.
+        """
+        parsed = self.parse(text) if text else None
+        key = self._key(parsed)
+
+        with self._lock:
+            if timestamp is not None:
+                if self._last_timestamp is not None and timestamp <= self._last_timestamp:
+                    return None
+                self._last_timestamp = timestamp
+
+            self.observed += 1
+            self._votes.append(key)
+            if parsed is None:
+                return None
+
+            action = parsed[0]
+            votes = sum(1 for vote in self._votes if vote == key)
+            if action not in self.immediate and votes < self.required:
+                return None
+
+            now = self.clock()
+            if now < self._cooldowns.get(action, 0.0):
+                self.suppressed += 1
+                return None
+
+            self._cooldowns[action] = now + self.cooldown
+            # Il consenso si ricostruisce da zero dopo ogni scatto.
+            self._votes.clear()
+            self.fired += 1
+            self.last_fired = {"action": action, "argument": parsed[1], "timestamp": timestamp}
+
+        self.fire(action, parsed[1])
+        return parsed
+
+    def observe_detections(self, detections: Iterable[Any], timestamp: Optional[float] = None) -> Optional[Command]:
+        """Accetta le tuple (bbox, testo, confidenza) di easyocr."""
+        texts = [str(text) for _, text, conf in detections if conf >= self.threshold]
+        return self.observe_text(" ".join(texts), timestamp)
+
+    def on_ocr_result(self, result: Any) -> None:
+        """Firma compatibile con i listener di OcrWorker."""
+        self.observe_detections(result.detections, result.frame_timestamp)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._votes.clear()
+            self._cooldowns.clear()
+            self._last_timestamp = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window": self.window,
+                "required": self.required,
+                "cooldown": self.cooldown,
+                "observed": self.observed,
+                "fired": self.fired,
+                "suppressed": self.suppressed,
+                "last_fired": self.last_fired,
+            }
+
+    @staticmethod
+    def _key(parsed: Optional[Command]) -> Optional[Hashable]:
+        if parsed is None:
+            return None
+        action, argument = parsed
+        try:
+            hash(argument)
+        except TypeError:
+            argument = repr(argument)
+        return (action, argument)
@@ -65,6 +65,43 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "width": 640,
         "height": 360,
         "target_fps": 30.0,
+        "client_queue_size": 2,
+        "stall_timeout": 5.0,
+        "tiers": [
+            {"name": "high", "quality": 85, "scale": 1.0},
+            {"name": "medium", "quality": 70, "scale": 0.75},
+            {"name": "low", "quality": 50, "scale": 0.5},
+        ],
+        "adaptive": {
+            "enabled": True,
+            "default_tier": "high",
+            "window": 2.0,
+            "downgrade_ratio": 0.25,
+            "upgrade_after": 3,
+        },
+        "h264": {
+            "enabled": True,
+            "codec": "libx264",
+            "crf": 28,
+            "preset": "ultrafast",
+            "gop": None,
+            "client_queue_size": 60,
+        },
+    },
+    "video": {
+        "source": "tello",
+        "file": {
+            "path": "",
+            "realtime": True,
+            "loop": True,
+        },
+        "synthetic": {
+            "width": 960,
+            "height": 720,
+            "fps": 30.0,
+            "texts": ["DECOLLA", "RUOTA DESTRA 90"],
+            "text_duration": 3.0,
+        },
     },
     "processing": {
         "convert_bgr_to_rgb": True,
@@ -74,18 +111,122 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "contrast_alpha": 1.05,
         "contrast_beta": 2,
     },
+    "drone": {
+        "backend": "tello",
+        "mock": {
+            "time_scale": 1.0,
+            "latency": 0.05,
+            "jitter": 0.0,
+            "speed": 50.0,
+            "rotation_speed": 90.0,
+            "battery": 100.0,
+            "drain_per_second": 0.15,
+            "drain_per_command": 0.02,
+            "error_rate": 0.0,
+            "seed": None,
+            "udp": {
+                "enabled": False,
+                "host": "127.0.0.1",
+                "port": 8889,
+                "state_port": 8890,
+            },
+        },
+    },
+    "telemetry": {
+        "enabled": True,
+        "sample_rate": 10.0,
+        "capacity": 6000,
+        "stream_rate": 5.0,
+        "max_stream_rate": 20.0,
+        "history_max_points": 1000,
+    },
+    "events": {
+        "enabled": True,
+        "client_queue_size": 256,
+        "history": 200,
+        "telemetry_rate": 5.0,
+        "keepalive": 15.0,
+    },
+    "metrics": {
+        "enabled": True,
+    },
+    "logging": {
+        "level": "INFO",
+        "console": True,
+        "queue_size": 10000,
+        "repeat_interval": 5.0,
+        "file": {
+            "enabled": True,
+            "path": "logs/tello.jsonl",
+            "max_bytes": 5 * 1024 * 1024,
+            "backup_count": 5,
+        },
+    },
+    "recording": {
+        "output_dir": "recordings",
+        "source": "processed",
+        "fps": 30.0,
+        "queue_size": 60,
+        "drop_policy": "oldest",
+        "codec": "libx264",
+        "crf": 23,
+        "preset": "veryfast",
+    },
+    "history": {
+        "enabled": True,
+        "seconds": 10.0,
+        "fps": None,
+        "storage": "jpeg",
+        "max_memory_mb": 64,
+        "jpeg_quality": 80,
+        "queue_size": 8,
+        "clip_max_seconds": 30.0,
+        "clip_format": "mp4",
+    },
+    "photo": {
+        "output_dir": "photos",
+        "source": "raw",
+        "ring_size": 45,
+        "workers": 2,
+        "format": "jpg",
+        "jpeg_quality": 92,
+    },
+    "commands": {
+        "optimize": False,
+        "fold_go": True,
+        "go_speed": 50,
+        "wait_timeout": 60.0,
+    },
     "text_detection": {
         "enabled": False,
         "language": "en",
         "gpu": False,
         "threshold": 0.7,
         "interval": 1.0,
+        "trigger_window": 3,
+        "trigger_required": 2,
+        "trigger_cooldown": 3.0,
+        "worker": "thread",
+        "change_threshold": 0.0,
+        "change_max_age": 0.0,
+        "ocr_scale": 1.0,
+        "roi_mode": "full",
+        "roi": None,
+        "roi_margin": 40,
+        "roi_refresh": 5,
         "box_color": [0, 255, 0],
         "box_thickness": 1,
         "text_color": [255, 0, 0],
         "text_font_scale": 0.5,
         "text_font_thickness": 1,
         "text_font": "simplex",
+        "sprite_cache_size": 256,
+        "tracking": {
+            "enabled": True,
+            "scale": 0.5,
+            "history": 30,
+            "points_per_box": 8,
+        },
     },
 }
 
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+from stream_hub import BroadcastHub, Subscription
+
+
+def format_sse(event_id: int, event_type: str, data: str) -> str:
+    """Evento Server-Sent Events; `data` e' gia' serializzato in JSON su una riga."""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+@dataclass(frozen=True)
+class Event:
+    """Evento pubblicato sul bus, con il testo SSE gia' pronto da scrivere."""
+
+    id: int
+    type: str
+    timestamp: float
+    data: Dict[str, Any]
+    sse: str
+
+
+class EventBus:
+    """
+    Bus degli eventi applicativi (rilevamenti OCR, azioni, avanzamento dei
+    job, telemetria) verso i browser. Ogni evento viene serializzato una
+    volta sola e distribuito con un BroadcastHub: un client lento perde gli
+    eventi piu' vecchi senza rallentare chi pubblica.
+    Gli ultimi `history` eventi restano in memoria per chi si ricollega con
+    Last-Event-ID.
+    """
+
+    def __init__(self, maxlen: int = 256, history: int = 200, clock: Callable[[], float] = time.time):
+        self.hub = BroadcastHub(maxlen)
+        self.clock = clock
+        self.published: Counter = Counter()
+
+        self._history: Deque[Event] = deque(maxlen=max(int(history), 0))
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> Event:
+        timestamp = self.clock()
+        payload = json.dumps(dict(data, timestamp=timestamp), separators=(",", ":"), default=str)
+        # Id, storico e consegna sotto lo stesso lock: ogni client vede id crescenti.
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            event = Event(event_id, event_type, timestamp, data, format_sse(event_id, event_type, payload))
+            self._history.append(event)
+            self.published[event_type] += 1
+            self.hub.publish(event)
+        return event
+
+    def subscribe(self, last_event_id: Optional[int] = None, maxlen: Optional[int] = None) -> Subscription:
+        """
+        Nuovo client. Con `last_event_id` riceve prima gli eventi successivi
+        ancora nello storico, poi quelli nuovi, senza buchi ne' duplicati.
+        """
+        with self._lock:
+            subscription = self.hub.subscribe(maxlen, replay_latest=False)
+            if last_event_id is not None:
+                for event in self._history:
+                    if event.id > last_event_id:
+                        subscription.push(event)
+        return subscription
+
+    def stream(
+        self,
+        subscription: Subscription,
+        types: Optional[Iterable[str]] = None,
+        keepalive: float = 15.0,
+    ):
+        """Generatore SSE per un client: eventi filtrati per tipo e commenti di keepalive."""
+        wanted = set(types) if types else None
+        with subscription:
+            yield "retry: 2000\n\n"
+            while True:
+                event = subscription.get(timeout=keepalive)
+                if event is None:
+                    if subscription.closed:
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                if wanted is None or event.type in wanted:
+                    yield event.sse
+
+    @property
+    def subscriber_count(self) -> int:
+        return self.hub.subscriber_count
+
+    @property
+    def dropped_total(self) -> int:
+        return self.hub.dropped_total
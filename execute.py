@@ -3,12 +3,17 @@ Module per eseguire azioni del drone basate su testo riconosciuto.
 Contiene funzioni organizzate per categoria di azione.
 """
 
-import re
+import logging
 import time
 from datetime import datetime
 
 import cv2
 
+from keyword_matcher import KeywordMatcher
+
+
+logger = logging.getLogger(__name__)
+
 
 class DroneActionExecutor:
     """Gestore centralizzato delle azioni del drone."""
@@ -22,6 +27,20 @@ class DroneActionExecutor:
         """
         self.tello_client = tello_client
         self.commands = get_command_keywords()
+        # Tabella dei keyword compilata una volta sola.
+        self.matcher = KeywordMatcher(self.commands)
+        # Callback opzionale (azione, secondi) per misurare ogni comando.
+        self.command_hook = None
+        # Evento di annullamento della sequenza in corso (interrompe anche hover).
+        self._active_cancel = None
+        # SequenceOptimizer usato per compilare le sequenze; optimize_default
+        # decide se compilarle quando la richiesta non lo specifica.
+        self.optimizer = None
+        self.optimize_default = False
+        # VideoRecorder per start_recording / stop_recording.
+        self.recorder = None
+        # PhotoCapture: scatti su pool di I/O e burst dal ring buffer.
+        self.photo_capture = None
 
     # ============== AZIONI DI VOLO ==============
 
@@ -31,7 +50,7 @@ class DroneActionExecutor:
             self.tello_client.takeoff()
             return True
         except Exception as e:
-            print(f"Errore durante il decollo: {e}")
+            logger.error("Errore durante il decollo: %s", e)
             return False
 
     def land(self):
@@ -40,7 +59,7 @@ class DroneActionExecutor:
             self.tello_client.land()
             return True
         except Exception as e:
-            print(f"Errore durante l'atterraggio: {e}")
+            logger.error("Errore durante l'atterraggio: %s", e)
             return False
 
     def move_forward(self, distance=None):
@@ -50,7 +69,7 @@ class DroneActionExecutor:
             self.tello_client.move_forward(move_distance)
             return True
         except Exception as e:
-            print(f"Errore movimento avanti: {e}")
+            logger.error("Errore movimento avanti: %s", e)
             return False
 
     def move_backward(self, distance=None):
@@ -60,7 +79,7 @@ class DroneActionExecutor:
             self.tello_client.move_back(move_distance)
             return True
         except Exception as e:
-            print(f"Errore movimento indietro: {e}")
+            logger.error("Errore movimento indietro: %s", e)
             return False
 
     def move_left(self, distance=None):
@@ -70,7 +89,7 @@ class DroneActionExecutor:
             self.tello_client.move_left(move_distance)
             return True
         except Exception as e:
-            print(f"Errore movimento sinistra: {e}")
+            logger.error("Errore movimento sinistra: %s", e)
             return False
 
     def move_right(self, distance=None):
@@ -80,7 +99,7 @@ class DroneActionExecutor:
             self.tello_client.move_right(move_distance)
             return True
         except Exception as e:
-            print(f"Errore movimento destra: {e}")
+            logger.error("Errore movimento destra: %s", e)
             return False
 
     def move_up(self, distance=None):
@@ -90,7 +109,7 @@ class DroneActionExecutor:
             self.tello_client.move_up(move_distance)
             return True
         except Exception as e:
-            print(f"Errore movimento alto: {e}")
+            logger.error("Errore movimento alto: %s", e)
             return False
 
     def move_down(self, distance=None):
@@ -100,7 +119,7 @@ class DroneActionExecutor:
             self.tello_client.move_down(move_distance)
             return True
         except Exception as e:
-            print(f"Errore movimento basso: {e}")
+            logger.error("Errore movimento basso: %s", e)
             return False
 
     def rotate_clockwise(self, angle=None):
@@ -110,7 +129,7 @@ class DroneActionExecutor:
             self.tello_client.rotate_clockwise(rotate_angle)
             return True
         except Exception as e:
-            print(f"Errore rotazione oraria: {e}")
+            logger.error("Errore rotazione oraria: %s", e)
             return False
 
     def rotate_counterclockwise(self, angle=None):
@@ -120,13 +139,30 @@ class DroneActionExecutor:
             self.tello_client.rotate_counter_clockwise(rotate_angle)
             return True
         except Exception as e:
-            print(f"Errore rotazione antioraria: {e}")
+            logger.error("Errore rotazione antioraria: %s", e)
+            return False
+
+    def go(self, target=None):
+        """Spostamento relativo x (avanti), y (sinistra), z (alto) a velocità data."""
+        try:
+            x, y, z, speed = (int(value) for value in target)
+            self.tello_client.go_xyz_speed(x, y, z, speed)
+            return True
+        except Exception as e:
+            logger.error("Errore movimento go: %s", e)
             return False
 
     # ============== AZIONI FOTOCAMERA ==============
 
     def take_photo(self, filename=None):
-        """Scatto fotografico."""
+        """Scatto fotografico: ritorna percorso e timestamp del frame."""
+        if self.photo_capture is not None:
+            try:
+                shot = self.photo_capture.capture(filename)
+                return {"path": shot["path"], "timestamp": shot["timestamp"]}
+            except Exception as e:
+                logger.error("Errore scatto foto: %s", e)
+                return False
         try:
             frame = self.tello_client.get_frame_read().frame
             if frame is None:
@@ -135,25 +171,49 @@ class DroneActionExecutor:
             cv2.imwrite(output_file, frame)
             return True
         except Exception as e:
-            print(f"Errore scatto foto: {e}")
+            logger.error("Errore scatto foto: %s", e)
+            return False
+
+    def burst_photo(self, count=None):
+        """Raffica di foto dai frame immediatamente precedenti al comando."""
+        if self.photo_capture is None:
+            logger.warning("Raffica non configurata")
+            return False
+        try:
+            burst = self.photo_capture.burst(int(count or 5))
+            return {"photos": burst["photos"]}
+        except Exception as e:
+            logger.error("Errore raffica foto: %s", e)
             return False
 
     def start_recording(self):
         """Avvio registrazione video."""
-        print("Registrazione non implementata in questa versione")
-        return False
+        if self.recorder is None:
+            logger.warning("Registrazione non configurata")
+            return False
+        try:
+            path = self.recorder.start()
+            return {"path": path, "started_at": self.recorder.started_at}
+        except Exception as e:
+            logger.error("Errore avvio registrazione: %s", e)
+            return False
 
     def stop_recording(self):
         """Arresto registrazione video."""
-        print("Registrazione non implementata in questa versione")
-        return False
+        if self.recorder is None or not self.recorder.recording:
+            return False
+        try:
+            return self.recorder.stop()
+        except Exception as e:
+            logger.error("Errore arresto registrazione: %s", e)
+            return False
 
     def get_battery_level(self):
         """Ottiene il livello della batteria."""
         try:
             return self.tello_client.get_battery()
         except Exception as e:
-            print(f"Errore lettura batteria: {e}")
+            logger.error("Errore lettura batteria: %s", e)
             return None
 
     # ============== AZIONI SPECIALI ==============
@@ -174,7 +234,7 @@ class DroneActionExecutor:
                 self.tello_client.flip_forward()
             return True
         except Exception as e:
-            print(f"Errore durante il flip: {e}")
+            logger.error("Errore durante il flip: %s", e)
             return False
 
     def set_speed(self, speed=None):
@@ -184,7 +244,7 @@ class DroneActionExecutor:
             self.tello_client.set_speed(target_speed)
             return True
         except Exception as e:
-            print(f"Errore impostazione velocità: {e}")
+            logger.error("Errore impostazione velocità: %s", e)
             return False
 
     def hover(self, duration=None):
@@ -192,10 +252,14 @@ class DroneActionExecutor:
         try:
             wait_seconds = float(duration or 1.0)
             if wait_seconds > 0:
-                time.sleep(wait_seconds)
+                cancel_event = self._active_cancel
+                if cancel_event is not None:
+                    cancel_event.wait(wait_seconds)
+                else:
+                    time.sleep(wait_seconds)
             return True
         except Exception as e:
-            print(f"Errore hover: {e}")
+            logger.error("Errore hover: %s", e)
             return False
 
     def emergency_stop(self):
@@ -204,33 +268,11 @@ class DroneActionExecutor:
             self.tello_client.emergency()
             return True
         except Exception as e:
-            print(f"Errore arresto di emergenza: {e}")
+            logger.error("Errore arresto di emergenza: %s", e)
             return False
 
     def _normalize_action_name(self, action):
-        if not action:
-            return None
-
-        action_text = str(action).strip().lower()
-        alias_map = {
-            "take_off": "takeoff",
-            "decollo": "takeoff",
-            "atterra": "land",
-            "move_back": "move_backward",
-            "back": "move_backward",
-            "move_left": "move_left",
-            "left": "move_left",
-            "move_right": "move_right",
-            "right": "move_right",
-            "forward": "move_forward",
-            "move_forward": "move_forward",
-            "up": "move_up",
-            "down": "move_down",
-            "rotate_cw": "rotate_clockwise",
-            "rotate_ccw": "rotate_counterclockwise",
-            "stop": "emergency_stop",
-        }
-        return alias_map.get(action_text, action_text)
+        return normalize_action_name(action)
 
     def execute_action(self, action, argument=None):
         """Esegue una singola azione con argomento opzionale."""
@@ -239,6 +281,7 @@ class DroneActionExecutor:
         if not method or not callable(method):
             return False, f"Azione non supportata: {action}"
 
+        started = time.perf_counter()
         try:
             if argument is None or normalized in ("takeoff", "land", "start_recording", "stop_recording", "emergency_stop"):
                 result = method()
@@ -251,8 +294,20 @@ class DroneActionExecutor:
             return True, result
         except Exception as e:
             return False, str(e)
+        finally:
+            if self.command_hook is not None:
+                self.command_hook(normalized, time.perf_counter() - started)
+
+    def compile_sequence(self, commands):
+        """
+        Compila la sequenza con l'optimizer dell'executor.
+
+        Returns:
+            tuple: (passi ottimizzati, report con piano originale e ottimizzato)
+        """
+        return compile_sequence(commands, self.optimizer)
 
-    def execute_sequence(self, commands, delay_between=0.8):
+    def execute_sequence(self, commands, delay_between=0.8, on_step=None, cancel_event=None, optimize=None):
         """
         Esegue più comandi in sequenza.
 
@@ -260,6 +315,14 @@ class DroneActionExecutor:
         - {"action": "move_left", "argument": 100}
         - {"azione": "move_left", "argomento": 100}
         - ["move_left", 100]
+
+        Args:
+            on_step (callable): Invocata con il risultato di ogni passo
+            cancel_event (threading.Event): Se impostato interrompe la sequenza,
+                anche durante la pausa tra un comando e l'altro
+            optimize (bool): Compila la sequenza prima di eseguirla; None usa
+                optimize_default. Senza optimizer la sequenza resta invariata.
+                Gli indici dei risultati si riferiscono al piano ottimizzato.
         """
         if not isinstance(commands, list) or not commands:
             return {
@@ -268,26 +331,66 @@ class DroneActionExecutor:
                 "results": [],
             }
 
+        plan = None
+        if optimize is None:
+            optimize = self.optimize_default
+        if optimize and self.optimizer is not None:
+            commands, plan = self.compile_sequence(commands)
+            if not commands:
+                return {
+                    "success": True,
+                    "cancelled": False,
+                    "message": "Sequenza senza effetto dopo l'ottimizzazione",
+                    "results": [],
+                    "plan": plan,
+                }
+
         results = []
-        overall_success = True
+        delay_between = float(delay_between or 0)
+
+        def record(item):
+            results.append(item)
+            if on_step is not None:
+                on_step(item)
 
+        self._active_cancel = cancel_event
+        try:
+            self._run_steps(commands, delay_between, record, cancel_event)
+        finally:
+            self._active_cancel = None
+        # Annullata se lo stop e' arrivato prima della fine, anche durante
+        # l'ultimo passo (che allora termina con errore, es. "Motor stop").
+        cancelled = cancel_event is not None and cancel_event.is_set()
+
+        overall_success = all(item["success"] for item in results)
+
+        if cancelled:
+            message = "Sequenza annullata"
+        elif overall_success:
+            message = "Sequenza completata"
+        else:
+            message = "Sequenza completata con errori"
+
+        outcome = {
+            "success": overall_success and not cancelled,
+            "cancelled": cancelled,
+            "message": message,
+            "results": results,
+        }
+        if plan is not None:
+            outcome["plan"] = plan
+        return outcome
+
+    def _run_steps(self, commands, delay_between, record, cancel_event):
+        """Esegue i passi della sequenza fermandosi se cancel_event e' impostato."""
         for index, command in enumerate(commands):
-            action = None
-            argument = None
-
-            if isinstance(command, dict):
-                action = command.get("action") or command.get("azione")
-                argument = command.get("argument")
-                if argument is None:
-                    argument = command.get("argomento")
-            elif isinstance(command, list) and len(command) > 0:
-                action = command[0]
-                if len(command) > 1:
-                    argument = command[1]
+            if cancel_event is not None and cancel_event.is_set():
+                return
+
+            action, argument = parse_sequence_item(command)
 
             if not action:
-                overall_success = False
-                results.append(
+                record(
                     {
                         "index": index,
                         "action": action,
@@ -299,10 +402,8 @@ class DroneActionExecutor:
                 continue
 
             success, message = self.execute_action(action, argument)
-            if not success:
-                overall_success = False
 
-            results.append(
+            record(
                 {
                     "index": index,
                     "action": action,
@@ -313,45 +414,53 @@ class DroneActionExecutor:
             )
 
             if index < len(commands) - 1 and delay_between > 0:
-                time.sleep(float(delay_between))
-
-        return {
-            "success": overall_success,
-            "message": "Sequenza completata" if overall_success else "Sequenza completata con errori",
-            "results": results,
-        }
+                if cancel_event is not None:
+                    cancel_event.wait(delay_between)
+                else:
+                    time.sleep(delay_between)
 
     # ============== MAPPING TESTO -> AZIONE ==============
 
+    def parse_command(self, text):
+        """
+        Individua l'azione (e l'eventuale argomento) nel testo riconosciuto.
+
+        Args:
+            text (str): Testo riconosciuto dall'OCR
+
+        Returns:
+            tuple or None: (azione, argomento) oppure None
+        """
+        return parse_command_text(text, self.matcher)
+
+    def parse_commands(self, text):
+        """
+        Tutti i comandi presenti nel testo, nell'ordine di lettura.
+
+        Returns:
+            list: Coppie (azione, argomento)
+        """
+        return self.matcher.find_all(text)
+
     def execute_command(self, text):
         """
-        Esegue un'azione basata sul testo riconosciuto.
+        Esegue le azioni riconosciute nel testo, nell'ordine di lettura.
         
         Args:
             text (str): Testo riconosciuto dall'OCR
             
         Returns:
-            bool: True se l'azione è stata eseguita, False altrimenti
+            bool: True se tutte le azioni sono state eseguite, False altrimenti
         """
-        if not text:
+        commands = self.parse_commands(text)
+        if not commands:
             return False
-        
-        text_upper = text.upper()
-        
-        for keyword, action in self.commands.items():
-            if keyword.upper() in text_upper:
-                argument = None
-                if action in ("move_forward", "move_backward", "move_left", "move_right", "move_up", "move_down"):
-                    argument = parse_distance_from_text(text)
-                elif action in ("rotate_clockwise", "rotate_counterclockwise"):
-                    argument = parse_angle_from_text(text)
-                elif action == "set_speed":
-                    argument = parse_speed_from_text(text)
-
-                success, _ = self.execute_action(action, argument)
-                return success
-        
-        return False
+
+        success = True
+        for action, argument in commands:
+            ok, _ = self.execute_action(action, argument)
+            success = success and ok
+        return success
 
     def get_available_commands(self):
         """
@@ -365,58 +474,125 @@ class DroneActionExecutor:
 
 # ============== FUNZIONI HELPER ==============
 
-def parse_distance_from_text(text):
+def normalize_action_name(action):
     """
-    Estrae la distanza da una stringa di testo.
-    
+    Converte alias e nomi italiani nel nome del metodo dell'executor.
+
     Args:
-        text (str): Testo contenente il valore di distanza
-        
+        action (str): Nome dell'azione come ricevuto
+
     Returns:
-        float or None: Distanza estratta o None
+        str or None: Nome normalizzato
     """
-    if not text:
-        return None
-    match = re.search(r"(\d+)", str(text))
-    if not match:
+    if not action:
         return None
-    return int(match.group(1))
 
+    action_text = str(action).strip().lower()
+    alias_map = {
+        "take_off": "takeoff",
+        "decollo": "takeoff",
+        "atterra": "land",
+        "move_back": "move_backward",
+        "back": "move_backward",
+        "move_left": "move_left",
+        "left": "move_left",
+        "move_right": "move_right",
+        "right": "move_right",
+        "forward": "move_forward",
+        "move_forward": "move_forward",
+        "up": "move_up",
+        "down": "move_down",
+        "rotate_cw": "rotate_clockwise",
+        "rotate_ccw": "rotate_counterclockwise",
+        "stop": "emergency_stop",
+        "go_xyz_speed": "go",
+        "photo": "take_photo",
+        "foto": "take_photo",
+        "burst": "burst_photo",
+    }
+    return alias_map.get(action_text, action_text)
+
+
+_default_matcher = None
 
-def parse_angle_from_text(text):
+
+def parse_command_text(text, matcher=None):
     """
-    Estrae l'angolo da una stringa di testo.
-    
+    Individua la prima azione (e l'eventuale argomento) nel testo
+    riconosciuto, senza bisogno di un executor connesso al drone.
+
     Args:
-        text (str): Testo contenente il valore di angolo
-        
+        text (str): Testo riconosciuto dall'OCR
+        matcher (KeywordMatcher): Tabella compilata; default get_command_keywords()
+
     Returns:
-        float or None: Angolo estratto o None
+        tuple or None: (azione, argomento) oppure None
     """
+    global _default_matcher
+
     if not text:
         return None
-    match = re.search(r"(\d+)", str(text))
-    if not match:
-        return None
-    return int(match.group(1))
+    if matcher is None:
+        if _default_matcher is None:
+            _default_matcher = KeywordMatcher(get_command_keywords())
+        matcher = _default_matcher
+    return matcher.match(text)
 
 
-def parse_speed_from_text(text):
+def parse_sequence_item(command):
     """
-    Estrae la velocità da una stringa di testo.
-    
-    Args:
-        text (str): Testo contenente il valore di velocità
-        
+    Estrae (azione, argomento) da un elemento di sequenza nei formati
+    accettati da execute_sequence.
+    """
+    action = None
+    argument = None
+
+    if isinstance(command, dict):
+        action = command.get("action") or command.get("azione")
+        argument = command.get("argument")
+        if argument is None:
+            argument = command.get("argomento")
+    elif isinstance(command, list) and len(command) > 0:
+        action = command[0]
+        if len(command) > 1:
+            argument = command[1]
+
+    return action, argument
+
+
+def compile_sequence(commands, optimizer):
+    """
+    Normalizza la sequenza e la passa al SequenceOptimizer.
+    Gli elementi non validi restano invariati e verranno segnalati
+    da execute_sequence.
+
     Returns:
-        float or None: Velocità estratta o None
+        tuple: (passi ottimizzati, report)
     """
-    if not text:
-        return None
-    match = re.search(r"(\d+)", str(text))
-    if not match:
-        return None
-    return int(match.group(1))
+    steps = []
+    for command in commands:
+        action, argument = parse_sequence_item(command)
+        if action:
+            steps.append({"action": normalize_action_name(action), "argument": argument})
+        else:
+            steps.append(command)
+
+    return optimizer.compile(steps)
+
+
+def is_emergency_sequence(commands):
+    """
+    Indica se la sequenza contiene solo arresti di emergenza
+    (es. "stop" dalla chat), da eseguire sulla corsia prioritaria.
+    """
+    if not isinstance(commands, list) or not commands:
+        return False
+
+    for command in commands:
+        action, _ = parse_sequence_item(command)
+        if normalize_action_name(action) != "emergency_stop":
+            return False
+    return True
 
 
 def get_command_keywords():
@@ -443,4 +619,6 @@ def get_command_keywords():
         "RUOTA SINISTRA": "rotate_counterclockwise",
         "VELOCITA": "set_speed",
         "STOP": "emergency_stop",
+        "FOTO": "take_photo",
+        "RAFFICA": "burst_photo",
     }
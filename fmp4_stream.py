@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+from collections import deque
+from fractions import Fraction
+import threading
+import time
+from typing import Any, Deque, List, Optional, Tuple
+
+import numpy as np
+
+from ocr_worker import LatestSlot
+from stream_hub import BroadcastHub, Subscription
+
+try:
+    import av
+
+    AV_AVAILABLE = True
+except Exception:
+    av = None
+    AV_AVAILABLE = False
+
+
+# movflags per un MP4 frammentato leggibile da MediaSource: moov vuoto in
+# testa e un frammento (moof + mdat) per ogni frame.
+MOVFLAGS = "empty_moov+default_base_moof+frag_keyframe+frag_every_frame"
+TIME_BASE = Fraction(1, 1000)
+
+
+class Mp4BoxSplitter:
+    """
+    Destinazione file-like del muxer: divide l'output nei box MP4 di primo
+    livello, tenendo da parte l'init segment (ftyp + moov) e ritornando i
+    frammenti completi (moof + mdat).
+    """
+
+    def __init__(self):
+        self.init_segment: Optional[bytes] = None
+        self._buffer = bytearray()
+        self._init = bytearray()
+        self._pending = bytearray()
+
+    def write(self, data: Any) -> int:
+        self._buffer += data
+        return len(data)
+
+    def fragments(self) -> List[bytes]:
+        completed = []
+        buffer = self._buffer
+        while len(buffer) >= 8:
+            size = int.from_bytes(buffer[0:4], "big")
+            box = bytes(buffer[4:8])
+            if size == 1:
+                if len(buffer) < 16:
+                    break
+                size = int.from_bytes(buffer[8:16], "big")
+            elif size < 8:
+                # size 0 (box fino a fine file) non compare in streaming.
+                break
+            if len(buffer) < size:
+                break
+
+            data = bytes(buffer[:size])
+            del buffer[:size]
+            if box in (b"ftyp", b"moov"):
+                self._init += data
+                if box == b"moov":
+                    self.init_segment = bytes(self._init)
+            elif box == b"mdat":
+                completed.append(bytes(self._pending) + data)
+                self._pending.clear()
+            else:
+                # moof, styp, sidx...: precedono il proprio mdat.
+                self._pending += data
+        return completed
+
+
+def avc_codec_string(init_segment: bytes) -> str:
+    """Stringa codecs per MediaSource (es. avc1.64001F) letta dal box avcC."""
+    index = init_segment.find(b"avcC")
+    if index < 0 or len(init_segment) < index + 8:
+        return "avc1.42E01E"
+    profile, compatibility, level = init_segment[index + 5 : index + 8]
+    return f"avc1.{profile:02X}{compatibility:02X}{level:02X}"
+
+
+class Fmp4Streamer:
+    """
+    Encoder H.264 unico per tutti i client /stream.mp4.
+    La pipeline consegna i frame elaborati con push() (solo se c'e' almeno
+    un client); un thread dedicato li codifica una volta sola in MP4
+    frammentato e pubblica i frammenti su un BroadcastHub. L'init segment
+    resta in cache per chi si collega dopo; un nuovo client parte dal
+    primo keyframe, forzato al momento della sottoscrizione.
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        codec: str = "libx264",
+        crf: int = 28,
+        preset: str = "ultrafast",
+        gop: Optional[int] = None,
+        queue_size: int = 60,
+    ):
+        self.fps = max(float(fps), 1.0)
+        self.codec = codec
+        self.options = {
+            "preset": str(preset),
+            "tune": "zerolatency",
+            "crf": str(int(crf)),
+            "g": str(int(gop or round(self.fps))),
+        }
+        self.hub = BroadcastHub(maxlen=queue_size)
+
+        self.session = 0
+        self.init_segment: Optional[bytes] = None
+        self.mime: Optional[str] = None
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+        self.error: Optional[str] = None
+
+        self._slot = LatestSlot()
+        self._cond = threading.Condition()
+        self._force_keyframe = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def available(self) -> bool:
+        return AV_AVAILABLE
+
+    @property
+    def active(self) -> bool:
+        return self.hub.subscriber_count > 0
+
+    def push(self, frame: np.ndarray, timestamp: float) -> None:
+        """Consegna non bloccante: se l'encoder e' indietro il frame precedente viene sostituito."""
+        if frame is None or not self.active:
+            return
+        self._ensure_thread()
+        # Il frame elaborato e' un buffer riusato dalla pipeline.
+        self._slot.put((frame.copy(), timestamp))
+
+    def subscribe(self) -> Subscription:
+        subscription = self.hub.subscribe(replay_latest=False)
+        self.request_keyframe()
+        return subscription
+
+    def request_keyframe(self) -> None:
+        self._force_keyframe = True
+
+    def wait_init(self, timeout: float = 5.0) -> Optional[Tuple[int, bytes, str]]:
+        """Attende l'init segment della sessione corrente: (sessione, init, mime)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.init_segment is not None, timeout)
+            if self.init_segment is None:
+                return None
+            return self.session, self.init_segment, self.mime
+
+    def _ensure_thread(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="fmp4-encoder", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._slot.take(timeout=2.0)
+            if item is None:
+                if not self.active:
+                    # Nessun client: il thread termina, la prossima sessione riparte da capo.
+                    with self._cond:
+                        self.init_segment = None
+                        self._thread = None
+                    return
+                continue
+            try:
+                self._encode_session(item)
+            except Exception as e:
+                self.error = str(e)
+                with self._cond:
+                    self.init_segment = None
+                    self._thread = None
+                return
+
+    def _encode_session(self, first: Tuple[np.ndarray, float]) -> None:
+        with self._cond:
+            self.session += 1
+            session = self.session
+
+        splitter = Mp4BoxSplitter()
+        container = av.open(splitter, mode="w", format="mp4", options={"movflags": MOVFLAGS, "flush_packets": "1"})
+        height, width = first[0].shape[0] & ~1, first[0].shape[1] & ~1
+        stream = container.add_stream(self.codec, rate=int(round(self.fps)))
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = "yuv420p"
+        stream.codec_context.time_base = TIME_BASE
+        stream.options = dict(self.options)
+
+        keyframes: Deque[bool] = deque()
+        first_timestamp = first[1]
+        last_pts = -1
+        item: Optional[Tuple[np.ndarray, float]] = first
+        idle_since = None
+
+        try:
+            while True:
+                if item is None:
+                    if self.active:
+                        idle_since = None
+                    elif idle_since is None:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since > 2.0:
+                        return
+                    item = self._slot.take(timeout=0.5)
+                    continue
+
+                frame, timestamp = item
+                item = None
+                frame = frame[:height, :width]
+                if frame.shape[0] != height or frame.shape[1] != width:
+                    continue
+
+                pts = max(int((timestamp - first_timestamp) / TIME_BASE), last_pts + 1)
+                last_pts = pts
+                video_frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame), format="bgr24")
+                video_frame.pts = pts
+                video_frame.time_base = TIME_BASE
+                if self._force_keyframe:
+                    self._force_keyframe = False
+                    video_frame.pict_type = av.video.frame.PictureType.I
+
+                for packet in stream.encode(video_frame):
+                    keyframes.append(bool(packet.is_keyframe))
+                    container.mux(packet)
+                self.frames_encoded += 1
+                self._publish(session, splitter, keyframes)
+        finally:
+            with self._cond:
+                self.init_segment = None
+            try:
+                container.close()
+            except Exception:
+                pass
+
+    def _publish(self, session: int, splitter: Mp4BoxSplitter, keyframes: Deque[bool]) -> None:
+        fragments = splitter.fragments()
+        if splitter.init_segment is not None and self.init_segment is None:
+            with self._cond:
+                self.init_segment = splitter.init_segment
+                self.mime = f'video/mp4; codecs="{avc_codec_string(splitter.init_segment)}"'
+                self._cond.notify_all()
+        for fragment in fragments:
+            # Un frammento per frame, nello stesso ordine dei pacchetti.
+            keyframe = keyframes.popleft() if keyframes else False
+            self.bytes_encoded += len(fragment)
+            self.hub.publish((session, keyframe, fragment))
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import io
+import json
+import math
+import threading
+import zipfile
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import av
+
+    AV_AVAILABLE = True
+except Exception:
+    av = None
+    AV_AVAILABLE = False
+
+from recorder import TIME_BASE
+
+
+HISTORY_STORAGE = ("jpeg", "raw")
+CLIP_FORMATS = ("mp4", "zip")
+
+
+@dataclass
+class HistoryFrame:
+    """Frame dello storico: immagine RGB o JPEG gia' compresso, piu' i risultati."""
+
+    seq: int
+    timestamp: float
+    results: Dict[str, Any]
+    frame: Optional[np.ndarray] = None
+    jpeg: Optional[bytes] = None
+
+
+class FrameHistory:
+    """
+    Storico degli ultimi `seconds` secondi di frame grezzi con i risultati
+    dell'elaborazione, per recuperare un frame passato o esportare una clip.
+    Tutta la memoria e' allocata una volta sola entro `max_bytes`:
+    - "raw": un unico array (slot, H, W, 3) in cui i frame vengono copiati;
+      gli slot si riducono se seconds * fps frame non stanno nel limite
+    - "jpeg": un'arena di byte circolare in cui finiscono i frame compressi;
+      i JPEG piu' vecchi vengono sovrascritti quando l'arena e' piena
+    La pipeline chiama push(), che accoda e basta: copia o compressione
+    avvengono su un thread dedicato. Se resta indietro, il frame in attesa
+    piu' vecchio viene scartato.
+    """
+
+    def __init__(
+        self,
+        seconds: float = 10.0,
+        fps: float = 30.0,
+        storage: str = "jpeg",
+        max_bytes: int = 64 * 1024 * 1024,
+        jpeg_quality: int = 80,
+        queue_size: int = 8,
+    ):
+        self.seconds = max(float(seconds), 0.1)
+        self.fps = max(float(fps), 1.0)
+        self.storage = storage if storage in HISTORY_STORAGE else "jpeg"
+        self.max_bytes = max(int(max_bytes), 1024 * 1024)
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+
+        self.slots = max(int(math.ceil(self.seconds * self.fps)), 1)
+        self.stored = 0
+        self.dropped = 0
+        self.oversized = 0
+        self.last_error: Optional[str] = None
+
+        # Metadati per slot: timestamp ordinati per searchsorted, come nel ring della telemetria.
+        self._timestamps = np.zeros(self.slots, dtype=np.float64)
+        self._seqs = np.zeros(self.slots, dtype=np.int64)
+        self._results: List[Optional[Dict[str, Any]]] = [None] * self.slots
+        self._head = 0
+        self._count = 0
+        self._last_timestamp = -math.inf
+
+        # "raw": allocato al primo frame, quando la risoluzione e' nota.
+        self._frames: Optional[np.ndarray] = None
+        # "jpeg": offset e lunghezza di ogni slot nell'arena.
+        self._arena = bytearray(self.max_bytes) if self.storage == "jpeg" else None
+        self._offsets = np.zeros(self.slots, dtype=np.int64)
+        self._lengths = np.zeros(self.slots, dtype=np.int64)
+        self._write_pos = 0
+
+        self._lock = threading.Lock()
+        self._pending: Deque[Tuple[np.ndarray, float, int, Dict[str, Any]]] = deque(maxlen=max(int(queue_size), 1))
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def memory_bytes(self) -> int:
+        """Memoria allocata per i frame (array raw o arena JPEG)."""
+        if self._arena is not None:
+            return len(self._arena)
+        return self._frames.nbytes if self._frames is not None else 0
+
+    def push(self, frame: np.ndarray, timestamp: float, seq: int = 0, results: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Accoda un frame grezzo senza bloccare. Il decoder crea un array nuovo
+        per ogni frame: qui si tiene solo il riferimento.
+        """
+        if frame is None:
+            return
+        with self._cond:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append((frame, float(timestamp), int(seq), results or {}))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="frame-history", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def annotate(self, timestamp: float, key: str, value: Any) -> bool:
+        """Aggiunge un risultato al frame con esattamente questo timestamp (es. l'OCR)."""
+        with self._lock:
+            slot = self._find(timestamp, exact=True)
+            if slot is None:
+                return False
+            results = dict(self._results[slot] or {})
+            results[key] = value
+            self._results[slot] = results
+            return True
+
+    def get(self, timestamp: Optional[float] = None, exact: bool = False) -> Optional[HistoryFrame]:
+        """Frame piu' vicino a `timestamp` (o l'ultimo); con `exact` solo quello identico."""
+        with self._lock:
+            if self._count == 0:
+                return None
+            if timestamp is None:
+                slot = (self._head - 1) % self.slots
+            else:
+                slot = self._find(timestamp, exact)
+                if slot is None:
+                    return None
+            return self._entry(slot)
+
+    def window(self, since: float, until: float, max_frames: Optional[int] = None) -> List[HistoryFrame]:
+        """Frame con since <= timestamp <= until in ordine cronologico, al massimo `max_frames`."""
+        with self._lock:
+            slots = self._ordered_slots()
+            timestamps = self._timestamps[slots]
+            low = int(np.searchsorted(timestamps, since, "left"))
+            high = int(np.searchsorted(timestamps, until, "right"))
+            selected = slots[low:high]
+            if max_frames and len(selected) > max_frames:
+                # Troppi frame: si tengono gli ultimi.
+                selected = selected[-max_frames:]
+            return [self._entry(int(slot)) for slot in selected]
+
+    def encode(self, item: HistoryFrame) -> bytes:
+        """JPEG del frame: quello salvato oppure compresso ora dal frame grezzo."""
+        if item.jpeg is not None:
+            return item.jpeg
+        ok, encoded = cv2.imencode(".jpg", cv2.cvtColor(item.frame, cv2.COLOR_RGB2BGR), self.params)
+        if not ok:
+            raise RuntimeError("Compressione JPEG fallita")
+        return encoded.tobytes()
+
+    def decode(self, item: HistoryFrame) -> np.ndarray:
+        """Frame RGB, decompresso se necessario."""
+        if item.frame is not None:
+            return item.frame
+        frame = cv2.imdecode(np.frombuffer(item.jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise RuntimeError("JPEG non valido nello storico")
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def export_clip(
+        self,
+        since: float,
+        until: float,
+        clip_format: str = "mp4",
+        max_frames: Optional[int] = None,
+        codec: str = "libx264",
+        crf: int = 23,
+        preset: str = "veryfast",
+    ) -> Tuple[bytes, int]:
+        """
+        Esporta i frame della finestra come MP4 (PyAV, tempi reali dai
+        timestamp) o come ZIP di JPEG con un index.json dei risultati.
+        Ritorna (contenuto, numero di frame).
+        """
+        frames = self.window(since, until, max_frames)
+        if not frames:
+            raise LookupError("Nessun frame nella finestra richiesta")
+        if clip_format == "mp4":
+            if not AV_AVAILABLE:
+                raise RuntimeError("PyAV non installato")
+            return self._export_mp4(frames, codec, crf, preset), len(frames)
+        return self._export_zip(frames), len(frames)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self._count
+            oldest = float(self._timestamps[(self._head - count) % self.slots]) if count else None
+            newest = float(self._timestamps[(self._head - 1) % self.slots]) if count else None
+        return {
+            "storage": self.storage,
+            "slots": self.slots,
+            "frames": count,
+            "oldest": oldest,
+            "newest": newest,
+            "memory_bytes": self.memory_bytes,
+            "max_bytes": self.max_bytes,
+            "stored": self.stored,
+            "dropped": self.dropped,
+            "oversized": self.oversized,
+            "last_error": self.last_error,
+        }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                frame, timestamp, seq, results = self._pending.popleft()
+            try:
+                if self.storage == "jpeg":
+                    ok, encoded = cv2.imencode(".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), self.params)
+                    if not ok:
+                        raise RuntimeError("Compressione JPEG fallita")
+                    self._store_jpeg(encoded, timestamp, seq, results)
+                else:
+                    self._store_raw(frame, timestamp, seq, results)
+                self.stored += 1
+            except Exception as e:
+                self.last_error = str(e)
+
+    def _store_raw(self, frame: np.ndarray, timestamp: float, seq: int, results: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._frames is None or self._frames.shape[1:] != frame.shape:
+                # Primo frame o risoluzione cambiata: slot ricalcolati sul limite di memoria.
+                self.slots = max(min(int(math.ceil(self.seconds * self.fps)), self.max_bytes // max(frame.nbytes, 1)), 1)
+                self._frames = np.empty((self.slots,) + frame.shape, dtype=frame.dtype)
+                self._reset_slots()
+            slot = self._advance(timestamp, seq, results)
+            np.copyto(self._frames[slot], frame)
+
+    def _store_jpeg(self, encoded: np.ndarray, timestamp: float, seq: int, results: Dict[str, Any]) -> None:
+        size = int(encoded.nbytes)
+        arena_size = len(self._arena)
+        if size > arena_size:
+            self.oversized += 1
+            return
+        with self._lock:
+            start = self._write_pos
+            if start + size > arena_size:
+                # Nessuno spazio fino alla fine: si riparte da zero. Gli slot del
+                # giro precedente oltre `start` sono i piu' vecchi e vanno liberati.
+                while self._count and self._offsets[self._tail()] >= start:
+                    self._count -= 1
+                start = 0
+            # Liberati i JPEG piu' vecchi che si sovrappongono alla nuova area.
+            while self._count:
+                tail = self._tail()
+                offset = int(self._offsets[tail])
+                if offset + int(self._lengths[tail]) <= start or offset >= start + size:
+                    break
+                self._count -= 1
+            slot = self._advance(timestamp, seq, results)
+            self._arena[start : start + size] = encoded.reshape(-1).data
+            self._offsets[slot] = start
+            self._lengths[slot] = size
+            self._write_pos = start + size
+
+    def _reset_slots(self) -> None:
+        self._timestamps = np.zeros(self.slots, dtype=np.float64)
+        self._seqs = np.zeros(self.slots, dtype=np.int64)
+        self._results = [None] * self.slots
+        self._offsets = np.zeros(self.slots, dtype=np.int64)
+        self._lengths = np.zeros(self.slots, dtype=np.int64)
+        self._head = 0
+        self._count = 0
+        self._write_pos = 0
+
+    def _advance(self, timestamp: float, seq: int, results: Dict[str, Any]) -> int:
+        """Occupa lo slot successivo (il piu' vecchio se il ring e' pieno); lock gia' preso."""
+        slot = self._head
+        # Timestamp non decrescenti: searchsorted richiede un ordine.
+        timestamp = max(timestamp, self._last_timestamp)
+        self._timestamps[slot] = timestamp
+        self._seqs[slot] = seq
+        self._results[slot] = results
+        self._head = (self._head + 1) % self.slots
+        self._count = min(self._count + 1, self.slots)
+        self._last_timestamp = timestamp
+        return slot
+
+    def _tail(self) -> int:
+        return (self._head - self._count) % self.slots
+
+    def _ordered_slots(self) -> np.ndarray:
+        return (self._tail() + np.arange(self._count)) % self.slots
+
+    def _find(self, timestamp: float, exact: bool) -> Optional[int]:
+        """Slot col timestamp piu' vicino (o identico); lock gia' preso."""
+        if self._count == 0:
+            return None
+        slots = self._ordered_slots()
+        timestamps = self._timestamps[slots]
+        index = int(np.searchsorted(timestamps, timestamp, "left"))
+        candidates = [i for i in (index - 1, index) if 0 <= i < len(slots)]
+        best = min(candidates, key=lambda i: abs(timestamps[i] - timestamp))
+        if exact and timestamps[best] != timestamp:
+            return None
+        return int(slots[best])
+
+    def _entry(self, slot: int) -> HistoryFrame:
+        """Copia dello slot, valida anche dopo che il ring lo sovrascrive; lock gia' preso."""
+        item = HistoryFrame(
+            seq=int(self._seqs[slot]),
+            timestamp=float(self._timestamps[slot]),
+            results=dict(self._results[slot] or {}),
+        )
+        if self._arena is not None:
+            offset = int(self._offsets[slot])
+            item.jpeg = bytes(self._arena[offset : offset + int(self._lengths[slot])])
+        else:
+            item.frame = self._frames[slot].copy()
+        return item
+
+    def _export_zip(self, frames: List[HistoryFrame]) -> bytes:
+        buffer = io.BytesIO()
+        index = []
+        # I JPEG sono gia' compressi: nessuna ricompressione nello zip.
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for number, item in enumerate(frames):
+                name = f"frame_{number:05d}.jpg"
+                archive.writestr(name, self.encode(item))
+                index.append({"file": name, "seq": item.seq, "timestamp": item.timestamp, "results": item.results})
+            archive.writestr("index.json", json.dumps(index, default=str))
+        return buffer.getvalue()
+
+    def _export_mp4(self, frames: List[HistoryFrame], codec: str, crf: int, preset: str) -> bytes:
+        buffer = io.BytesIO()
+        container = av.open(buffer, mode="w", format="mp4")
+        first = self.decode(frames[0])
+        # yuv420p richiede dimensioni pari.
+        height, width = first.shape[0] & ~1, first.shape[1] & ~1
+        stream = container.add_stream(codec, rate=int(round(self.fps)))
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = "yuv420p"
+        stream.codec_context.time_base = TIME_BASE
+        stream.options = {"crf": str(int(crf)), "preset": str(preset)}
+
+        last_pts = -1
+        for item in frames:
+            frame = self.decode(item)[:height, :width]
+            if frame.shape[:2] != (height, width):
+                continue
+            pts = int((item.timestamp - frames[0].timestamp) / TIME_BASE)
+            if pts <= last_pts:
+                pts = last_pts + 1
+            last_pts = pts
+            video_frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame), format="rgb24")
+            video_frame.pts = pts
+            video_frame.time_base = TIME_BASE
+            for packet in stream.encode(video_frame):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+        container.close()
+        return buffer.getvalue()
@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import threading
+import time
+from typing import Any, Callable, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+try:
+    from djitellopy.tello import BackgroundFrameRead
+
+    DJITELLOPY_AVAILABLE = True
+except Exception:
+    BackgroundFrameRead = object
+    DJITELLOPY_AVAILABLE = False
+
+try:
+    import av
+
+    AV_AVAILABLE = True
+except Exception:
+    av = None
+    AV_AVAILABLE = False
+
+
+SOURCE_TYPES = ("tello", "file", "synthetic")
+
+
+@dataclass
+class FramePacket:
+    """Frame decodificato con numero di sequenza e timestamp di arrivo."""
+
+    seq: int
+    timestamp: float
+    frame: np.ndarray
+
+
+class FrameFeed:
+    """
+    Punto di consegna dei frame decodificati.
+    Ogni frame nuovo riceve un numero di sequenza crescente: chi consuma
+    attende sulla condition il frame successivo all'ultimo visto, invece di
+    rileggere (e rielaborare) sempre lo stesso array.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._latest: Optional[FramePacket] = None
+        self._seq = 0
+        self.closed = False
+
+    def publish(self, frame: Optional[np.ndarray], timestamp: Optional[float] = None) -> int:
+        if frame is None:
+            return self._seq
+        with self._cond:
+            self._seq += 1
+            self._latest = FramePacket(
+                seq=self._seq,
+                timestamp=time.time() if timestamp is None else timestamp,
+                frame=frame,
+            )
+            self._cond.notify_all()
+            return self._seq
+
+    def latest(self) -> Optional[FramePacket]:
+        with self._cond:
+            return self._latest
+
+    def wait_next(self, after_seq: int, timeout: Optional[float] = None) -> Optional[FramePacket]:
+        """Attende un frame con sequenza maggiore di `after_seq`; None allo scadere del timeout."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.closed or (self._latest is not None and self._latest.seq > after_seq),
+                timeout,
+            )
+            if self._latest is not None and self._latest.seq > after_seq:
+                return self._latest
+            return None
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class SequencedFrameRead(BackgroundFrameRead):
+    """
+    BackgroundFrameRead di djitellopy che pubblica ogni frame decodificato
+    su un FrameFeed. Resta compatibile con l'uso di `.frame`.
+    """
+
+    def __init__(self, tello: Any, address: str, feed: Optional[FrameFeed] = None):
+        # Il costruttore della classe base assegna gia' `self.frame`.
+        self.feed = feed or FrameFeed()
+        super().__init__(tello, address)
+
+    @property
+    def frame(self) -> Optional[np.ndarray]:
+        packet = self.feed.latest()
+        return packet.frame if packet is not None else None
+
+    @frame.setter
+    def frame(self, value: Optional[np.ndarray]) -> None:
+        self.feed.publish(value)
+
+
+def attach_tello_feed(client: Any) -> FrameFeed:
+    """Installa sul client Tello il lettore con sequenza e ne ritorna il feed."""
+    reader = getattr(client, "background_frame_read", None)
+    if isinstance(reader, SequencedFrameRead):
+        return reader.feed
+
+    if reader is not None:
+        reader.stop()
+
+    reader = SequencedFrameRead(client, client.get_udp_video_address())
+    client.background_frame_read = reader
+    reader.start()
+    return reader.feed
+
+
+class FrameSource:
+    """
+    Sorgente di frame per la pipeline video.
+    Ogni implementazione pubblica i frame (RGB, come djitellopy) sul proprio
+    FrameFeed; `start()` e' idempotente e ritorna il feed.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.feed = FrameFeed()
+
+    def start(self) -> FrameFeed:
+        raise NotImplementedError
+
+    def stop(self) -> None:
+        pass
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+
+
+class TelloFrameSource(FrameSource):
+    """Frame decodificati dallo stream H.264 del drone."""
+
+    name = "tello"
+
+    def __init__(self, client_factory: Callable[[], Any]):
+        super().__init__()
+        self.client_factory = client_factory
+
+    def start(self) -> FrameFeed:
+        self.feed = attach_tello_feed(self.client_factory())
+        return self.feed
+
+    def stop(self) -> None:
+        self.client_factory().streamoff()
+
+    def restart(self) -> None:
+        client = self.client_factory()
+        client.streamoff()
+        time.sleep(0.3)
+        client.streamon()
+        time.sleep(1.0)
+
+
+class _ThreadedFrameSource(FrameSource):
+    """Base per le sorgenti che producono frame in un thread proprio."""
+
+    def __init__(self):
+        super().__init__()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> FrameFeed:
+        if self._thread is not None and self._thread.is_alive():
+            return self.feed
+        if self.feed.closed:
+            self.feed = FrameFeed()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-source", daemon=True)
+        self._thread.start()
+        return self.feed
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.feed.close()
+
+    def _run(self) -> None:
+        raise NotImplementedError
+
+
+class VideoFileSource(_ThreadedFrameSource):
+    """
+    Riproduce un video registrato con PyAV.
+    Con `realtime` rispetta i timestamp originali, altrimenti pubblica i
+    frame il piu' velocemente possibile (utile per load test).
+    """
+
+    name = "file"
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = True):
+        super().__init__()
+        self.path = path
+        self.realtime = bool(realtime)
+        self.loop = bool(loop)
+
+    def _run(self) -> None:
+        if not AV_AVAILABLE:
+            self.feed.close()
+            return
+
+        while not self._stop.is_set():
+            container = av.open(self.path)
+            try:
+                self._play(container)
+            finally:
+                container.close()
+            if not self.loop:
+                break
+        self.feed.close()
+
+    def _play(self, container: Any) -> None:
+        started = time.monotonic()
+        first_pts: Optional[float] = None
+
+        for frame in container.decode(video=0):
+            if self._stop.is_set():
+                return
+
+            if self.realtime and frame.time is not None:
+                if first_pts is None:
+                    first_pts = frame.time
+                delay = (frame.time - first_pts) - (time.monotonic() - started)
+                if delay > 0 and self._stop.wait(delay):
+                    return
+
+            self.feed.publish(frame.to_ndarray(format="rgb24"))
+
+
+class SyntheticFrameSource(_ThreadedFrameSource):
+    """
+    Generatore sintetico: testo in movimento su sfondo con rumore,
+    per profilare la pipeline senza drone.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        width: int = 960,
+        height: int = 720,
+        fps: float = 30.0,
+        texts: Sequence[str] = ("DECOLLA", "RUOTA DESTRA 90"),
+        text_duration: float = 3.0,
+        seed: int = 0,
+    ):
+        super().__init__()
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = max(float(fps), 1.0)
+        self.texts: List[str] = [str(text) for text in texts] or ["DECOLLA"]
+        self.text_duration = max(float(text_duration), 0.1)
+
+        rng = np.random.default_rng(seed)
+        gradient = np.linspace(30, 90, self.width, dtype=np.float32)
+        background = np.repeat(gradient[None, :, None], self.height, axis=0).repeat(3, axis=2)
+        noise = rng.normal(0, 6, (self.height, self.width, 3))
+        self._background = np.clip(background + noise, 0, 255).astype(np.uint8)
+        self._index = 0
+
+    def render(self, index: int) -> np.ndarray:
+        """Disegna il frame `index` (deterministico)."""
+        frame = self._background.copy()
+        elapsed = index / self.fps
+        text = self.texts[int(elapsed // self.text_duration) % len(self.texts)]
+
+        scale = max(self.height / 240.0, 0.5)
+        thickness = max(int(scale * 2), 1)
+        (text_w, text_h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+        span = max(self.width - text_w, 1)
+        phase = (elapsed % self.text_duration) / self.text_duration
+        x = int(span * phase)
+        y = int(self.height * 0.5 + text_h / 2 + np.sin(elapsed * 2.0) * self.height * 0.1)
+
+        pad = int(10 * scale)
+        cv2.rectangle(frame, (x - pad, y - text_h - pad), (x + text_w + pad, y + pad), (240, 240, 240), -1)
+        cv2.putText(frame, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (10, 10, 10), thickness, cv2.LINE_AA)
+        return frame
+
+    def _run(self) -> None:
+        interval = 1.0 / self.fps
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            self.feed.publish(self.render(self._index))
+            self._index += 1
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # In ritardo: si riallinea senza accumulare debito.
+                next_at = time.monotonic()
+
+
+def create_frame_source(config: Any, tello_factory: Optional[Callable[[], Any]] = None) -> FrameSource:
+    """Costruisce la sorgente indicata in `video.source`."""
+    video_cfg = config.get("video", {})
+    source_type = str(video_cfg.get("source", "tello")).lower().strip()
+
+    if source_type == "file":
+        file_cfg = video_cfg.get("file", {})
+        return VideoFileSource(
+            str(file_cfg.get("path", "")),
+            realtime=bool(file_cfg.get("realtime", True)),
+            loop=bool(file_cfg.get("loop", True)),
+        )
+
+    if source_type == "synthetic":
+        synth_cfg = video_cfg.get("synthetic", {})
+        return SyntheticFrameSource(
+            width=int(synth_cfg.get("width", 960)),
+            height=int(synth_cfg.get("height", 720)),
+            fps=float(synth_cfg.get("fps", 30.0)),
+            texts=synth_cfg.get("texts", ["DECOLLA", "RUOTA DESTRA 90"]),
+            text_duration=float(synth_cfg.get("text_duration", 3.0)),
+        )
+
+    if tello_factory is None:
+        raise ValueError("Sorgente tello richiesta senza client Tello")
+    return TelloFrameSource(tello_factory)
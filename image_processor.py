@@ -2,24 +2,48 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 import time
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
 
 import cv2
 import numpy as np
 
+from box_tracker import BoxTracker
 from config_loader import parse_text_font, parse_text_languages
+from ocr_worker import EASY_OCR_AVAILABLE, OcrWorker
+from scene_change import SceneChangeDetector
+from text_overlay import TextSpriteCache
 
-try:
-    import easyocr
 
-    EASY_OCR_AVAILABLE = True
-except Exception:
-    easyocr = None
-    EASY_OCR_AVAILABLE = False
+def parse_roi(value: Any) -> Optional[Tuple[int, int, int, int]]:
+    """Converte [x, y, w, h] da config in tupla, None se assente o non valido."""
+    if isinstance(value, (list, tuple)) and len(value) == 4:
+        try:
+            x, y, w, h = (int(item) for item in value)
+        except (TypeError, ValueError):
+            return None
+        if w > 0 and h > 0:
+            return (x, y, w, h)
+    return None
+
+
+def build_contrast_lut(alpha: float, beta: float) -> np.ndarray:
+    """
+    LUT a 256 valori che approssima cv2.convertScaleAbs(alpha, beta).
+    Non e' identica bit a bit: np.rint arrotonda le meta' al pari e
+    OpenCV calcola in modo diverso, quindi alcuni valori differiscono di
+    un livello.
+    """
+    values = np.abs(np.arange(256, dtype=np.float64) * alpha + beta)
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
 
 
 @dataclass
 class ProcessResult:
+    """
+    Esito dell'elaborazione. `frame` punta a un buffer interno riusato:
+    resta valido solo fino alla successiva chiamata a process_frame.
+    """
+
     frame: Optional[np.ndarray]
     note: str
     results: Dict[str, Any]
@@ -31,6 +55,13 @@ class ImageProcessor:
         self.enable_contrast = bool(processing_cfg.get("enable_contrast", True))
         self.contrast_alpha = float(processing_cfg.get("contrast_alpha", 1.05))
         self.contrast_beta = int(processing_cfg.get("contrast_beta", 2))
+        self.contrast_lut = build_contrast_lut(self.contrast_alpha, self.contrast_beta)
+
+        # Buffer preallocati riusati tra un frame e l'altro (output dst= di OpenCV).
+        self._buffers: Dict[str, np.ndarray] = {}
+
+        # Callback opzionale (stage, secondi) per misurare le singole fasi.
+        self.stage_hook: Optional[Callable[[str, float], None]] = None
 
         td_cfg = config.get("text_detection", {})
         self.ocr_enabled = bool(td_cfg.get("enabled", False))
@@ -44,54 +75,198 @@ class ImageProcessor:
         self.font_scale = float(td_cfg.get("text_font_scale", 0.5))
         self.font_thickness = int(td_cfg.get("text_font_thickness", 1))
         self.font = parse_text_font(td_cfg.get("text_font", "simplex"), cv2.FONT_HERSHEY_SIMPLEX)
+        # Etichette renderizzate una volta e riusate finche' il testo non cambia.
+        self.text_sprites = TextSpriteCache(int(td_cfg.get("sprite_cache_size", 256)))
+
+        # Box dell'ultimo OCR seguiti con optical flow tra un'inferenza e l'altra.
+        tracking_cfg = td_cfg.get("tracking", {})
+        self.box_tracker = None
+        if tracking_cfg.get("enabled", True):
+            self.box_tracker = BoxTracker(
+                scale=float(tracking_cfg.get("scale", 0.5)),
+                history=int(tracking_cfg.get("history", 30)),
+                points_per_box=int(tracking_cfg.get("points_per_box", 8)),
+            )
 
         self.lang_list = parse_text_languages(td_cfg.get("language", "en"), default="en")
         self.gpu_mode = bool(td_cfg.get("gpu", False))
+        self.worker_mode = str(td_cfg.get("worker", "thread")).lower().strip()
+        self.scene_gate = SceneChangeDetector(
+            threshold=float(td_cfg.get("change_threshold", 0.0)),
+            max_age=float(td_cfg.get("change_max_age", 0.0)),
+        )
+
+        # Input OCR ridotto e/o ritagliato: il costo cresce con i pixel analizzati.
+        self.ocr_scale = min(max(float(td_cfg.get("ocr_scale", 1.0)), 0.1), 1.0)
+        self.roi_mode = str(td_cfg.get("roi_mode", "full")).lower().strip()
+        self.fixed_roi = parse_roi(td_cfg.get("roi"))
+        self.roi_margin = int(td_cfg.get("roi_margin", 40))
+        self.roi_refresh = int(td_cfg.get("roi_refresh", 5))
+        self._ocr_runs = 0
 
         self.last_ocr_time = 0.0
         self.latest_ocr_results = []
-        self.reader = None
+        self.latest_ocr_timestamp = 0.0
+        self.ocr_worker = None
 
+        self.ocr_requested = self.ocr_enabled
         if self.ocr_enabled and EASY_OCR_AVAILABLE:
-            try:
-                self.reader = easyocr.Reader(self.lang_list, gpu=self.gpu_mode)
-            except Exception:
-                self.reader = easyocr.Reader(["en"], gpu=self.gpu_mode)
+            # Il worker (e l'import di easyocr/torch) parte con start() o al primo
+            # frame: in modalita' "process" il processo figlio reimporta il modulo
+            # principale e non deve avviarne un altro.
+            self.ocr_worker = OcrWorker(self.lang_list, gpu=self.gpu_mode, mode=self.worker_mode)
         elif self.ocr_enabled and not EASY_OCR_AVAILABLE:
             self.ocr_enabled = False
 
+    @property
+    def ocr_status(self) -> str:
+        """disabled, unavailable (easyocr mancante) o lo stato del worker."""
+        if not self.ocr_requested:
+            return "disabled"
+        if self.ocr_worker is None:
+            return "unavailable"
+        return self.ocr_worker.status
+
+    def _buffer(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        """Ritorna il buffer `name`, riallocandolo solo se cambia la forma."""
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buffer
+        return buffer
+
+    def _select_roi(self) -> Optional[Tuple[int, int, int, int]]:
+        """Sceglie la regione (x, y, w, h) da passare all'OCR, None = frame intero."""
+        if self.roi_mode == "fixed":
+            return self.fixed_roi
+
+        if self.roi_mode == "tracked":
+            # Periodicamente si analizza tutto il frame per trovare testo nuovo.
+            if self.roi_refresh > 0 and self._ocr_runs % self.roi_refresh == 0:
+                return None
+            points = [pt for bbox, _, _ in self.latest_ocr_results for pt in bbox]
+            if not points:
+                return None
+            x, y, w, h = cv2.boundingRect(np.array(points, dtype=np.int32))
+            return (
+                x - self.roi_margin,
+                y - self.roi_margin,
+                w + 2 * self.roi_margin,
+                h + 2 * self.roi_margin,
+            )
+
+        return None
+
+    def _prepare_ocr_input(self, ocr_frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int], float]:
+        """Ritaglia e ridimensiona l'input OCR; ritorna anche offset e scala per il remapping."""
+        height, width = ocr_frame.shape[:2]
+        roi = self._select_roi()
+        self._ocr_runs += 1
+
+        offset = (0, 0)
+        ocr_input = ocr_frame
+        if roi is not None:
+            x, y, w, h = roi
+            x0, y0 = max(int(x), 0), max(int(y), 0)
+            x1, y1 = min(int(x + w), width), min(int(y + h), height)
+            if x1 > x0 and y1 > y0:
+                ocr_input = ocr_frame[y0:y1, x0:x1]
+                offset = (x0, y0)
+
+        scale = self.ocr_scale
+        if scale < 1.0:
+            target = (
+                max(int(ocr_input.shape[1] * scale), 1),
+                max(int(ocr_input.shape[0] * scale), 1),
+            )
+            ocr_input = cv2.resize(ocr_input, target, interpolation=cv2.INTER_AREA)
+        elif np.may_share_memory(ocr_input, ocr_frame):
+            # Il worker ha bisogno di uno snapshot stabile: il buffer verra' riusato.
+            ocr_input = ocr_input.copy()
+        return ocr_input, offset, scale
+
     def process_frame(
         self,
         frame: np.ndarray,
         size: Optional[Tuple[int, int]] = None,
+        timestamp: Optional[float] = None,
     ) -> ProcessResult:
         """
         Applica tutte le elaborazioni video centralizzate.
         - Resize opzionale.
         - Leggera normalizzazione del contrasto.
-        - OCR opzionale con overlay dei risultati.
+        - OCR opzionale (asincrono) con overlay dell'ultimo risultato.
         """
         if frame is None or frame.size == 0:
             return ProcessResult(frame=None, note="frame vuoto", results={"text_detections": []})
 
+        hook = self.stage_hook
+        clock = time.perf_counter
+        started = clock()
+
         working = frame
-        if size is not None:
-            working = cv2.resize(working, size)
+        if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+            shape = (int(size[1]), int(size[0])) + frame.shape[2:]
+            working = cv2.resize(frame, tuple(size), dst=self._buffer("resize", shape))
+
+        # Nessuna copia difensiva: ogni passo scrive in un buffer dedicato.
+        ocr_frame = cv2.cvtColor(working, cv2.COLOR_BGR2RGB, dst=self._buffer("rgb", working.shape[:2] + (3,)))
 
-        processed = cv2.cvtColor(working.copy(), cv2.COLOR_BGR2RGB)
-        ocr_frame = processed.copy()
+        if hook is not None:
+            hook("resize_color", clock() - started)
+            started = clock()
 
+        processed = ocr_frame
         if self.enable_contrast:
-            processed = cv2.convertScaleAbs(processed, alpha=self.contrast_alpha, beta=self.contrast_beta)
+            processed = cv2.LUT(ocr_frame, self.contrast_lut, dst=self._buffer("contrast", ocr_frame.shape))
+            if hook is not None:
+                hook("contrast", clock() - started)
 
-        results = {"text_detections": []}
-        if self.ocr_enabled and self.reader is not None:
+        results = {"text_detections": [], "ocr_timestamp": None}
+        if self.ocr_enabled and self.ocr_worker is not None:
+            started = clock()
             now = time.time()
             if now - self.last_ocr_time >= self.ocr_interval:
-                self.latest_ocr_results = self.reader.readtext(ocr_frame)
+                if not self.ocr_worker.ready:
+                    # Modello ancora in caricamento: nessun frame in attesa.
+                    self.ocr_worker.start()
+                # Scena invariata: si riusano i risultati in cache senza inferenza.
+                elif self.scene_gate.should_run(ocr_frame, now):
+                    ocr_input, offset, scale = self._prepare_ocr_input(ocr_frame)
+                    # Il worker prende sempre il frame piu' recente: il rendering non attende l'OCR.
+                    self.ocr_worker.submit(
+                        ocr_input,
+                        timestamp if timestamp is not None else now,
+                        offset=offset,
+                        scale=scale,
+                    )
                 self.last_ocr_time = now
 
-            for bbox, text, conf in self.latest_ocr_results:
+            latest = self.ocr_worker.latest
+            if latest is not None:
+                self.latest_ocr_results = latest.detections
+                self.latest_ocr_timestamp = latest.frame_timestamp
+                results["ocr_timestamp"] = latest.frame_timestamp
+
+            if hook is not None:
+                hook("ocr_submit", clock() - started)
+                started = clock()
+
+            detections = self.latest_ocr_results
+            tracker = self.box_tracker
+            if tracker is not None:
+                tracker.update(ocr_frame, timestamp if timestamp is not None else time.time())
+                if latest is not None and tracker.source_timestamp != latest.frame_timestamp:
+                    tracker.reset(
+                        [item for item in latest.detections if item[2] >= self.detection_threshold],
+                        latest.frame_timestamp,
+                    )
+                detections = tracker.detections
+                if hook is not None:
+                    hook("tracking", clock() - started)
+                    started = clock()
+
+            for bbox, text, conf in detections:
                 if conf < self.detection_threshold:
                     continue
                 if not bbox or len(bbox) != 4:
@@ -101,7 +276,7 @@ class ImageProcessor:
                     pts = np.array(bbox, dtype=np.int32)
                     x, y, w, h = cv2.boundingRect(pts)
                     cv2.rectangle(processed, (x, y), (x + w, y + h), self.box_color, self.box_thickness)
-                    cv2.putText(
+                    self.text_sprites.draw(
                         processed,
                         text,
                         (x, max(y - 5, 0)),
@@ -109,7 +284,6 @@ class ImageProcessor:
                         self.font_scale,
                         self.font_color,
                         self.font_thickness,
-                        cv2.LINE_AA,
                     )
                     results["text_detections"].append(
                         {
@@ -121,4 +295,7 @@ class ImageProcessor:
                 except Exception:
                     continue
 
+            if hook is not None:
+                hook("overlay", clock() - started)
+
         return ProcessResult(frame=processed, note="ok", results=results)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# Scambi tipici dell'OCR: lettera -> caratteri che possono sostituirla.
+LETTER_CONFUSIONS: Dict[str, str] = {
+    "O": "0Q",
+    "I": "1L|!",
+    "L": "1I|",
+    "S": "5$",
+    "B": "8",
+    "Z": "2",
+    "G": "6",
+}
+
+# Nell'argomento numerico le stesse lettere vanno lette come cifre.
+DIGIT_CONFUSIONS = str.maketrans("OQDIL|!SZBG", "00011115286")
+
+NUMERIC_ACTIONS = {
+    "move_forward",
+    "move_backward",
+    "move_left",
+    "move_right",
+    "move_up",
+    "move_down",
+    "rotate_clockwise",
+    "rotate_counterclockwise",
+    "set_speed",
+    "burst_photo",
+}
+
+_NUMBER_CHARS = "0-9OQDIL|!SZBG"
+
+
+def normalize_text(text: str) -> str:
+    """Maiuscolo senza accenti (GIÙ -> GIU, VELOCITÀ -> VELOCITA)."""
+    text = str(text).upper()
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _char_pattern(char: str) -> str:
+    if char == " ":
+        return r"\s+"
+    alternatives = LETTER_CONFUSIONS.get(char)
+    if alternatives:
+        return "[" + re.escape(char + alternatives) + "]"
+    return re.escape(char)
+
+
+def _keyword_tokens(keyword: str) -> str:
+    # Spazi multipli nel keyword collassano in un solo separatore.
+    return " ".join(normalize_text(keyword).split())
+
+
+def _trie_pattern(node: Dict[str, Any]) -> str:
+    """
+    Regex di un nodo del trie: i prefissi comuni vengono valutati una volta
+    sola. Il gruppo vuoto che marca la fine di un keyword e' l'ultima
+    alternativa, cosi' viene preferita la continuazione piu' lunga.
+    """
+    branches = [
+        _char_pattern(char) + _trie_pattern(child)
+        for char, child in sorted(node.items(), key=lambda item: item[0])
+        if char != ""
+    ]
+    if "" in node:
+        branches.append(f"(?P<{node['']}>)")
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+def parse_number(token: str) -> Optional[int]:
+    """Converte un argomento letto dall'OCR ("9O" -> 90, "1OO" -> 100)."""
+    digits = token.upper().translate(DIGIT_CONFUSIONS)
+    return int(digits) if digits.isdigit() else None
+
+
+class KeywordMatcher:
+    """
+    Tabella delle parole chiave compilata in un'unica regex a trie.
+    A parita' di posizione vince il match piu' lungo (RUOTA DESTRA prima di
+    DESTRA) e i keyword sono delimitati ai bordi di parola (SU non scatta
+    dentro SUD). Ogni
+    lettera accetta gli scambi tipici dell'OCR; il numero che segue il
+    keyword diventa l'argomento. Una sola passata estrae tutti i comandi.
+    """
+
+    def __init__(self, keywords: Dict[str, str]):
+        self.keywords = dict(keywords)
+        self._actions: Dict[str, str] = {}
+
+        trie: Dict[str, Any] = {}
+        for index, keyword in enumerate(sorted(self.keywords)):
+            tokens = _keyword_tokens(keyword)
+            if not tokens:
+                continue
+            node = trie
+            for char in tokens:
+                node = node.setdefault(char, {})
+            group = f"k{index}"
+            node[""] = group
+            self._actions[group] = self.keywords[keyword]
+
+        number = f"[{_NUMBER_CHARS}]*[0-9][{_NUMBER_CHARS}]*"
+        self._pattern = re.compile(rf"(?<![A-Z0-9]){_trie_pattern(trie)}")
+        # L'argomento segue il keyword (anche attaccato: AVANTI50) fino al bordo di parola.
+        self._argument = re.compile(rf"\s*({number})(?:\s*(?:CM|GRADI|°))?(?![A-Z0-9])")
+        self._boundary = re.compile(r"(?![A-Z0-9])")
+
+    def iter_commands(self, text: str) -> Iterator[Tuple[str, Any]]:
+        """Comandi (azione, argomento) nell'ordine in cui compaiono."""
+        if not text:
+            return
+        normalized = normalize_text(text)
+        position = 0
+        while True:
+            match = self._pattern.search(normalized, position)
+            if match is None:
+                return
+            action = self._actions[match.lastgroup]
+            argument = self._argument.match(normalized, match.end())
+            if argument is not None:
+                position = argument.end()
+                value = parse_number(argument.group(1)) if action in NUMERIC_ACTIONS else None
+                yield action, value
+            elif self._boundary.match(normalized, match.end()):
+                position = match.end()
+                yield action, None
+            else:
+                # Keyword dentro una parola piu' lunga (SU in SUD): si prosegue.
+                position = match.start() + 1
+
+    def find_all(self, text: str) -> List[Tuple[str, Any]]:
+        """Tutti i comandi del testo in una sola passata."""
+        return list(self.iter_commands(text))
+
+    def match(self, text: str) -> Optional[Tuple[str, Any]]:
+        """Primo comando del testo, o None."""
+        return next(self.iter_commands(text), None)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+# Bucket in secondi: da mezzo millisecondo (fasi video) a 10 s (comandi Tello).
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+    """Istogramma cumulativo in formato Prometheus, con una label opzionale."""
+
+    def __init__(self, name: str, help_text: str, label: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label -> [conteggi per bucket (+Inf in coda), somma, totale]
+        self._series: Dict[str, List] = {}
+
+    def observe(self, value: float, label_value: str = "") -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[label_value] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+        for label_value, (counts, total, count) in sorted(snapshot.items()):
+            base = {self.label: label_value} if self.label else {}
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = dict(base, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Raccolta delle metriche runtime, esposte su /metrics in formato testo
+    Prometheus. Gauge e counter sono callback valutate solo allo scrape,
+    cosi' il percorso caldo paga solo le osservazioni degli istogrammi.
+    """
+
+    def __init__(self, prefix: str = "tello"):
+        self.prefix = prefix
+        self._histograms: Dict[str, Histogram] = {}
+        self._callbacks: List[Tuple[str, str, str, Callable[[], float]]] = []
+
+        self.stages = self.histogram("stage_seconds", "Durata delle fasi della pipeline video", label="stage")
+        self.commands = self.histogram("command_seconds", "Durata dei comandi inviati al drone", label="action")
+
+    def histogram(self, name: str, help_text: str, label: str = "") -> Histogram:
+        full_name = f"{self.prefix}_{name}"
+        if full_name not in self._histograms:
+            self._histograms[full_name] = Histogram(full_name, help_text, label=label)
+        return self._histograms[full_name]
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], float]) -> None:
+        self._callbacks.append((f"{self.prefix}_{name}", help_text, "gauge", callback))
+
+    def counter(self, name: str, help_text: str, callback: Callable[[], float]) -> None:
+        self._callbacks.append((f"{self.prefix}_{name}", help_text, "counter", callback))
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Firma compatibile con gli stage_hook di pipeline e processor."""
+        self.stages.observe(seconds, stage)
+
+    def observe_command(self, action: str, seconds: float) -> None:
+        """Firma compatibile con il command_hook di DroneActionExecutor."""
+        self.commands.observe(seconds, action)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms.values():
+            lines.extend(histogram.render())
+        for name, help_text, kind, callback in self._callbacks:
+            try:
+                value = float(callback())
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value!r}")
+        return "\n".join(lines) + "\n"
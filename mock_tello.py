@@ -0,0 +1,571 @@
+from __future__ import annotations
+
+import argparse
+import math
+import queue
+import random
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+DRONE_BACKENDS = ("tello", "mock")
+
+# Limiti dei parametri secondo l'SDK Tello.
+MOVE_RANGE = (20, 500)
+ROTATION_RANGE = (1, 360)
+SPEED_RANGE = (10, 100)
+GO_RANGE = (-500, 500)
+
+MOVE_DIRECTIONS = {
+    # Angolo rispetto al muso (gradi, orario) e spostamento verticale.
+    "forward": (0.0, 0),
+    "back": (180.0, 0),
+    "right": (90.0, 0),
+    "left": (-90.0, 0),
+    "up": (None, 1),
+    "down": (None, -1),
+}
+FLIP_DIRECTIONS = ("f", "b", "l", "r")
+
+
+def parse_state(text: str) -> Dict[str, Any]:
+    """Pacchetto di stato "pitch:0;roll:0;...;" -> dict, come djitellopy."""
+    state: Dict[str, Any] = {}
+    for field in text.strip().split(";"):
+        key, separator, value = field.partition(":")
+        if not separator:
+            continue
+        if key == "mpry":
+            state[key] = value
+            continue
+        try:
+            state[key] = int(value)
+        except ValueError:
+            try:
+                state[key] = float(value)
+            except ValueError:
+                state[key] = value
+    return state
+
+
+class TelloSdkError(Exception):
+    """Risposta diversa da "ok" a un comando di controllo, come TelloException di djitellopy."""
+
+
+class TelloSimulator:
+    """
+    Stato cinematico di un Tello e interprete dei comandi SDK testuali
+    ("takeoff", "forward 50", "cw 90", "battery?"...).
+    Ogni comando dura la latenza dell'ack piu' il tempo di volo calcolato
+    da distanza e velocita'; `time_scale` scala l'attesa reale (0 = nessuna
+    attesa, 1 = tempo reale) senza cambiare il consumo di batteria simulato.
+    `emergency` e' accettato anche mentre un altro comando e' in corso e lo
+    interrompe, come sul drone.
+    """
+
+    def __init__(
+        self,
+        time_scale: float = 1.0,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        speed: float = 50.0,
+        rotation_speed: float = 90.0,
+        takeoff_seconds: float = 4.0,
+        land_seconds: float = 3.0,
+        flip_seconds: float = 2.0,
+        battery: float = 100.0,
+        drain_per_second: float = 0.15,
+        drain_per_command: float = 0.02,
+        error_rate: float = 0.0,
+        airborne: bool = False,
+        seed: Optional[int] = None,
+    ):
+        self.time_scale = max(float(time_scale), 0.0)
+        self.latency = max(float(latency), 0.0)
+        self.jitter = max(float(jitter), 0.0)
+        self.rotation_speed = max(float(rotation_speed), 1.0)
+        self.takeoff_seconds = float(takeoff_seconds)
+        self.land_seconds = float(land_seconds)
+        self.flip_seconds = float(flip_seconds)
+        self.drain_per_second = float(drain_per_second)
+        self.drain_per_command = float(drain_per_command)
+        self.error_rate = min(max(float(error_rate), 0.0), 1.0)
+
+        # Posizione in cm (x avanti, y destra, z quota) e yaw in gradi rispetto al decollo.
+        self.x = 0.0
+        self.y = 0.0
+        self.z = 80.0 if airborne else 0.0
+        self.yaw = 0.0
+        self.speed = min(max(float(speed), SPEED_RANGE[0]), SPEED_RANGE[1])
+        self.battery = min(max(float(battery), 0.0), 100.0)
+        self.flying = bool(airborne)
+        self.flight_seconds = 0.0
+
+        self.commands = 0
+        self.errors = 0
+        self.emergencies = 0
+        # perf_counter dell'ultimo `emergency` ricevuto, per misurarne la latenza.
+        self.emergency_at: Optional[float] = None
+        self.last_command: Optional[str] = None
+
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        self._generation = 0
+
+    def handle(self, line: str) -> str:
+        """Esegue un comando SDK e ritorna la risposta testuale."""
+        parts = str(line).strip().split()
+        if not parts:
+            return "error"
+        name, args = parts[0].lower(), parts[1:]
+
+        if name == "emergency":
+            return self._emergency()
+        if name.endswith("?"):
+            return self._read(name)
+
+        with self._cond:
+            self.commands += 1
+            self.last_command = " ".join(parts)
+            generation = self._generation
+            try:
+                duration, target = self._plan(name, args)
+            except TelloSdkError as e:
+                self.errors += 1
+                duration, target = self._ack(), None
+                response = str(e)
+            else:
+                response = "ok"
+                if target is not None and self._rng.random() < self.error_rate:
+                    # Errore casuale: il drone risponde "error" e resta dov'e'.
+                    self.errors += 1
+                    target, response = None, "error"
+
+        self._wait(duration, generation)
+
+        with self._cond:
+            if self._generation != generation:
+                # Emergency arrivato durante il comando: motori spenti.
+                return "error Motor stop"
+            self._drain(duration)
+            if target is not None:
+                self._apply(target)
+            if self.battery <= 0.0 and self.flying:
+                self.flying = False
+                self.z = 0.0
+        return response
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "x": round(self.x, 1),
+                "y": round(self.y, 1),
+                "z": round(self.z, 1),
+                "yaw": round(self.yaw, 1),
+                "speed": self.speed,
+                "battery": round(self.battery, 2),
+                "flying": self.flying,
+                "flight_seconds": round(self.flight_seconds, 2),
+                "commands": self.commands,
+                "errors": self.errors,
+                "emergencies": self.emergencies,
+                "last_command": self.last_command,
+            }
+
+    def state_string(self) -> str:
+        """Pacchetto di stato nel formato del Tello (porta 8890)."""
+        with self._cond:
+            yaw = int(round((self.yaw + 180.0) % 360.0 - 180.0))
+            return (
+                f"mid:-1;x:0;y:0;z:0;mpry:0,0,0;pitch:0;roll:0;yaw:{yaw};"
+                f"vgx:0;vgy:0;vgz:0;templ:60;temph:63;tof:{int(self.z) + 10};h:{int(self.z)};"
+                f"bat:{int(self.battery)};baro:{self.z / 100.0:.2f};time:{int(self.flight_seconds)};"
+                "agx:0.00;agy:0.00;agz:-1000.00;\r\n"
+            )
+
+    def _ack(self) -> float:
+        return self.latency + (self._rng.uniform(0.0, self.jitter) if self.jitter else 0.0)
+
+    def _read(self, name: str) -> str:
+        with self._cond:
+            values = {
+                "battery?": str(int(self.battery)),
+                "speed?": f"{self.speed:.1f}",
+                "height?": f"{int(self.z // 10)}dm",
+                "time?": f"{int(self.flight_seconds)}s",
+                "sdk?": "20",
+                "sn?": "0TQZMOCK000000",
+            }
+        return values.get(name, f"unknown command: {name}")
+
+    def _emergency(self) -> str:
+        with self._cond:
+            self.emergency_at = time.perf_counter()
+            self.commands += 1
+            self.emergencies += 1
+            self.last_command = "emergency"
+            self.flying = False
+            self.z = 0.0
+            self._generation += 1
+            self._cond.notify_all()
+        return "ok"
+
+    def _wait(self, duration: float, generation: int) -> None:
+        seconds = duration * self.time_scale
+        if seconds <= 0:
+            return
+        with self._cond:
+            self._cond.wait_for(lambda: self._generation != generation, seconds)
+
+    def _drain(self, duration: float) -> None:
+        drain = self.drain_per_command
+        if self.flying:
+            drain += self.drain_per_second * duration
+            self.flight_seconds += duration
+        self.battery = max(self.battery - drain, 0.0)
+
+    def _plan(self, name: str, args: list) -> Tuple[float, Optional[Dict[str, float]]]:
+        """Durata simulata del comando e stato finale, o TelloSdkError."""
+        if name in ("command", "streamon", "streamoff"):
+            return self._ack(), None
+
+        if name == "speed":
+            speed = _int_arg(args, 0, SPEED_RANGE)
+            return self._ack(), {"speed": float(speed)}
+
+        if name == "takeoff":
+            if self.flying:
+                raise TelloSdkError("error Already flying")
+            if self.battery < 10:
+                raise TelloSdkError("error Low battery")
+            return self._ack() + self.takeoff_seconds, {"flying": True, "z": 80.0}
+
+        if not self.flying:
+            raise TelloSdkError("error Not flying")
+
+        if name == "land":
+            return self._ack() + self.land_seconds, {"flying": False, "z": 0.0}
+
+        if name in MOVE_DIRECTIONS:
+            distance = _int_arg(args, 0, MOVE_RANGE)
+            heading, vertical = MOVE_DIRECTIONS[name]
+            if vertical:
+                z = self.z + vertical * distance
+                if z < 20:
+                    raise TelloSdkError("error Out of range")
+                return self._ack() + distance / self.speed, {"z": z}
+            radians = math.radians(self.yaw + heading)
+            target = {"x": self.x + distance * math.cos(radians), "y": self.y + distance * math.sin(radians)}
+            return self._ack() + distance / self.speed, target
+
+        if name in ("cw", "ccw"):
+            angle = _int_arg(args, 0, ROTATION_RANGE)
+            yaw = self.yaw + (angle if name == "cw" else -angle)
+            return self._ack() + angle / self.rotation_speed, {"yaw": yaw % 360.0}
+
+        if name == "go":
+            x, y, z = (_int_arg(args, index, GO_RANGE) for index in range(3))
+            speed = _int_arg(args, 3, SPEED_RANGE)
+            if all(-20 <= value <= 20 for value in (x, y, z)):
+                raise TelloSdkError("error Out of range")
+            if self.z + z < 20:
+                raise TelloSdkError("error Out of range")
+            # go usa il riferimento del drone: x avanti, y sinistra, z su.
+            radians = math.radians(self.yaw)
+            left = math.radians(self.yaw - 90.0)
+            target = {
+                "x": self.x + x * math.cos(radians) + y * math.cos(left),
+                "y": self.y + x * math.sin(radians) + y * math.sin(left),
+                "z": self.z + z,
+            }
+            return self._ack() + math.sqrt(x * x + y * y + z * z) / speed, target
+
+        if name == "flip":
+            if not args or args[0].lower() not in FLIP_DIRECTIONS:
+                raise TelloSdkError("error")
+            if self.battery < 50:
+                raise TelloSdkError("error Battery too low for flip")
+            return self._ack() + self.flip_seconds, {}
+
+        raise TelloSdkError(f"unknown command: {name}")
+
+    def _apply(self, target: Dict[str, float]) -> None:
+        for key, value in target.items():
+            setattr(self, key, value)
+
+
+def _int_arg(args: list, index: int, limits: Tuple[int, int]) -> int:
+    try:
+        value = int(args[index])
+    except (IndexError, ValueError):
+        raise TelloSdkError("error") from None
+    if not limits[0] <= value <= limits[1]:
+        raise TelloSdkError("error Out of range")
+    return value
+
+
+class MockTello:
+    """
+    Sostituto in-process di djitellopy.Tello per il DroneActionExecutor.
+    Espone gli stessi metodi usati dal progetto e li traduce nei comandi SDK
+    testuali del simulatore: un comando rifiutato solleva TelloSdkError.
+    Non ha video: con il backend mock la sorgente video va presa da file o
+    dal generatore sintetico.
+    """
+
+    def __init__(self, simulator: Optional[TelloSimulator] = None, **kwargs: Any):
+        self.simulator = simulator or TelloSimulator(**kwargs)
+        self.stream_on = False
+        # Stand-in UDP sullo stesso simulatore, se avviato da create_mock_tello.
+        self.udp_server: Optional[TelloUdpServer] = None
+
+    @property
+    def is_flying(self) -> bool:
+        return self.simulator.flying
+
+    def send_control_command(self, command: str, timeout: Optional[float] = None) -> bool:
+        response = self.simulator.handle(command)
+        if response.lower() != "ok":
+            raise TelloSdkError(f"Command '{command}' was unsuccessful. Message: {response}")
+        return True
+
+    def send_read_command(self, command: str) -> str:
+        return self.simulator.handle(command)
+
+    def connect(self, wait_for_state: bool = True) -> None:
+        self.send_control_command("command")
+
+    def streamon(self) -> None:
+        self.send_control_command("streamon")
+        self.stream_on = True
+
+    def streamoff(self) -> None:
+        self.send_control_command("streamoff")
+        self.stream_on = False
+
+    def get_frame_read(self, *args: Any, **kwargs: Any) -> Any:
+        raise TelloSdkError("Il simulatore non ha uno stream video")
+
+    def takeoff(self) -> None:
+        self.send_control_command("takeoff")
+
+    def land(self) -> None:
+        self.send_control_command("land")
+
+    def emergency(self) -> None:
+        self.send_control_command("emergency")
+
+    def move_forward(self, x: int) -> None:
+        self.send_control_command(f"forward {x}")
+
+    def move_back(self, x: int) -> None:
+        self.send_control_command(f"back {x}")
+
+    def move_left(self, x: int) -> None:
+        self.send_control_command(f"left {x}")
+
+    def move_right(self, x: int) -> None:
+        self.send_control_command(f"right {x}")
+
+    def move_up(self, x: int) -> None:
+        self.send_control_command(f"up {x}")
+
+    def move_down(self, x: int) -> None:
+        self.send_control_command(f"down {x}")
+
+    def rotate_clockwise(self, x: int) -> None:
+        self.send_control_command(f"cw {x}")
+
+    def rotate_counter_clockwise(self, x: int) -> None:
+        self.send_control_command(f"ccw {x}")
+
+    def go_xyz_speed(self, x: int, y: int, z: int, speed: int) -> None:
+        self.send_control_command(f"go {x} {y} {z} {speed}")
+
+    def flip_forward(self) -> None:
+        self.send_control_command("flip f")
+
+    def flip_back(self) -> None:
+        self.send_control_command("flip b")
+
+    def flip_left(self) -> None:
+        self.send_control_command("flip l")
+
+    def flip_right(self) -> None:
+        self.send_control_command("flip r")
+
+    def set_speed(self, x: int) -> None:
+        self.send_control_command(f"speed {x}")
+
+    def get_battery(self) -> int:
+        return int(self.send_read_command("battery?"))
+
+    def get_height(self) -> int:
+        return int(self.simulator.z)
+
+    def get_current_state(self) -> Dict[str, Any]:
+        """Ultimo pacchetto di stato, nello stesso formato di djitellopy."""
+        return parse_state(self.simulator.state_string())
+
+    def end(self) -> None:
+        if self.udp_server is not None:
+            self.udp_server.stop()
+
+
+class TelloUdpServer:
+    """
+    Stand-in UDP del Tello su localhost: comandi SDK testuali sulla porta
+    di controllo, risposte allo stesso indirizzo e pacchetti di stato verso
+    `state_port` del client dopo il primo "command".
+    I comandi vengono eseguiti in ordine da un solo thread, come sul drone;
+    `emergency` viene gestito subito dal thread di ricezione.
+    djitellopy occupa localmente la porta 8889: per usarlo sulla stessa
+    macchina serve un'altra porta o un altro host.
+    """
+
+    def __init__(
+        self,
+        simulator: TelloSimulator,
+        host: str = "127.0.0.1",
+        port: int = 8889,
+        state_port: int = 8890,
+        state_interval: float = 0.1,
+    ):
+        self.simulator = simulator
+        self.host = host
+        self.port = int(port)
+        self.state_port = int(state_port)
+        self.state_interval = float(state_interval)
+        self.address: Optional[Tuple[str, int]] = None
+
+        self._socket: Optional[socket.socket] = None
+        self._commands: "queue.Queue[Optional[Tuple[str, Tuple[str, int]]]]" = queue.Queue()
+        self._client: Optional[Tuple[str, int]] = None
+        self._stop = threading.Event()
+        self._threads: list = []
+
+    def start(self) -> Tuple[str, int]:
+        """Apre il socket (porta 0 = porta libera) e ritorna l'indirizzo effettivo."""
+        if self._socket is not None:
+            return self.address
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((self.host, self.port))
+        sock.settimeout(0.5)
+        self._socket = sock
+        self.address = sock.getsockname()
+        self._stop.clear()
+        for target, name in ((self._receive, "tello-udp-rx"), (self._execute, "tello-udp-exec"), (self._send_state, "tello-udp-state")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self.address
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._commands.put(None)
+        for thread in self._threads:
+            thread.join(1.0)
+        self._threads = []
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _reply(self, response: str, address: Tuple[str, int]) -> None:
+        try:
+            self._socket.sendto(response.encode("utf-8"), address)
+        except OSError:
+            pass
+
+    def _receive(self) -> None:
+        while not self._stop.is_set():
+            try:
+                data, address = self._socket.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            line = data.decode("utf-8", errors="replace").strip()
+            if line.lower() == "command":
+                self._client = address
+            if line.lower() == "emergency":
+                self._reply(self.simulator.handle(line), address)
+                continue
+            self._commands.put((line, address))
+
+    def _execute(self) -> None:
+        while not self._stop.is_set():
+            item = self._commands.get()
+            if item is None:
+                return
+            line, address = item
+            self._reply(self.simulator.handle(line), address)
+
+    def _send_state(self) -> None:
+        state_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            while not self._stop.wait(self.state_interval):
+                client = self._client
+                if client is None:
+                    continue
+                try:
+                    state_socket.sendto(self.simulator.state_string().encode("utf-8"), (client[0], self.state_port))
+                except OSError:
+                    continue
+        finally:
+            state_socket.close()
+
+
+def create_mock_tello(mock_cfg: Dict[str, Any]) -> MockTello:
+    """MockTello da config (`drone.mock`), con lo stand-in UDP sullo stesso simulatore se abilitato."""
+    simulator = TelloSimulator(
+        time_scale=float(mock_cfg.get("time_scale", 1.0)),
+        latency=float(mock_cfg.get("latency", 0.05)),
+        jitter=float(mock_cfg.get("jitter", 0.0)),
+        speed=float(mock_cfg.get("speed", 50.0)),
+        rotation_speed=float(mock_cfg.get("rotation_speed", 90.0)),
+        battery=float(mock_cfg.get("battery", 100.0)),
+        drain_per_second=float(mock_cfg.get("drain_per_second", 0.15)),
+        drain_per_command=float(mock_cfg.get("drain_per_command", 0.02)),
+        error_rate=float(mock_cfg.get("error_rate", 0.0)),
+        seed=mock_cfg.get("seed"),
+    )
+    client = MockTello(simulator)
+    udp_cfg = mock_cfg.get("udp", {})
+    if udp_cfg.get("enabled", False):
+        client.udp_server = TelloUdpServer(
+            simulator,
+            host=str(udp_cfg.get("host", "127.0.0.1")),
+            port=int(udp_cfg.get("port", 8889)),
+            state_port=int(udp_cfg.get("state_port", 8890)),
+        )
+        client.udp_server.start()
+    return client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in UDP del Tello (SDK testuale) su localhost.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8889)
+    parser.add_argument("--state-port", type=int, default=8890)
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = TelloSimulator(time_scale=args.time_scale, latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    server = TelloUdpServer(simulator, host=args.host, port=args.port, state_port=args.state_port)
+    host, port = server.start()
+    print(f"Tello simulato in ascolto su {host}:{port} (stato verso la porta {args.state_port})")
+    try:
+        while True:
+            time.sleep(5.0)
+            print(simulator.snapshot())
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
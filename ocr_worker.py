@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import importlib.util
+import multiprocessing
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# easyocr (e torch) vengono importati solo quando il worker carica il
+# modello, in background: qui basta sapere se il pacchetto e' installato.
+EASY_OCR_AVAILABLE = importlib.util.find_spec("easyocr") is not None
+
+
+WORKER_MODES = ("thread", "process")
+# idle: non avviato, loading: import e modello, warming_up: inferenza di prova.
+WORKER_STATES = ("idle", "loading", "warming_up", "ready", "error")
+WARMUP_SHAPE = (96, 320, 3)
+
+
+@dataclass
+class OcrRequest:
+    """
+    Frame da analizzare. `offset` e `scale` descrivono come l'input OCR
+    (ritaglio ROI eventualmente ridimensionato) si mappa sul frame intero.
+    """
+
+    frame: np.ndarray
+    timestamp: float
+    offset: Tuple[int, int] = (0, 0)
+    scale: float = 1.0
+
+
+@dataclass
+class OcrResult:
+    """Risultato OCR completato, legato al timestamp del frame analizzato."""
+
+    detections: List[Any] = field(default_factory=list)
+    frame_timestamp: float = 0.0
+    completed_at: float = 0.0
+    duration: float = 0.0
+
+
+class LatestSlot:
+    """
+    Mailbox a un solo posto: un nuovo elemento sostituisce quello non
+    ancora letto, cosi' il worker analizza sempre il frame piu' recente.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item: Any = None
+        self.replaced = 0
+
+    def put(self, item: Any) -> None:
+        with self._cond:
+            if self._item is not None:
+                self.replaced += 1
+            self._item = item
+            self._cond.notify()
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Any]:
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+def remap_detections(detections: List[Any], offset: Tuple[int, int], scale: float) -> List[Any]:
+    """Riporta i box easyocr dalle coordinate dell'input OCR a quelle del frame intero."""
+    offset_x, offset_y = offset
+    if offset_x == 0 and offset_y == 0 and scale == 1.0:
+        return detections
+
+    remapped = []
+    for bbox, text, conf in detections:
+        points = [
+            [int(round(pt[0] / scale)) + offset_x, int(round(pt[1] / scale)) + offset_y]
+            for pt in bbox
+        ]
+        remapped.append((points, text, conf))
+    return remapped
+
+
+def create_reader(lang_list: Sequence[str], gpu: bool) -> Any:
+    """Importa easyocr e costruisce il reader, con fallback su inglese."""
+    import easyocr
+
+    try:
+        return easyocr.Reader(list(lang_list), gpu=gpu)
+    except Exception:
+        return easyocr.Reader(["en"], gpu=gpu)
+
+
+def _ocr_process_main(conn: Any, lang_list: Sequence[str], gpu: bool) -> None:
+    """Entry point del processo OCR separato: riceve frame, risponde detections."""
+    reader = create_reader(lang_list, gpu)
+    conn.send("ready")
+    while True:
+        try:
+            frame = conn.recv()
+        except (EOFError, OSError):
+            break
+        if frame is None:
+            break
+        try:
+            conn.send(reader.readtext(frame))
+        except Exception as e:
+            conn.send(e)
+
+
+class OcrWorker:
+    """
+    Esegue easyocr fuori dal loop video.
+    In modalita' "thread" usa un thread dedicato, in modalita' "process"
+    delega l'inferenza a un processo separato per non contendere il GIL
+    con Flask e con l'encoder.
+    """
+
+    def __init__(self, lang_list: Sequence[str], gpu: bool = False, mode: str = "thread"):
+        self.lang_list = list(lang_list)
+        self.gpu = bool(gpu)
+        self.mode = mode if mode in WORKER_MODES else "thread"
+
+        self.latest: Optional[OcrResult] = None
+        self.error: Optional[str] = None
+        self.listeners: List[Callable[[OcrResult], None]] = []
+        self.status = "idle"
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+        self._start_lock = threading.Lock()
+        self._slot = LatestSlot()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reader: Any = None
+        self._process: Any = None
+        self._conn: Any = None
+
+    def add_listener(self, callback: Callable[[OcrResult], None]) -> None:
+        """Registra una callback invocata (sul thread del worker) a ogni risultato."""
+        self.listeners.append(callback)
+
+    @property
+    def available(self) -> bool:
+        return EASY_OCR_AVAILABLE
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self) -> None:
+        """Avvia il worker: import, caricamento del modello e warm-up in background."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.status = "loading"
+            self._thread = threading.Thread(target=self._run, name="ocr-worker", daemon=True)
+            self._thread.start()
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "mode": self.mode,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._slot.put(None)
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except Exception:
+                pass
+        if self._process is not None:
+            self._process.join(timeout=2.0)
+
+    def submit(
+        self,
+        frame: np.ndarray,
+        timestamp: float,
+        offset: Tuple[int, int] = (0, 0),
+        scale: float = 1.0,
+    ) -> None:
+        """Consegna un frame al worker; l'eventuale frame in attesa viene scartato."""
+        self.start()
+        self._slot.put(OcrRequest(frame=frame, timestamp=timestamp, offset=offset, scale=scale))
+
+    def _setup(self) -> None:
+        if self.mode == "process":
+            ctx = multiprocessing.get_context("spawn")
+            parent_conn, child_conn = ctx.Pipe()
+            self._process = ctx.Process(
+                target=_ocr_process_main,
+                args=(child_conn, self.lang_list, self.gpu),
+                name="ocr-process",
+                daemon=True,
+            )
+            self._process.start()
+            self._conn = parent_conn
+            # Attende che il modello sia caricato nel processo figlio.
+            self._conn.recv()
+        else:
+            self._reader = create_reader(self.lang_list, self.gpu)
+
+    def _infer(self, frame: np.ndarray) -> List[Any]:
+        if self._conn is not None:
+            self._conn.send(frame)
+            reply = self._conn.recv()
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+        return self._reader.readtext(frame)
+
+    def _warm_up(self) -> None:
+        # Prima inferenza su un frame vuoto: allocazioni e inizializzazioni
+        # lazy di torch non ricadono sul primo frame reale.
+        self._infer(np.zeros(WARMUP_SHAPE, dtype=np.uint8))
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        try:
+            self._setup()
+            self.load_seconds = time.perf_counter() - started
+            self.status = "warming_up"
+            started = time.perf_counter()
+            self._warm_up()
+            self.warmup_seconds = time.perf_counter() - started
+        except Exception as e:
+            self.error = str(e)
+            self.status = "error"
+            return
+        self.status = "ready"
+
+        while not self._stop.is_set():
+            request = self._slot.take(timeout=0.5)
+            if request is None:
+                continue
+
+            started = time.perf_counter()
+            try:
+                detections = remap_detections(self._infer(request.frame), request.offset, request.scale)
+            except (EOFError, OSError) as e:
+                # Processo OCR terminato: inutile continuare.
+                self.error = str(e)
+                self.status = "error"
+                return
+            except Exception as e:
+                self.error = str(e)
+                continue
+
+            result = OcrResult(
+                detections=detections,
+                frame_timestamp=request.timestamp,
+                completed_at=time.time(),
+                duration=time.perf_counter() - started,
+            )
+            self.latest = result
+            for callback in self.listeners:
+                try:
+                    callback(result)
+                except Exception:
+                    continue
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+PHOTO_SOURCES = ("raw", "processed")
+
+
+class PhotoCapture:
+    """
+    Scatti fotografici senza I/O sul thread chiamante.
+    La pipeline alimenta un ring buffer con gli ultimi frame; capture() e
+    burst() scelgono i frame, calcolano il percorso e affidano compressione
+    e scrittura su disco a un pool di thread, ritornando subito.
+    Il burst prende i frame dagli ultimi `pre_seconds` secondi: l'istante
+    prima che il comando arrivasse.
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "photos",
+        source: str = "raw",
+        ring_size: int = 30,
+        workers: int = 2,
+        extension: str = "jpg",
+        jpeg_quality: int = 92,
+        frame_provider: Optional[Callable[[], Any]] = None,
+    ):
+        self.output_dir = output_dir
+        self.source = source if source in PHOTO_SOURCES else "raw"
+        self.extension = extension.lstrip(".").lower() or "jpg"
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)] if self.extension in ("jpg", "jpeg") else []
+        # Ripiego (FramePacket o None) quando il ring e' vuoto, es. pipeline ferma.
+        self.frame_provider = frame_provider
+
+        self.saved = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+        self._ring: Deque[Tuple[float, np.ndarray]] = deque(maxlen=max(int(ring_size), 1))
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(int(workers), 1), thread_name_prefix="photo-io")
+        self._counter = 0
+
+    def push(self, frame: np.ndarray, timestamp: float) -> None:
+        """
+        Aggiunge un frame al ring. I frame grezzi sono array nuovi a ogni
+        decodifica e vengono tenuti senza copia; quelli elaborati sono un
+        buffer riusato e vanno copiati.
+        """
+        if frame is None:
+            return
+        if self.source == "processed":
+            frame = frame.copy()
+        with self._lock:
+            self._ring.append((timestamp, frame))
+
+    def capture(self, filename: Optional[str] = None) -> Dict[str, Any]:
+        """Scatta con l'ultimo frame disponibile; ritorna percorso e timestamp."""
+        frames = self._select(1, None)
+        if not frames:
+            raise RuntimeError("Nessun frame disponibile")
+        timestamp, frame, rgb = frames[-1]
+        path = self._path(filename, timestamp)
+        future = self._pool.submit(self._write, path, frame, rgb)
+        return {"path": path, "timestamp": timestamp, "future": future}
+
+    def burst(self, count: int = 5, pre_seconds: float = 1.0, trigger_time: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Salva fino a `count` frame dei `pre_seconds` secondi precedenti a
+        `trigger_time` (default: adesso), distribuiti uniformemente.
+        """
+        trigger_time = time.time() if trigger_time is None else trigger_time
+        frames = self._select(max(int(count), 1), (trigger_time - float(pre_seconds), trigger_time))
+        if not frames:
+            raise RuntimeError("Nessun frame disponibile")
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        photos = []
+        futures: List[Future] = []
+        for index, (timestamp, frame, rgb) in enumerate(frames):
+            path = self._path(f"burst_{stamp}_{index:02d}.{self.extension}", timestamp)
+            futures.append(self._pool.submit(self._write, path, frame, rgb))
+            photos.append({"path": path, "timestamp": timestamp})
+        return {"photos": photos, "futures": futures}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._ring)
+        return {
+            "source": self.source,
+            "buffered": buffered,
+            "saved": self.saved,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def _select(self, count: int, window: Optional[Tuple[float, float]]) -> List[Tuple[float, np.ndarray, bool]]:
+        """Frame scelti come (timestamp, frame, rgb)."""
+        # I frame grezzi sono RGB; quelli elaborati hanno gia' l'ordine usato da imencode.
+        rgb = self.source == "raw"
+        with self._lock:
+            frames = [(timestamp, frame, rgb) for timestamp, frame in self._ring]
+
+        if not frames and self.frame_provider is not None:
+            packet = self.frame_provider()
+            if packet is not None and packet.frame is not None:
+                # Il frame del feed e' sempre grezzo.
+                return [(packet.timestamp, packet.frame, True)]
+
+        if window is not None and frames:
+            start, end = window
+            selected = [item for item in frames if start <= item[0] <= end]
+            # Pipeline in ritardo o ferma: si ripiega sull'ultimo frame disponibile.
+            frames = selected or frames[-1:]
+        if len(frames) > count:
+            step = len(frames) / count
+            frames = [frames[int(index * step)] for index in range(count - 1)] + [frames[-1]]
+        return frames
+
+    def _path(self, filename: Optional[str], timestamp: float) -> str:
+        if not filename:
+            with self._lock:
+                self._counter += 1
+                counter = self._counter
+            moment = datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+            filename = f"photo_{moment}_{counter:03d}.{self.extension}"
+        if os.path.dirname(filename):
+            return filename
+        return os.path.join(self.output_dir, filename)
+
+    def _write(self, path: str, frame: np.ndarray, rgb: bool) -> str:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if rgb:
+                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            if not cv2.imwrite(path, frame, self.params):
+                raise RuntimeError(f"Scrittura fallita: {path}")
+            self.saved += 1
+            return path
+        except Exception as e:
+            self.failed += 1
+            self.last_error = str(e)
+            raise
+
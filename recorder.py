@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+from collections import deque
+from datetime import datetime
+from fractions import Fraction
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import av
+
+    AV_AVAILABLE = True
+except Exception:
+    av = None
+    AV_AVAILABLE = False
+
+
+RECORDING_SOURCES = ("processed", "raw")
+DROP_POLICIES = ("oldest", "newest")
+
+# Timestamp dei frame in millisecondi: il video conserva il ritmo reale
+# anche quando alcuni frame vengono scartati.
+TIME_BASE = Fraction(1, 1000)
+
+
+class VideoRecorder:
+    """
+    Registrazione MP4/H.264 con PyAV su un thread dedicato.
+    La pipeline consegna i frame con write(), che non blocca mai: i frame
+    finiscono in una coda limitata e, se l'encoder resta indietro, viene
+    scartato il piu' vecchio in coda ("oldest") o quello in arrivo ("newest").
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "recordings",
+        source: str = "processed",
+        fps: float = 30.0,
+        queue_size: int = 60,
+        drop_policy: str = "oldest",
+        codec: str = "libx264",
+        crf: int = 23,
+        preset: str = "veryfast",
+        on_start: Optional[Callable[[], Any]] = None,
+    ):
+        self.output_dir = output_dir
+        self.source = source if source in RECORDING_SOURCES else "processed"
+        self.fps = max(float(fps), 1.0)
+        self.drop_policy = drop_policy if drop_policy in DROP_POLICIES else "oldest"
+        self.codec = codec
+        self.options = {"crf": str(int(crf)), "preset": str(preset)}
+        # Callback all'avvio, es. per avviare la pipeline che fornisce i frame.
+        self.on_start = on_start
+        # I frame grezzi arrivano RGB dal decoder, quelli elaborati sono
+        # nello stesso ordine di canali dato a cv2.imencode per lo stream.
+        self.pixel_format = "rgb24" if self.source == "raw" else "bgr24"
+
+        self.path: Optional[str] = None
+        self.frames_written = 0
+        self.dropped = 0
+        # Frame non registrati perche' la sorgente e' piu' veloce di `fps`.
+        self.rate_limited = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+        self._queue: Deque[Tuple[np.ndarray, float]] = deque(maxlen=max(int(queue_size), 1))
+        self._cond = threading.Condition()
+        self._recording = False
+        self._next_due: Optional[float] = None
+        self._last_seen: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def available(self) -> bool:
+        return AV_AVAILABLE
+
+    @property
+    def recording(self) -> bool:
+        return self._recording
+
+    def start(self, filename: Optional[str] = None) -> str:
+        """Avvia una nuova registrazione e ritorna il percorso del file."""
+        if not AV_AVAILABLE:
+            raise RuntimeError("PyAV non installato")
+
+        with self._cond:
+            if self._recording:
+                return self.path
+            os.makedirs(self.output_dir, exist_ok=True)
+            name = filename or f"video_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+            self.path = os.path.join(self.output_dir, name)
+            self.frames_written = 0
+            self.dropped = 0
+            self.rate_limited = 0
+            self.error = None
+            self.started_at = time.time()
+            self._next_due = None
+            self._last_seen = None
+            self._queue.clear()
+            self._recording = True
+            self._thread = threading.Thread(target=self._run, args=(self.path,), name="video-recorder", daemon=True)
+            self._thread.start()
+        if self.on_start is not None:
+            self.on_start()
+        return self.path
+
+    def stop(self, timeout: float = 10.0) -> Dict[str, Any]:
+        """Ferma la registrazione dopo aver scritto i frame gia' in coda."""
+        with self._cond:
+            self._recording = False
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.stats()
+
+    def write(self, frame: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        """
+        Accoda un frame senza mai bloccare il chiamante.
+        Ritorna False se il frame non viene registrato.
+        """
+        if not self._recording or frame is None:
+            return False
+
+        timestamp = time.time() if timestamp is None else timestamp
+        interval = 1.0 / self.fps
+        previous, self._last_seen = self._last_seen, timestamp
+        # Limite di fps solo se la sorgente e' piu' veloce: i frame in anticipo
+        # di oltre mezzo intervallo sulla scadenza non vengono nemmeno copiati.
+        # La tolleranza assorbe jitter e arrotondamenti dei timestamp.
+        source_faster = previous is not None and timestamp - previous < interval
+        if source_faster and self._next_due is not None and timestamp < self._next_due - interval / 2:
+            self.rate_limited += 1
+            return False
+
+        with self._cond:
+            if not self._recording:
+                return False
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+                if self.drop_policy == "newest":
+                    return False
+            # Scadenze a passo fisso; dopo una pausa si riparte dal frame corrente.
+            if self._next_due is None or timestamp - self._next_due > interval:
+                self._next_due = timestamp + interval
+            else:
+                self._next_due += interval
+            # Il frame elaborato e' un buffer riusato: serve una copia.
+            self._queue.append((frame.copy(), timestamp))
+            self._cond.notify()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recording": self._recording,
+            "path": self.path,
+            "source": self.source,
+            "frames": self.frames_written,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "queued": len(self._queue),
+            "started_at": self.started_at,
+            "error": self.error,
+        }
+
+    def _next(self) -> Optional[Tuple[np.ndarray, float]]:
+        with self._cond:
+            while not self._queue and self._recording:
+                self._cond.wait(0.5)
+            if self._queue:
+                return self._queue.popleft()
+            return None
+
+    def _run(self, path: str) -> None:
+        container = None
+        stream = None
+        first_timestamp = None
+        last_pts = -1
+        try:
+            container = av.open(path, mode="w")
+            while True:
+                item = self._next()
+                if item is None:
+                    break
+                frame, timestamp = item
+
+                # yuv420p richiede dimensioni pari.
+                height, width = frame.shape[0] & ~1, frame.shape[1] & ~1
+                if stream is None:
+                    stream = container.add_stream(self.codec, rate=int(round(self.fps)))
+                    stream.width = width
+                    stream.height = height
+                    stream.pix_fmt = "yuv420p"
+                    stream.codec_context.time_base = TIME_BASE
+                    stream.options = dict(self.options)
+                    first_timestamp = timestamp
+                if frame.shape[0] != height or frame.shape[1] != width:
+                    frame = frame[:height, :width]
+                if (width, height) != (stream.width, stream.height):
+                    # Il formato cambia solo in caso di errore a monte: frame scartato.
+                    self.dropped += 1
+                    continue
+
+                pts = int((timestamp - first_timestamp) / TIME_BASE)
+                if pts <= last_pts:
+                    pts = last_pts + 1
+                last_pts = pts
+
+                video_frame = av.VideoFrame.from_ndarray(frame, format=self.pixel_format)
+                video_frame.pts = pts
+                video_frame.time_base = TIME_BASE
+                for packet in stream.encode(video_frame):
+                    container.mux(packet)
+                self.frames_written += 1
+
+            if stream is not None:
+                for packet in stream.encode():
+                    container.mux(packet)
+        except Exception as e:
+            self.error = str(e)
+            with self._cond:
+                self._recording = False
+                self._queue.clear()
+        finally:
+            if container is not None:
+                try:
+                    container.close()
+                except Exception:
+                    pass
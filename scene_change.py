@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class SceneChangeDetector:
+    """
+    Rilevatore economico di cambio scena davanti all'OCR.
+    Confronta una miniatura in scala di grigi del frame con quella dell'ultimo
+    frame inviato all'OCR: se la differenza media e' sotto soglia l'inferenza
+    viene saltata e si riusano i risultati in cache.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        size: Tuple[int, int] = (32, 24),
+        max_age: float = 0.0,
+    ):
+        self.threshold = float(threshold)
+        self.size = size
+        self.max_age = float(max_age)
+
+        # hits: OCR saltato (cache riusata), misses: OCR eseguito.
+        self.hits = 0
+        self.misses = 0
+        self.last_score: Optional[float] = None
+
+        self._reference: Optional[np.ndarray] = None
+        self._reference_time = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+        return small
+
+    def score(self, signature: np.ndarray) -> float:
+        """Differenza media assoluta (0-255) rispetto al riferimento."""
+        if self._reference is None or self._reference.shape != signature.shape:
+            return float("inf")
+        return float(cv2.mean(cv2.absdiff(signature, self._reference))[0])
+
+    def should_run(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """Decide se il frame merita una nuova inferenza OCR."""
+        if not self.enabled:
+            self.misses += 1
+            return True
+
+        now = time.time() if now is None else now
+        signature = self.signature(frame)
+        score = self.score(signature)
+        self.last_score = score if np.isfinite(score) else None
+
+        expired = self.max_age > 0 and now - self._reference_time >= self.max_age
+        if score < self.threshold and not expired:
+            self.hits += 1
+            return False
+
+        self.misses += 1
+        self._reference = signature
+        self._reference_time = now
+        return True
+
+    def reset(self) -> None:
+        self._reference = None
+        self._reference_time = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "last_score": self.last_score,
+        }
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# Limiti dell'SDK Tello (cm e gradi).
+MIN_MOVE = 20
+MAX_MOVE = 500
+MAX_ROTATION = 360
+
+# Assi del comando go: x avanti, y sinistra, z alto.
+AXIS_MOVES = {
+    "move_forward": ("x", 1),
+    "move_backward": ("x", -1),
+    "move_left": ("y", 1),
+    "move_right": ("y", -1),
+    "move_up": ("z", 1),
+    "move_down": ("z", -1),
+}
+AXIS_ACTIONS = {
+    "x": ("move_forward", "move_backward"),
+    "y": ("move_left", "move_right"),
+    "z": ("move_up", "move_down"),
+}
+ROTATIONS = {
+    "rotate_clockwise": 1,
+    "rotate_counterclockwise": -1,
+}
+
+
+def _step(action: str, argument: Any = None) -> Dict[str, Any]:
+    return {"action": action, "argument": argument}
+
+
+def split_move(axis: str, signed_distance: int) -> List[Dict[str, Any]]:
+    """Spezza un movimento in parti uguali entro MAX_MOVE."""
+    if signed_distance == 0:
+        return []
+    positive, negative = AXIS_ACTIONS[axis]
+    action = positive if signed_distance > 0 else negative
+    distance = abs(signed_distance)
+
+    parts = max(math.ceil(distance / MAX_MOVE), 1)
+    base, remainder = divmod(distance, parts)
+    return [_step(action, base + (1 if index < remainder else 0)) for index in range(parts)]
+
+
+def rotation_steps(signed_angle: int) -> List[Dict[str, Any]]:
+    """Rotazione netta verso il lato piu' corto; nessun passo se nulla."""
+    net = signed_angle % MAX_ROTATION
+    if net == 0:
+        return []
+    if net > MAX_ROTATION // 2:
+        return [_step("rotate_counterclockwise", MAX_ROTATION - net)]
+    return [_step("rotate_clockwise", net)]
+
+
+def go_step(vector: Dict[str, int], speed: int) -> Optional[Dict[str, Any]]:
+    """Comando go se il vettore rispetta i limiti dell'SDK, altrimenti None."""
+    x, y, z = vector["x"], vector["y"], vector["z"]
+    if any(abs(value) > MAX_MOVE for value in (x, y, z)):
+        return None
+    if all(abs(value) <= MIN_MOVE for value in (x, y, z)):
+        return None
+    return _step("go", [x, y, z, int(speed)])
+
+
+class SequenceOptimizer:
+    """
+    Compila una sequenza prima dell'invio al drone: unisce i movimenti
+    consecutivi sullo stesso asse, elimina quelli che si annullano, spezza
+    quelli oltre i limiti dell'SDK e, con fold_go, piega piu' assi in un
+    unico `go x y z speed`. Lavora su passi normalizzati
+    ({"action", "argument"}); i comandi che non sono movimenti o rotazioni
+    (decollo, flip, foto...) fanno da barriera e restano invariati.
+    """
+
+    def __init__(
+        self,
+        fold_go: bool = False,
+        go_speed: int = 50,
+        default_distance: int = 30,
+        default_angle: int = 90,
+    ):
+        self.fold_go = bool(fold_go)
+        self.go_speed = min(max(int(go_speed), 10), 100)
+        self.default_distance = int(default_distance)
+        self.default_angle = int(default_angle)
+
+    def compile(self, steps: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        optimized: List[Dict[str, Any]] = []
+        warnings: List[str] = []
+        moves: List[List[Any]] = []
+        rotations: List[int] = []
+
+        def flush_moves():
+            if moves:
+                optimized.extend(self._compile_moves(moves, warnings))
+                moves.clear()
+
+        def flush_rotations():
+            if len(rotations) == 1 and 0 < abs(rotations[0]) <= MAX_ROTATION:
+                # Rotazione singola: invariata (anche un giro completo voluto).
+                angle = rotations[0]
+                optimized.append(_step("rotate_clockwise" if angle > 0 else "rotate_counterclockwise", abs(angle)))
+            elif rotations:
+                optimized.extend(rotation_steps(sum(rotations)))
+            rotations.clear()
+
+        for step in steps:
+            action = step.get("action") if isinstance(step, dict) else None
+            argument = step.get("argument") if isinstance(step, dict) else None
+
+            if action in AXIS_MOVES:
+                value = self._as_int(argument, self.default_distance)
+                if value is not None:
+                    flush_rotations()
+                    axis, sign = AXIS_MOVES[action]
+                    # [asse, distanza netta, passi originali del tratto]
+                    if moves and moves[-1][0] == axis:
+                        moves[-1][1] += sign * value
+                        moves[-1][2].append(_step(action, value))
+                    else:
+                        moves.append([axis, sign * value, [_step(action, value)]])
+                    continue
+
+            if action in ROTATIONS:
+                value = self._as_int(argument, self.default_angle)
+                if value is not None:
+                    # La rotazione cambia il riferimento: chiude i movimenti pendenti.
+                    flush_moves()
+                    rotations.append(ROTATIONS[action] * value)
+                    continue
+
+            flush_moves()
+            flush_rotations()
+            optimized.append(step)
+
+        flush_moves()
+        flush_rotations()
+
+        report = {
+            "original_steps": len(steps),
+            "optimized_steps": len(optimized),
+            "round_trips_saved": len(steps) - len(optimized),
+            "delays_saved": max(len(steps) - 1, 0) - max(len(optimized) - 1, 0),
+            "original": list(steps),
+            "optimized": optimized,
+            "warnings": warnings,
+        }
+        return optimized, report
+
+    def _compile_moves(self, moves: List[List[Any]], warnings: List[str]) -> List[Dict[str, Any]]:
+        merged = [(axis, value, originals) for axis, value, originals in moves if value != 0]
+        if not merged:
+            return []
+
+        if self.fold_go and len({axis for axis, _, _ in merged}) > 1:
+            vector = {"x": 0, "y": 0, "z": 0}
+            for axis, value, _ in merged:
+                vector[axis] += value
+            step = go_step(vector, self.go_speed)
+            if step is not None:
+                return [step]
+
+        compiled: List[Dict[str, Any]] = []
+        for axis, value, originals in merged:
+            if abs(value) < MIN_MOVE:
+                # Distanza netta che l'SDK rifiuterebbe: il tratto resta com'era.
+                warnings.append(
+                    f"Movimento netto di {abs(value)} cm sull'asse {axis} sotto il minimo SDK "
+                    f"({MIN_MOVE} cm): passi originali non uniti"
+                )
+                compiled.extend(originals)
+                continue
+            compiled.extend(split_move(axis, value))
+        return compiled
+
+    @staticmethod
+    def _as_int(value: Any, default: int) -> Optional[int]:
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            return None
+        return number if number > 0 else None
@@ -0,0 +1,903 @@
+import json
+import logging
+import threading
+import time
+
+from colorama import init as colorama_init
+from djitellopy import tello
+from flask import Flask, Response, jsonify, render_template, request
+from werkzeug.serving import make_server
+
+from app_logging import configure_logging
+from config_loader import config
+from event_bus import EventBus
+from image_processor import ImageProcessor
+from command_queue import CommandQueue
+from command_trigger import CommandTrigger
+from execute import DroneActionExecutor, compile_sequence, is_emergency_sequence, parse_command_text
+from fmp4_stream import Fmp4Streamer
+from frame_history import CLIP_FORMATS, FrameHistory
+from frame_source import create_frame_source
+from metrics import MetricsRegistry
+from mock_tello import create_mock_tello
+from photo_capture import PhotoCapture
+from recorder import VideoRecorder
+from sequence_optimizer import SequenceOptimizer
+from stream_tiers import AdaptiveSubscription, TieredHub, parse_tiers
+from telemetry import TelemetryCollector, TelemetryRing
+from video_pipeline import VideoPipeline
+
+
+# Istanza Flask per servire UI e stream MJPEG.
+app = Flask(__name__)
+
+# Drone reale (djitellopy) o simulatore in-process per provare i comandi offline.
+drone_cfg = config.get("drone", {})
+DRONE_BACKEND = str(drone_cfg.get("backend", "tello")).lower().strip()
+
+# Lock e cache del client Tello per inizializzazione thread-safe.
+tello_lock = threading.Lock()
+tello_client = None
+action_executor = None
+
+# Parametri stream in un solo punto.
+stream_cfg = config.get("stream", {})
+FRAME_SIZE = (
+	int(stream_cfg.get("width", 640)),
+	int(stream_cfg.get("height", 360)),
+)
+TARGET_FPS = float(stream_cfg.get("target_fps", 30.0))
+
+# Processor condiviso per tutte le richieste.
+processor = ImageProcessor(config)
+
+# Metriche runtime (istogrammi per fase), esposte su /metrics.
+metrics_cfg = config.get("metrics", {})
+metrics = MetricsRegistry() if metrics_cfg.get("enabled", True) else None
+
+# Compilazione delle sequenze (merge dei movimenti, go x y z).
+commands_cfg = config.get("commands", {})
+sequence_optimizer = SequenceOptimizer(
+    fold_go=bool(commands_cfg.get("fold_go", True)),
+    go_speed=int(commands_cfg.get("go_speed", 50)),
+)
+
+# Abilita colori ANSI su Windows.
+colorama_init(autoreset=True)
+
+# Log strutturati: chi logga accoda e basta, un thread scrive console e file JSON lines.
+log_service = configure_logging(config.get("logging", {}))
+log = logging.getLogger("tello")
+
+
+def get_tello_client():
+    """
+    Inizializza il client Tello una sola volta e avvia lo stream.
+    Ritorna l'istanza condivisa per tutte le richieste.
+    """
+    global tello_client
+    global action_executor
+
+    with tello_lock:
+        if tello_client is None:
+            if DRONE_BACKEND == "mock":
+                client = create_mock_tello(drone_cfg.get("mock", {}))
+            else:
+                client = tello.Tello()
+            client.connect()
+            try:
+                # Stop preventivo in caso di stream gia' attivo.
+                client.streamoff()
+            except Exception:
+                pass
+            client.streamon()
+            if DRONE_BACKEND != "mock":
+                # Tempo minimo per agganciare il decoder.
+                time.sleep(1.0)
+            tello_client = client
+            action_executor = DroneActionExecutor(client)
+            # Stesso optimizer del dry-run /api/commands/compile; commands.optimize
+            # e' solo il default quando la richiesta non indica "optimize".
+            action_executor.optimizer = sequence_optimizer
+            action_executor.optimize_default = bool(commands_cfg.get("optimize", False))
+            action_executor.recorder = recorder
+            action_executor.photo_capture = photo_capture
+            if metrics is not None:
+                action_executor.command_hook = metrics.observe_command
+    return tello_client
+
+
+def get_action_executor():
+    """Executor condiviso, con connessione al drone alla prima richiesta."""
+    get_tello_client()
+    return action_executor
+
+
+# Bus degli eventi per la UI: rilevamenti OCR, azioni, job e telemetria
+# arrivano al browser su un'unica connessione SSE (/api/events).
+events_cfg = config.get("events", {})
+event_bus = None
+if events_cfg.get("enabled", True):
+    event_bus = EventBus(
+        maxlen=int(events_cfg.get("client_queue_size", 256)),
+        history=int(events_cfg.get("history", 200)),
+    )
+
+
+def publish_event(event_type, data):
+    if event_bus is not None:
+        event_bus.publish(event_type, data)
+
+
+# Telemetria: stato del drone campionato in un ring buffer, senza comandi SDK.
+# Il collector non forza la connessione: attende che il client esista.
+telemetry_cfg = config.get("telemetry", {})
+telemetry_ring = TelemetryRing(int(telemetry_cfg.get("capacity", 6000)))
+telemetry_collector = TelemetryCollector(
+    lambda: tello_client,
+    telemetry_ring,
+    sample_rate=float(telemetry_cfg.get("sample_rate", 10.0)),
+)
+telemetry_event_interval = 1.0 / max(float(events_cfg.get("telemetry_rate", 5.0)), 0.1)
+last_telemetry_event = {"timestamp": 0.0}
+
+
+def publish_telemetry(timestamp, state):
+    """Campione di telemetria sul bus, al massimo `events.telemetry_rate` al secondo."""
+    if timestamp - last_telemetry_event["timestamp"] < telemetry_event_interval:
+        return
+    last_telemetry_event["timestamp"] = timestamp
+    _, sample = telemetry_ring.latest()
+    if sample is not None:
+        publish_event("telemetry", sample)
+
+
+if event_bus is not None and float(events_cfg.get("telemetry_rate", 5.0)) > 0:
+    telemetry_collector.add_listener(publish_telemetry)
+
+
+# Unica coda ordinata per i comandi di chat/API e di quelli letti dall'OCR.
+# L'arresto di emergenza usa l'executor gia' connesso e salta la coda.
+command_queue = CommandQueue(get_action_executor, emergency_executor=lambda: action_executor)
+
+
+def publish_job_event(job, step):
+    """Cambi di stato dei job ed esito di ogni passo, per la chat della UI."""
+    if step is None:
+        data = job.to_dict()
+        data.pop("plan", None)
+        publish_event("job", data)
+    else:
+        publish_event("step", dict(step, job_id=job.id, source=job.source, total=len(job.commands)))
+
+
+if event_bus is not None:
+    command_queue.add_listener(publish_job_event)
+
+
+def fire_ocr_command(action, argument):
+    """Comando confermato dal trigger OCR: stop sulla corsia prioritaria, il resto in coda."""
+    if action == "emergency_stop":
+        outcome = command_queue.emergency_stop(source="ocr")
+        publish_event("emergency", outcome)
+        log.warning("%s (%.1f ms)", outcome["message"], outcome["latency_ms"], extra={"tag": "STOP", "outcome": outcome})
+        return
+    job = command_queue.submit([{"action": action, "argument": argument}], delay=0, source="ocr")
+    publish_event("action", {"source": "ocr", "action": action, "argument": argument, "job_id": job.id})
+    log.info(
+        "Comando in coda (%s): %s %s",
+        job.id,
+        action,
+        argument if argument is not None else "",
+        extra={"tag": "AZIONE", "job_id": job.id, "action": action, "argument": argument},
+    )
+
+
+# Consenso temporale: un cartello deve comparire in N degli ultimi M risultati OCR.
+td_cfg = config.get("text_detection", {})
+command_trigger = CommandTrigger(
+    parse_command_text,
+    fire_ocr_command,
+    window=int(td_cfg.get("trigger_window", 3)),
+    required=int(td_cfg.get("trigger_required", 2)),
+    cooldown=float(td_cfg.get("trigger_cooldown", 3.0)),
+    threshold=processor.detection_threshold,
+)
+
+
+last_detections = {"count": 0}
+
+
+def handle_ocr_result(result):
+    """
+    Listener del worker OCR: chiamato una volta per inferenza (non per
+    frame renderizzato), registra i risultati, li pubblica sul bus e li
+    passa al trigger. Gira sul thread OCR, mai su quello video.
+    """
+    text_results = [(text, conf, bbox) for bbox, text, conf in result.detections if conf >= processor.detection_threshold]
+    detections = [
+        {"text": text, "conf": float(conf), "bbox": [[int(x), int(y)] for x, y in bbox]}
+        for text, conf, bbox in text_results
+    ]
+    # Un evento per ogni inferenza con testo, piu' uno vuoto quando il testo sparisce.
+    if text_results or last_detections["count"]:
+        last_detections["count"] = len(text_results)
+        publish_event(
+            "detection",
+            {
+                "frame_timestamp": result.frame_timestamp,
+                "latency_ms": (result.completed_at - result.frame_timestamp) * 1000.0,
+                "detections": detections,
+            },
+        )
+    if text_results:
+        texts = [text for text, _, _ in text_results]
+        # Lo stesso cartello resta in vista per molte inferenze: in log una volta ogni logging.repeat_interval.
+        log.info(
+            "Rilevati %d testi: %s",
+            len(texts),
+            texts,
+            extra={"tag": "OCR", "detections": detections, "dedup_key": ("ocr", tuple(sorted(texts)))},
+        )
+
+    command_trigger.on_ocr_result(result)
+
+
+if processor.ocr_worker is not None:
+    processor.ocr_worker.add_listener(handle_ocr_result)
+
+
+# Sorgente video da config: drone, video registrato o generatore sintetico.
+# Il simulatore non ha video: al posto del drone si usa il generatore sintetico.
+video_config = config
+if DRONE_BACKEND == "mock" and str(config.get("video", {}).get("source", "tello")).lower().strip() == "tello":
+    video_config = {"video": dict(config.get("video", {}), source="synthetic")}
+frame_source = create_frame_source(video_config, get_tello_client)
+
+# Un solo thread elabora i frame e li codifica una volta per livello di
+# qualita', solo per i livelli con almeno un client /stream.
+stream_hub = TieredHub(parse_tiers(stream_cfg.get("tiers")), maxlen=int(stream_cfg.get("client_queue_size", 2)))
+adaptive_cfg = stream_cfg.get("adaptive", {})
+pipeline = VideoPipeline(
+    processor,
+    frame_source.start,
+    FRAME_SIZE,
+    TARGET_FPS,
+    hub=stream_hub,
+    restart_stream=frame_source.restart,
+    stall_timeout=float(stream_cfg.get("stall_timeout", 5.0)),
+)
+
+
+# Registrazione MP4 su thread dedicato: la pipeline consegna solo una copia del frame.
+recording_cfg = config.get("recording", {})
+recorder = VideoRecorder(
+    output_dir=str(recording_cfg.get("output_dir", "recordings")),
+    source=str(recording_cfg.get("source", "processed")),
+    fps=float(recording_cfg.get("fps", TARGET_FPS)),
+    queue_size=int(recording_cfg.get("queue_size", 60)),
+    drop_policy=str(recording_cfg.get("drop_policy", "oldest")),
+    codec=str(recording_cfg.get("codec", "libx264")),
+    crf=int(recording_cfg.get("crf", 23)),
+    preset=str(recording_cfg.get("preset", "veryfast")),
+    on_start=pipeline.start,
+)
+
+
+def record_frame(packet, result):
+    if recorder.recording:
+        recorder.write(packet.frame if recorder.source == "raw" else result.frame, packet.timestamp)
+
+
+pipeline.add_tap(record_frame)
+
+# Foto scritte da un pool di I/O; il ring tiene gli ultimi frame per il burst.
+photo_cfg = config.get("photo", {})
+photo_capture = PhotoCapture(
+    output_dir=str(photo_cfg.get("output_dir", "photos")),
+    source=str(photo_cfg.get("source", "raw")),
+    ring_size=int(photo_cfg.get("ring_size", 45)),
+    workers=int(photo_cfg.get("workers", 2)),
+    extension=str(photo_cfg.get("format", "jpg")),
+    jpeg_quality=int(photo_cfg.get("jpeg_quality", 92)),
+    frame_provider=lambda: frame_source.feed.latest(),
+)
+
+
+def buffer_photo_frame(packet, result):
+    photo_capture.push(packet.frame if photo_capture.source == "raw" else result.frame, packet.timestamp)
+
+
+pipeline.add_tap(buffer_photo_frame)
+
+# Storico degli ultimi secondi di frame grezzi con i risultati, entro un limite di memoria.
+history_cfg = config.get("history", {})
+frame_history = None
+if history_cfg.get("enabled", True):
+    frame_history = FrameHistory(
+        seconds=float(history_cfg.get("seconds", 10.0)),
+        fps=float(history_cfg.get("fps") or TARGET_FPS),
+        storage=str(history_cfg.get("storage", "jpeg")),
+        max_bytes=int(float(history_cfg.get("max_memory_mb", 64)) * 1024 * 1024),
+        jpeg_quality=int(history_cfg.get("jpeg_quality", 80)),
+        queue_size=int(history_cfg.get("queue_size", 8)),
+    )
+    pipeline.add_tap(lambda packet, result: frame_history.push(packet.frame, packet.timestamp, packet.seq, result.results))
+
+    def annotate_history(result):
+        # Il risultato OCR resta legato al frame su cui e' stato calcolato.
+        detections = [
+            {"text": text, "confidence": float(conf), "bbox": [[int(x), int(y)] for x, y in bbox]}
+            for bbox, text, conf in result.detections
+        ]
+        frame_history.annotate(result.frame_timestamp, "ocr", detections)
+
+    if processor.ocr_worker is not None:
+        processor.ocr_worker.add_listener(annotate_history)
+
+# Stream H.264 in MP4 frammentato: un solo encode per tutti i client /stream.mp4.
+h264_cfg = stream_cfg.get("h264", {})
+h264_streamer = None
+if h264_cfg.get("enabled", True):
+    h264_streamer = Fmp4Streamer(
+        TARGET_FPS,
+        codec=str(h264_cfg.get("codec", "libx264")),
+        crf=int(h264_cfg.get("crf", 28)),
+        preset=str(h264_cfg.get("preset", "ultrafast")),
+        gop=h264_cfg.get("gop"),
+        queue_size=int(h264_cfg.get("client_queue_size", 60)),
+    )
+    pipeline.add_tap(lambda packet, result: h264_streamer.push(result.frame, packet.timestamp))
+
+
+def observe_ocr(result):
+    """Durata dell'inferenza e ritardo tra cattura del frame e risultato OCR."""
+    metrics.observe_stage("ocr", result.duration)
+    metrics.observe_stage("ocr_latency", result.completed_at - result.frame_timestamp)
+
+
+def ocr_result_age():
+    last = processor.latest_ocr_timestamp
+    return time.time() - last if last else 0.0
+
+
+if metrics is not None:
+    pipeline.stage_hook = metrics.observe_stage
+    processor.stage_hook = metrics.observe_stage
+    if processor.ocr_worker is not None:
+        processor.ocr_worker.add_listener(observe_ocr)
+    metrics.gauge("viewers", "Client /stream collegati", lambda: stream_hub.subscriber_count)
+    if h264_streamer is not None:
+        metrics.gauge("h264_viewers", "Client /stream.mp4 collegati", lambda: h264_streamer.hub.subscriber_count)
+        metrics.counter("h264_bytes_total", "Byte di frammenti MP4 prodotti dall'encoder", lambda: h264_streamer.bytes_encoded)
+    metrics.gauge("stream_fps", "FPS di pubblicazione della pipeline", lambda: pipeline.fps)
+    metrics.counter("dropped_frames_total", "Frame scartati dai client lenti", lambda: stream_hub.dropped_total)
+    metrics.counter("stream_tier_switches_total", "Cambi di livello dei client /stream", lambda: stream_hub.switches)
+    metrics.counter("skipped_frames_total", "Frame decodificati e mai elaborati", lambda: pipeline.skipped_frames)
+    metrics.gauge("ocr_result_age_seconds", "Eta' del frame dell'ultimo risultato OCR", ocr_result_age)
+    metrics.counter("recording_dropped_frames_total", "Frame scartati dalla registrazione", lambda: recorder.dropped)
+    metrics.counter("recording_rate_limited_frames_total", "Frame oltre recording.fps non registrati", lambda: recorder.rate_limited)
+    metrics.gauge("ocr_ready", "1 quando il modello OCR e' caricato e scaldato", lambda: 1.0 if processor.ocr_status == "ready" else 0.0)
+    metrics.counter("ocr_scene_hits_total", "OCR saltati per scena invariata", lambda: processor.scene_gate.hits)
+    metrics.counter("ocr_scene_misses_total", "OCR eseguiti dopo il filtro di scena", lambda: processor.scene_gate.misses)
+    metrics.counter("ocr_commands_fired_total", "Comandi OCR confermati dal trigger", lambda: command_trigger.fired)
+    metrics.counter("ocr_commands_suppressed_total", "Comandi OCR soppressi dal cooldown", lambda: command_trigger.suppressed)
+    if frame_history is not None:
+        metrics.gauge("history_frames", "Frame nello storico", lambda: len(frame_history))
+        metrics.gauge("history_memory_bytes", "Memoria allocata per lo storico dei frame", lambda: frame_history.memory_bytes)
+        metrics.counter("history_dropped_total", "Frame non salvati nello storico", lambda: frame_history.dropped)
+    metrics.counter("log_dropped_total", "Record di log scartati a coda piena", lambda: log_service.handler.dropped)
+    metrics.counter("log_suppressed_total", "Record di log ripetuti soppressi", lambda: log_service.repeat_filter.suppressed_total)
+    if event_bus is not None:
+        metrics.gauge("event_clients", "Client /api/events collegati", lambda: event_bus.subscriber_count)
+        metrics.counter("events_dropped_total", "Eventi scartati dai client lenti", lambda: event_bus.dropped_total)
+
+
+def generate_mjpeg(tier=None, adaptive=True):
+    """
+    Generatore MJPEG per lo stream video in pagina.
+    Legge i frame gia' codificati dalla pipeline condivisa: un client
+    lento perde i frame piu' vecchi senza rallentare gli altri e, se ne
+    perde troppi, passa a un livello di qualita' piu' leggero.
+    """
+    pipeline.start()
+    clock = time.perf_counter
+    subscription = AdaptiveSubscription(
+        stream_hub,
+        tier=tier or adaptive_cfg.get("default_tier"),
+        adaptive=adaptive,
+        window=float(adaptive_cfg.get("window", 2.0)),
+        downgrade_ratio=float(adaptive_cfg.get("downgrade_ratio", 0.25)),
+        upgrade_after=int(adaptive_cfg.get("upgrade_after", 3)),
+    )
+    with subscription:
+        while True:
+            chunk = subscription.get(timeout=1.0)
+            if chunk is None:
+                continue
+            # Il tempo di ritorno dallo yield e' la scrittura sul socket.
+            started = clock()
+            yield chunk
+            if metrics is not None:
+                metrics.observe_stage("socket_yield", clock() - started)
+
+
+def generate_fmp4(subscription, session):
+    """
+    Frammenti MP4 per un client /stream.mp4 (l'init segment e' gia' stato
+    inviato). Dopo un frammento perso si riparte dal keyframe successivo.
+    """
+    dropped = subscription.dropped
+    synced = False
+    while True:
+        item = subscription.get(timeout=1.0)
+        if item is None:
+            if subscription.closed:
+                return
+            continue
+        item_session, keyframe, fragment = item
+        if item_session != session:
+            # Encoder ripartito con un nuovo init segment: il client si ricollega.
+            return
+        if subscription.dropped != dropped:
+            dropped = subscription.dropped
+            synced = False
+            h264_streamer.request_keyframe()
+        if not synced:
+            if not keyframe:
+                continue
+            synced = True
+        yield fragment
+
+
+def generate_telemetry_events(rate, keepalive=15.0):
+    """
+    Eventi SSE con l'ultimo campione di telemetria, al massimo `rate` al
+    secondo; solo campioni nuovi, con un commento periodico per tenere
+    viva la connessione.
+    """
+    interval = 1.0 / rate
+    last_sent = None
+    idle_since = time.monotonic()
+    yield "retry: 2000\n\n"
+    while True:
+        appended, sample = telemetry_ring.latest()
+        if sample is not None and appended != last_sent:
+            last_sent = appended
+            idle_since = time.monotonic()
+            yield f"data: {json.dumps(sample)}\n\n"
+        elif time.monotonic() - idle_since >= keepalive:
+            idle_since = time.monotonic()
+            yield ": keepalive\n\n"
+        time.sleep(interval)
+
+
+@app.route("/")
+def index():
+    """Pagina principale con UI e tag <img> che carica /stream."""
+    return render_template("index.html")
+
+
+@app.route("/stream")
+def stream():
+    """
+    Endpoint MJPEG per l'elemento <img> nella UI.
+    ?tier=<nome> fissa il livello (con &adaptive=1 e' solo quello di
+    partenza); ?adaptive=0 disattiva l'adattamento sul livello di default.
+    """
+    tier = request.args.get("tier")
+    if tier is not None and stream_hub.index(tier) is None:
+        names = [item.name for item in stream_hub.tiers]
+        return jsonify({"success": False, "message": f"Livello sconosciuto: {tier}", "tiers": names}), 400
+    default_adaptive = bool(adaptive_cfg.get("enabled", True)) and tier is None
+    adaptive = request.args.get("adaptive", "1" if default_adaptive else "0").lower() in ("1", "true", "yes", "on")
+    return Response(generate_mjpeg(tier, adaptive), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.route("/stream.mp4")
+def stream_mp4():
+    """
+    Stream H.264 in MP4 frammentato per MediaSource. L'header X-Stream-Mime
+    riporta il tipo da passare ad addSourceBuffer.
+    """
+    if h264_streamer is None or not h264_streamer.available:
+        return jsonify({"success": False, "message": "Stream H.264 non disponibile"}), 404
+
+    pipeline.start()
+    subscription = h264_streamer.subscribe()
+    init = h264_streamer.wait_init(timeout=5.0)
+    if init is None:
+        subscription.close()
+        return jsonify({"success": False, "message": "Encoder H.264 non pronto"}), 503
+
+    session, init_segment, mime = init
+
+    def body():
+        yield init_segment
+        yield from generate_fmp4(subscription, session)
+
+    response = Response(body(), mimetype="video/mp4", headers={"X-Stream-Mime": mime, "Cache-Control": "no-store"})
+    response.call_on_close(subscription.close)
+    return response
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Metriche in formato testo Prometheus."""
+    if metrics is None:
+        return Response("metriche disabilitate\n", status=404, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/status")
+def api_status():
+    """Stato dei componenti: OCR (disabled, loading, warming_up, ready...) e stream."""
+    ocr = {"status": processor.ocr_status}
+    if processor.ocr_worker is not None:
+        ocr.update(processor.ocr_worker.state())
+    return jsonify(
+        {
+            "ocr": ocr,
+            "stream": {
+                "running": pipeline.running,
+                "fps": pipeline.fps,
+                "viewers": stream_hub.subscriber_count,
+                "tiers": stream_hub.counts(),
+            },
+        }
+    )
+
+
+@app.route("/api/telemetry")
+def api_telemetry():
+    """Ultimo campione di telemetria e stato del collector."""
+    appended, sample = telemetry_ring.latest()
+    return jsonify(
+        {
+            "enabled": telemetry_collector.running,
+            "connected": tello_client is not None,
+            "samples": appended,
+            "buffered": len(telemetry_ring),
+            "errors": telemetry_collector.errors,
+            "latest": sample,
+        }
+    )
+
+
+@app.route("/api/telemetry/stream")
+def api_telemetry_stream():
+    """Server-Sent Events con la telemetria; ?rate=N campioni al secondo (limitato da config)."""
+    default_rate = float(telemetry_cfg.get("stream_rate", 5.0))
+    max_rate = float(telemetry_cfg.get("max_stream_rate", 20.0))
+    rate = request.args.get("rate", default_rate, type=float) or default_rate
+    rate = min(max(rate, 0.1), max_rate)
+    return Response(
+        generate_telemetry_events(rate),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/telemetry/history")
+def api_telemetry_history():
+    """
+    Finestra di telemetria in formato colonnare.
+    ?seconds=60 (ultimi N secondi) oppure ?since=&until= (epoch),
+    ?max_points=500 per sottocampionare.
+    """
+    since = request.args.get("since", type=float)
+    until = request.args.get("until", type=float)
+    seconds = request.args.get("seconds", type=float)
+    if since is None and seconds is not None:
+        since = (until if until is not None else time.time()) - seconds
+    max_points = request.args.get("max_points", int(telemetry_cfg.get("history_max_points", 1000)), type=int)
+    return jsonify(telemetry_ring.history(since, until, max_points if max_points and max_points > 0 else None))
+
+
+@app.route("/api/events")
+def api_events():
+    """
+    Server-Sent Events con rilevamenti OCR, azioni, job e telemetria: una
+    sola connessione per pagina. ?types=detection,job filtra per tipo;
+    alla riconnessione l'header Last-Event-ID recupera gli eventi persi.
+    """
+    if event_bus is None:
+        return jsonify({"success": False, "message": "Eventi disattivati"}), 404
+    types = [item.strip() for item in request.args.get("types", "").split(",") if item.strip()]
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    subscription = event_bus.subscribe(last_event_id=last_event_id)
+    response = Response(
+        event_bus.stream(subscription, types, keepalive=float(events_cfg.get("keepalive", 15.0))),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(subscription.close)
+    return response
+
+
+def history_frame_response(item):
+    """Frame dello storico come JPEG, o come JSON con i risultati se ?meta=1."""
+    if request.args.get("meta", "0").lower() in ("1", "true", "yes", "on"):
+        return jsonify({"seq": item.seq, "timestamp": item.timestamp, "results": item.results})
+    return Response(
+        frame_history.encode(item),
+        mimetype="image/jpeg",
+        headers={"X-Frame-Timestamp": repr(item.timestamp), "X-Frame-Seq": str(item.seq), "Cache-Control": "no-store"},
+    )
+
+
+@app.route("/api/history")
+def api_history():
+    """Stato dello storico dei frame: slot, memoria, intervallo coperto."""
+    if frame_history is None:
+        return jsonify({"success": False, "message": "Storico disattivato"}), 404
+    return jsonify(frame_history.stats())
+
+
+@app.route("/api/history/frame")
+def api_history_frame():
+    """
+    Frame piu' vicino a ?timestamp= (epoch) oppure di ?ago= secondi fa;
+    senza parametri l'ultimo. ?meta=1 ritorna solo i risultati.
+    """
+    if frame_history is None:
+        return jsonify({"success": False, "message": "Storico disattivato"}), 404
+    timestamp = request.args.get("timestamp", type=float)
+    ago = request.args.get("ago", type=float)
+    if timestamp is None and ago is not None:
+        timestamp = time.time() - ago
+    item = frame_history.get(timestamp)
+    if item is None:
+        return jsonify({"success": False, "message": "Nessun frame nello storico"}), 404
+    return history_frame_response(item)
+
+
+@app.route("/api/history/ocr")
+def api_history_ocr():
+    """
+    Il frame su cui e' stato calcolato un risultato OCR: ?frame_timestamp=
+    (come negli eventi detection), di default l'ultimo risultato.
+    """
+    if frame_history is None:
+        return jsonify({"success": False, "message": "Storico disattivato"}), 404
+    frame_timestamp = request.args.get("frame_timestamp", type=float)
+    if frame_timestamp is None:
+        latest = processor.ocr_worker.latest if processor.ocr_worker is not None else None
+        if latest is None:
+            return jsonify({"success": False, "message": "Nessun risultato OCR"}), 404
+        frame_timestamp = latest.frame_timestamp
+    item = frame_history.get(frame_timestamp, exact=True)
+    if item is None:
+        return jsonify({"success": False, "message": "Frame non piu' nello storico"}), 404
+    return history_frame_response(item)
+
+
+@app.route("/api/history/clip")
+def api_history_clip():
+    """
+    Esporta una clip dallo storico: ?seconds=5 (fino a ora) oppure
+    ?since=&until= in epoch; ?format=mp4|zip (zip: JPEG + index.json).
+    """
+    if frame_history is None:
+        return jsonify({"success": False, "message": "Storico disattivato"}), 404
+    clip_format = request.args.get("format", str(history_cfg.get("clip_format", "mp4"))).lower()
+    if clip_format not in CLIP_FORMATS:
+        return jsonify({"success": False, "message": f"Formato non valido: {clip_format}", "formats": list(CLIP_FORMATS)}), 400
+    until = request.args.get("until", type=float) or time.time()
+    since = request.args.get("since", type=float)
+    if since is None:
+        since = until - request.args.get("seconds", frame_history.seconds, type=float)
+    max_frames = int(float(history_cfg.get("clip_max_seconds", 30.0)) * frame_history.fps)
+    try:
+        content, count = frame_history.export_clip(
+            since,
+            until,
+            clip_format,
+            max_frames=max_frames,
+            codec=str(recording_cfg.get("codec", "libx264")),
+            crf=int(recording_cfg.get("crf", 23)),
+            preset=str(recording_cfg.get("preset", "veryfast")),
+        )
+    except LookupError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Esportazione fallita: {e}"}), 503
+    name = f"clip_{time.strftime('%Y%m%d_%H%M%S', time.localtime(since))}.{clip_format}"
+    return Response(
+        content,
+        mimetype="video/mp4" if clip_format == "mp4" else "application/zip",
+        headers={"Content-Disposition": f"attachment; filename={name}", "X-Clip-Frames": str(count)},
+    )
+
+
+@app.route("/api/ocr/stats")
+def api_ocr_stats():
+    """Contatori del filtro di cambio scena e del trigger comandi, utili per tarare le soglie."""
+    return jsonify(
+        {
+            "enabled": processor.ocr_enabled,
+            "scene_gate": processor.scene_gate.stats(),
+            "trigger": command_trigger.stats(),
+            "overlay": processor.text_sprites.stats(),
+            "tracking": processor.box_tracker.stats() if processor.box_tracker is not None else None,
+            "last_ocr_timestamp": processor.latest_ocr_timestamp,
+        }
+    )
+
+
+@app.route("/api/commands", methods=["POST"])
+def api_commands():
+    """
+    Accoda una sequenza di comandi e ritorna subito l'id del job.
+
+    Payload JSON supportato:
+    {
+      "commands": [
+        {"action": "takeoff"},
+        {"action": "move_left", "argument": 100},
+        {"azione": "land"}
+      ],
+      "delay": 1.0,
+      "wait": false,
+      "optimize": true
+    }
+
+    Con "wait": true la risposta attende la fine della sequenza e ha il
+    formato sincrono di execute_sequence; oltre commands.wait_timeout
+    secondi ritorna 202 con l'id del job, come senza "wait". "optimize" forza (o disattiva)
+    la compilazione della sequenza; senza, vale commands.optimize.
+    """
+    payload = request.get_json(silent=True) or {}
+    if isinstance(payload, list):
+        payload = {"commands": payload}
+    commands = payload.get("commands")
+    delay = payload.get("delay", 0.8)
+
+    if not isinstance(commands, list) or not commands:
+        return jsonify(
+            {
+                "success": False,
+                "message": "Payload non valido: inserisci un array in 'commands'",
+                "results": [],
+            }
+        ), 400
+
+    try:
+        delay = float(delay)
+    except (TypeError, ValueError):
+        delay = 0.8
+
+    # "stop" non attende in coda: corsia prioritaria.
+    if is_emergency_sequence(commands):
+        outcome = command_queue.emergency_stop(source="api")
+        publish_event("emergency", outcome)
+        outcome["results"] = []
+        return jsonify(outcome), 200 if outcome["success"] else 503
+
+    optimize = payload.get("optimize")
+    if optimize is not None:
+        optimize = bool(optimize)
+
+    job = command_queue.submit(commands, delay=delay, source="api", optimize=optimize)
+
+    # L'attesa e' limitata: un comando bloccato non trattiene il thread della richiesta.
+    if payload.get("wait") and job.done_event.wait(float(commands_cfg.get("wait_timeout", 60.0))):
+        body = job.to_dict()
+        status_code = 200 if job.success else (500 if not job.results else 207)
+        return jsonify(body), status_code
+
+    body = job.to_dict()
+    body["success"] = True
+    if payload.get("wait"):
+        body["wait_timeout"] = True
+    return jsonify(body), 202
+
+
+@app.route("/api/commands/compile", methods=["POST"])
+def api_commands_compile():
+    """
+    Compila una sequenza senza eseguirla: ritorna il piano originale,
+    quello ottimizzato e i round trip risparmiati.
+    """
+    payload = request.get_json(silent=True) or {}
+    if isinstance(payload, list):
+        payload = {"commands": payload}
+    commands = payload.get("commands")
+
+    if not isinstance(commands, list) or not commands:
+        return jsonify({"success": False, "message": "Payload non valido: inserisci un array in 'commands'"}), 400
+
+    _, report = compile_sequence(commands, sequence_optimizer)
+    report["success"] = True
+    return jsonify(report)
+
+
+@app.route("/api/recording")
+def api_recording():
+    """Stato della registrazione in corso o dell'ultima conclusa."""
+    return jsonify(recorder.stats())
+
+
+@app.route("/api/recording/<operation>", methods=["POST"])
+def api_recording_control(operation):
+    """Avvia (start) o ferma (stop) la registrazione senza passare dalla coda comandi."""
+    if operation == "start":
+        try:
+            recorder.start()
+        except Exception as e:
+            return jsonify({"success": False, "message": str(e)}), 503
+    elif operation == "stop":
+        recorder.stop()
+    else:
+        return jsonify({"success": False, "message": "Operazione non valida"}), 404
+    body = recorder.stats()
+    body["success"] = body["error"] is None
+    return jsonify(body)
+
+
+@app.route("/api/emergency", methods=["POST"])
+def api_emergency():
+    """Arresto di emergenza immediato: interrompe sequenze in corso e in coda."""
+    outcome = command_queue.emergency_stop(source="api")
+    publish_event("emergency", outcome)
+    return jsonify(outcome), 200 if outcome["success"] else 503
+
+
+@app.route("/api/jobs")
+def api_jobs():
+    """Elenco dei job recenti (senza i risultati per passo)."""
+    jobs = []
+    for job in command_queue.jobs():
+        item = job.to_dict()
+        item.pop("results", None)
+        jobs.append(item)
+    return jsonify({"jobs": jobs, "pending": command_queue.pending()})
+
+
+@app.route("/api/jobs/<job_id>")
+def api_job_status(job_id):
+    """Stato e risultati per passo di un job."""
+    job = command_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job non trovato"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def api_job_cancel(job_id):
+    """Annulla un job in coda o interrompe quello in esecuzione."""
+    job = command_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job non trovato"}), 404
+    cancelled = command_queue.cancel(job_id)
+    body = job.to_dict()
+    body["success"] = cancelled
+    if not cancelled:
+        body["message"] = "Job gia' concluso"
+    return jsonify(body), 200 if cancelled else 409
+
+
+def run():
+    """Avvio server Flask con parametri da config."""
+    host = config["flask"]["host"]
+    port = config["flask"]["port"]
+    debug = config["flask"].get("debug", True)
+    app_name = config["app"].get("name", "TelloDroneAI")
+
+    print(f"\n{'=' * 60}")
+    print(f"  {app_name}")
+    print(f"{'=' * 60}")
+    print(f"  Server:   http://{host}:{port}")
+    print(f"  Debug:    {debug}")
+    print(f"{'=' * 60}\n")
+
+    # Il socket e' in ascolto appena creato il server: la UI risponde subito
+    # e easyocr/torch vengono caricati dopo, in background.
+    http_server = make_server(host, port, app, threaded=True)
+    app.debug = debug
+    if processor.ocr_worker is not None:
+        processor.ocr_worker.start()
+        log.info("Caricamento del modello in background (%s)", processor.ocr_worker.mode, extra={"tag": "OCR"})
+    if telemetry_cfg.get("enabled", True):
+        telemetry_collector.start()
+    http_server.serve_forever()
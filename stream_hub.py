@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, List, Optional
+
+
+class Subscription:
+    """
+    Coda privata di un singolo client del broadcast.
+    Tiene al massimo `maxlen` elementi: se il client e' lento gli elementi
+    piu' vecchi vengono scartati, senza mai bloccare chi pubblica.
+    """
+
+    def __init__(self, hub: "BroadcastHub", maxlen: int):
+        self._hub = hub
+        self._items: Deque[Any] = deque(maxlen=max(1, int(maxlen)))
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.delivered = 0
+        self.closed = False
+
+    def push(self, item: Any) -> None:
+        with self._cond:
+            if self.closed:
+                return
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """Ritorna il prossimo elemento o None allo scadere del timeout."""
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            if self._items:
+                self.delivered += 1
+                return self._items.popleft()
+            return None
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def close(self) -> None:
+        self._hub.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class BroadcastHub:
+    """
+    Distribuisce lo stesso elemento (es. frame JPEG gia' codificato)
+    a un numero qualsiasi di sottoscrittori.
+    """
+
+    def __init__(self, maxlen: int = 2):
+        self.maxlen = max(1, int(maxlen))
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._latest: Any = None
+        self._closed_dropped = 0
+
+    def subscribe(self, maxlen: Optional[int] = None, replay_latest: bool = True) -> Subscription:
+        subscription = Subscription(self, maxlen or self.maxlen)
+        with self._lock:
+            self._subscribers.append(subscription)
+            latest = self._latest
+        # Un nuovo client riceve subito l'ultimo elemento disponibile.
+        if replay_latest and latest is not None:
+            subscription.push(latest)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+                self._closed_dropped += subscription.dropped
+
+    def publish(self, item: Any) -> int:
+        """Pubblica un elemento e ritorna il numero di client raggiunti."""
+        with self._lock:
+            self._latest = item
+            subscribers = tuple(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(item)
+        return len(subscribers)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @property
+    def dropped_total(self) -> int:
+        """Elementi scartati da tutti i client, anche gia' disconnessi."""
+        with self._lock:
+            return self._closed_dropped + sum(sub.dropped for sub in self._subscribers)
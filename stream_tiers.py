@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from stream_hub import BroadcastHub, Subscription
+
+
+@dataclass
+class StreamTier:
+    """Livello dello stream MJPEG: qualita' JPEG e scala rispetto al frame elaborato."""
+
+    name: str
+    quality: Optional[int] = None
+    scale: float = 1.0
+
+
+DEFAULT_TIERS: Tuple[StreamTier, ...] = (
+    StreamTier("high", quality=85, scale=1.0),
+    StreamTier("medium", quality=70, scale=0.75),
+    StreamTier("low", quality=50, scale=0.5),
+)
+
+
+def parse_tiers(items: Optional[Iterable[Dict[str, Any]]]) -> List[StreamTier]:
+    """Livelli da config, dal migliore al peggiore. Lista vuota -> DEFAULT_TIERS."""
+    tiers = []
+    for item in items or []:
+        name = str(item.get("name", "")).strip()
+        if not name:
+            continue
+        quality = item.get("quality")
+        tiers.append(
+            StreamTier(
+                name=name,
+                quality=min(max(int(quality), 1), 100) if quality is not None else None,
+                scale=min(max(float(item.get("scale", 1.0)), 0.1), 1.0),
+            )
+        )
+    return tiers or list(DEFAULT_TIERS)
+
+
+class TieredHub:
+    """
+    Un BroadcastHub per ogni livello dello stream. La pipeline codifica il
+    frame una volta per livello, solo per i livelli con almeno un client;
+    i client passano da un livello all'altro cambiando sottoscrizione.
+    """
+
+    def __init__(self, tiers: Iterable[StreamTier], maxlen: int = 2, hubs: Optional[Dict[str, BroadcastHub]] = None):
+        self.tiers: List[StreamTier] = list(tiers) or list(DEFAULT_TIERS)
+        hubs = hubs or {}
+        self.hubs: Dict[str, BroadcastHub] = {
+            tier.name: hubs.get(tier.name) or BroadcastHub(maxlen=maxlen) for tier in self.tiers
+        }
+        self.switches = 0
+
+    @classmethod
+    def single(cls, hub: BroadcastHub) -> "TieredHub":
+        """Un solo livello su un hub esistente, con la qualita' di default di cv2."""
+        return cls([StreamTier("default")], hubs={"default": hub})
+
+    def index(self, name: Optional[str]) -> Optional[int]:
+        for index, tier in enumerate(self.tiers):
+            if tier.name == name:
+                return index
+        return None
+
+    def active(self) -> List[Tuple[StreamTier, BroadcastHub]]:
+        """Livelli con almeno un client: gli unici da codificare."""
+        return [(tier, self.hubs[tier.name]) for tier in self.tiers if self.hubs[tier.name].subscriber_count > 0]
+
+    def subscribe(self, name: Optional[str] = None, replay_latest: bool = True) -> Subscription:
+        index = self.index(name)
+        tier = self.tiers[index if index is not None else 0]
+        return self.hubs[tier.name].subscribe(replay_latest=replay_latest)
+
+    def publish(self, item: Any) -> int:
+        """Stesso elemento su tutti i livelli (es. frame di cortesia)."""
+        return sum(hub.publish(item) for hub in self.hubs.values())
+
+    def counts(self) -> Dict[str, int]:
+        return {name: hub.subscriber_count for name, hub in self.hubs.items()}
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(hub.subscriber_count for hub in self.hubs.values())
+
+    @property
+    def dropped_total(self) -> int:
+        return sum(hub.dropped_total for hub in self.hubs.values())
+
+
+class AdaptiveSubscription:
+    """
+    Client /stream che cambia livello in base a quanto velocemente svuota
+    la propria coda. A ogni finestra di `window` secondi si confrontano i
+    frame scartati con quelli consegnati: oltre `downgrade_ratio` si scende
+    di un livello; dopo `upgrade_after` finestre senza scarti si prova a
+    salire. Un tentativo di salita fallito raddoppia l'attesa per il
+    successivo, cosi' un client al limite non oscilla tra due livelli.
+    """
+
+    def __init__(
+        self,
+        hub: TieredHub,
+        tier: Optional[str] = None,
+        adaptive: bool = True,
+        window: float = 2.0,
+        downgrade_ratio: float = 0.25,
+        upgrade_after: int = 3,
+        max_backoff: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.hub = hub
+        self.adaptive = adaptive
+        self.window = max(float(window), 0.1)
+        self.downgrade_ratio = float(downgrade_ratio)
+        self.upgrade_after = max(int(upgrade_after), 1)
+        self.max_backoff = max(int(max_backoff), 1)
+        self.clock = clock
+
+        index = hub.index(tier)
+        self.level = index if index is not None else 0
+        self.switches = 0
+        self.closed = False
+
+        self._subscription = hub.subscribe(self.tier.name)
+        self._window_start = clock()
+        self._delivered = 0
+        self._dropped = 0
+        self._clean_windows = 0
+        self._backoff = 1
+        # Vero nella prima finestra dopo una salita di livello.
+        self._probation = False
+
+    @property
+    def tier(self) -> StreamTier:
+        return self.hub.tiers[self.level]
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        item = self._subscription.get(timeout)
+        if self.adaptive and len(self.hub.tiers) > 1:
+            now = self.clock()
+            if now - self._window_start >= self.window:
+                self._evaluate()
+                self._window_start = now
+        return item
+
+    def close(self) -> None:
+        self.closed = True
+        self._subscription.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tier": self.tier.name,
+            "adaptive": self.adaptive,
+            "switches": self.switches,
+            "pending": self._subscription.pending(),
+        }
+
+    def __enter__(self) -> "AdaptiveSubscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _evaluate(self) -> None:
+        subscription = self._subscription
+        delivered = subscription.delivered - self._delivered
+        dropped = subscription.dropped - self._dropped
+        self._delivered = subscription.delivered
+        self._dropped = subscription.dropped
+        total = delivered + dropped
+        if total == 0:
+            # Nessun frame pubblicato nella finestra: niente da valutare.
+            return
+
+        if dropped / total > self.downgrade_ratio:
+            self._clean_windows = 0
+            if self._probation:
+                # La salita appena tentata non regge: si aspetta di piu' la prossima volta.
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+            self._probation = False
+            if self.level < len(self.hub.tiers) - 1:
+                self._switch(self.level + 1)
+            return
+
+        self._probation = False
+        if dropped == 0:
+            self._clean_windows += 1
+            if self.level > 0 and self._clean_windows >= self.upgrade_after * self._backoff:
+                self._clean_windows = 0
+                self._probation = True
+                self._switch(self.level - 1)
+        else:
+            self._clean_windows = 0
+
+    def _switch(self, level: int) -> None:
+        # Prima la nuova sottoscrizione, poi la chiusura: il nuovo livello
+        # riceve subito l'ultimo frame e il client non resta senza immagini.
+        subscription = self.hub.subscribe(self.hub.tiers[level].name)
+        previous = self._subscription
+        self._subscription = subscription
+        previous.close()
+        self.level = level
+        self.switches += 1
+        self.hub.switches += 1
+        self._delivered = 0
+        self._dropped = 0
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Campi numerici del pacchetto di stato del Tello (porta 8890).
+TELEMETRY_FIELDS: Tuple[str, ...] = (
+    "bat",
+    "h",
+    "tof",
+    "baro",
+    "pitch",
+    "roll",
+    "yaw",
+    "vgx",
+    "vgy",
+    "vgz",
+    "templ",
+    "temph",
+    "agx",
+    "agy",
+    "agz",
+    "time",
+)
+
+
+class TelemetryRing:
+    """
+    Ring buffer numpy a dimensione fissa: una riga per campione, colonna 0
+    il timestamp e poi i campi di TELEMETRY_FIELDS (NaN se mancanti).
+    Le letture per finestra temporale cercano gli estremi con searchsorted
+    sui due tratti contigui del ring e copiano solo le righe richieste.
+    """
+
+    def __init__(self, capacity: int = 6000, fields: Tuple[str, ...] = TELEMETRY_FIELDS):
+        self.capacity = max(int(capacity), 1)
+        self.fields = tuple(fields)
+        self.appended = 0
+
+        self._data = np.full((self.capacity, len(self.fields) + 1), np.nan, dtype=np.float64)
+        self._index = {name: column + 1 for column, name in enumerate(self.fields)}
+        self._head = 0
+        self._count = 0
+        self._last_timestamp = -math.inf
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, state: Dict[str, Any]) -> None:
+        row = np.full(len(self.fields) + 1, np.nan)
+        for name, value in state.items():
+            column = self._index.get(name)
+            if column is not None and isinstance(value, (int, float)):
+                row[column] = value
+        with self._lock:
+            # Timestamp non decrescenti: searchsorted richiede tratti ordinati.
+            timestamp = max(float(timestamp), self._last_timestamp)
+            row[0] = timestamp
+            self._data[self._head] = row
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._last_timestamp = timestamp
+            self.appended += 1
+
+    def latest(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(numero di campioni aggiunti, ultimo campione come dict o None)."""
+        with self._lock:
+            if self._count == 0:
+                return self.appended, None
+            row = self._data[(self._head - 1) % self.capacity].copy()
+            appended = self.appended
+        return appended, self._row_dict(row)
+
+    def window(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Righe con since <= timestamp <= until, in ordine cronologico.
+        Con max_points si prende un campione ogni N prima della copia.
+        """
+        with self._lock:
+            if self._count == 0:
+                return np.empty((0, len(self.fields) + 1))
+            if self._count < self.capacity:
+                segments = [(0, self._count)]
+            else:
+                segments = [(self._head, self.capacity), (0, self._head)]
+
+            parts: List[np.ndarray] = []
+            for start, end in segments:
+                timestamps = self._data[start:end, 0]
+                low = start + (int(np.searchsorted(timestamps, since, "left")) if since is not None else 0)
+                high = start + (int(np.searchsorted(timestamps, until, "right")) if until is not None else end - start)
+                if high > low:
+                    parts.append(self._data[low:high])
+
+            total = sum(len(part) for part in parts)
+            step = max(math.ceil(total / max_points), 1) if max_points else 1
+            selected = []
+            offset = 0
+            for part in parts:
+                # Passo uniforme anche a cavallo dei due tratti.
+                selected.append(part[(-offset) % step :: step])
+                offset += len(part)
+            if not selected:
+                return np.empty((0, len(self.fields) + 1))
+            return np.concatenate(selected) if len(selected) > 1 else selected[0].copy()
+
+    def history(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Finestra in formato colonnare per JSON (NaN -> None)."""
+        rows = self.window(since, until, max_points)
+        columns = {}
+        for name, column in self._index.items():
+            values = rows[:, column]
+            if np.isnan(values).all():
+                continue
+            columns[name] = [None if math.isnan(value) else value for value in values.tolist()]
+        return {"count": len(rows), "timestamps": rows[:, 0].tolist(), "fields": columns}
+
+    def _row_dict(self, row: np.ndarray) -> Dict[str, Any]:
+        sample: Dict[str, Any] = {"timestamp": float(row[0])}
+        for name, column in self._index.items():
+            value = float(row[column])
+            if not math.isnan(value):
+                sample[name] = value
+        return sample
+
+
+class TelemetryCollector:
+    """
+    Thread che legge lo stato del drone a `sample_rate` Hz e lo accoda nel
+    ring. djitellopy riceve i pacchetti di stato in background e
+    get_current_state() ritorna l'ultimo senza comandi SDK; il MockTello
+    ritorna lo stesso formato. Finche' il drone non e' connesso il thread
+    attende, senza forzare la connessione.
+    """
+
+    def __init__(
+        self,
+        client_provider: Callable[[], Any],
+        ring: TelemetryRing,
+        sample_rate: float = 10.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.client_provider = client_provider
+        self.ring = ring
+        self.interval = 1.0 / max(float(sample_rate), 0.1)
+        self.clock = clock
+        self.samples = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.listeners: List[Callable[[float, Dict[str, Any]], None]] = []
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def add_listener(self, callback: Callable[[float, Dict[str, Any]], None]) -> None:
+        """Callback (timestamp, stato) per ogni campione nuovo, sul thread di telemetria."""
+        self.listeners.append(callback)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        previous = None
+        while not self._stop.wait(self.interval):
+            client = self.client_provider()
+            if client is None:
+                continue
+            try:
+                state = client.get_current_state()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                continue
+            # djitellopy sostituisce il dict a ogni pacchetto: stesso oggetto = nessun dato nuovo.
+            if not state or state is previous:
+                continue
+            previous = state
+            timestamp = self.clock()
+            self.ring.append(timestamp, state)
+            self.samples += 1
+            for callback in self.listeners:
+                try:
+                    callback(timestamp, state)
+                except Exception:
+                    continue
+
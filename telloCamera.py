@@ -1,20 +1,42 @@
 from djitellopy import tello
 import cv2
 
-me = tello.Tello()
-me.connect()
-print(me.get_battery())
+from config_loader import config
+from frame_source import create_frame_source
 
-me.streamon()
+
+def connect_tello():
+    me = tello.Tello()
+    me.connect()
+    print(me.get_battery())
+    me.streamon()
+    return me
+
+
+client = None
+
+
+def get_client():
+    global client
+    if client is None:
+        client = connect_tello()
+    return client
+
+
+# La sorgente (drone, file o sintetica) si sceglie in config.yaml -> video.source
+source = create_frame_source(config, get_client)
+feed = source.start()
+last_seq = 0
 
 while True:
-    frame_read = me.get_frame_read()
-    img = frame_read.frame
-    img = cv2.resize(img, (360, 240))
-    cv2.imshow("Tello Camera", img)
+    packet = feed.wait_next(last_seq, timeout=1.0)
+    if packet is not None:
+        last_seq = packet.seq
+        img = cv2.resize(packet.frame, (360, 240))
+        cv2.imshow("Tello Camera", img)
 
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
 cv2.destroyAllWindows()
-me.streamoff()
\ No newline at end of file
+source.stop()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+
+SpriteKey = Tuple[str, int, float, Tuple[int, int, int], int]
+
+
+@dataclass
+class TextSprite:
+    """
+    Etichetta gia' renderizzata: colore premoltiplicato per l'alpha e alpha
+    inverso, entrambi su 0..255 in uint16, pronti per la fusione col frame.
+    (dx, dy) e' la posizione dell'angolo in alto a sinistra rispetto
+    all'origine di cv2.putText (inizio della baseline).
+    """
+
+    premultiplied: np.ndarray
+    inverse_alpha: np.ndarray
+    dx: int
+    dy: int
+
+
+def render_sprite(text: str, font: int, scale: float, color: Tuple[int, int, int], thickness: int) -> TextSprite:
+    """Renderizza il testo (anti-aliasing come cv2.LINE_AA) in una maschera alpha."""
+    (width, height), baseline = cv2.getTextSize(text, font, scale, thickness)
+    pad = thickness + 1
+    mask = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+    cv2.putText(mask, text, (pad, pad + height), font, scale, 255, thickness, cv2.LINE_AA)
+
+    alpha = mask.astype(np.uint16)[:, :, None]
+    premultiplied = alpha * np.array(color, dtype=np.uint16)
+    return TextSprite(premultiplied=premultiplied, inverse_alpha=255 - alpha, dx=-pad, dy=-(pad + height))
+
+
+class TextSpriteCache:
+    """
+    Cache LRU delle etichette di testo per (testo, font, scala, colore,
+    spessore). Le stesse scritte tornano su molti frame consecutivi: il
+    rendering anti-aliased avviene una volta sola, poi ogni frame fa solo
+    una fusione alpha sulla piccola area dell'etichetta.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max(int(max_entries), 1)
+        self.hits = 0
+        self.misses = 0
+        self._sprites: "OrderedDict[SpriteKey, TextSprite]" = OrderedDict()
+
+    def get(self, text: str, font: int, scale: float, color: Tuple[int, int, int], thickness: int) -> TextSprite:
+        key = (text, int(font), float(scale), tuple(int(c) for c in color), int(thickness))
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = render_sprite(*key)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_entries:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def draw(
+        self,
+        frame: np.ndarray,
+        text: str,
+        origin: Tuple[int, int],
+        font: int,
+        scale: float,
+        color: Tuple[int, int, int],
+        thickness: int = 1,
+    ) -> None:
+        """Equivalente di cv2.putText(..., cv2.LINE_AA) con il testo in cache."""
+        if not text:
+            return
+        sprite = self.get(text, font, scale, color, thickness)
+        sprite_height, sprite_width = sprite.inverse_alpha.shape[:2]
+        frame_height, frame_width = frame.shape[:2]
+
+        x0 = int(origin[0]) + sprite.dx
+        y0 = int(origin[1]) + sprite.dy
+        # Ritaglio dell'etichetta ai bordi del frame.
+        left, top = max(-x0, 0), max(-y0, 0)
+        right = min(sprite_width, frame_width - x0)
+        bottom = min(sprite_height, frame_height - y0)
+        if right <= left or bottom <= top:
+            return
+
+        region = frame[y0 + top : y0 + bottom, x0 + left : x0 + right]
+        inverse = sprite.inverse_alpha[top:bottom, left:right]
+        premultiplied = sprite.premultiplied[top:bottom, left:right]
+        # (frame * (255 - a) + colore * a) / 255, arrotondato: resta entro uint16.
+        blended = region * inverse
+        blended += premultiplied
+        blended += 127
+        blended //= 255
+        region[:] = blended
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._sprites), "hits": self.hits, "misses": self.misses}
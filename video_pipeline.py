@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from frame_source import FrameFeed, FramePacket
+from image_processor import ImageProcessor, ProcessResult
+from stream_hub import BroadcastHub
+from stream_tiers import TieredHub
+
+
+def mjpeg_part(jpeg_bytes: bytes) -> bytes:
+    """Incapsula un JPEG come parte dello stream multipart/x-mixed-replace."""
+    return b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg_bytes + b"\r\n"
+
+
+class VideoPipeline:
+    """
+    Thread unico di acquisizione -> elaborazione -> encode JPEG.
+    Ogni frame viene elaborato una sola volta e codificato una volta per
+    ciascun livello (qualita'/risoluzione) che ha almeno un client MJPEG.
+    """
+
+    def __init__(
+        self,
+        processor: ImageProcessor,
+        feed_factory: Callable[[], FrameFeed],
+        frame_size: Tuple[int, int],
+        target_fps: float,
+        hub: Optional[Union[BroadcastHub, TieredHub]] = None,
+        restart_stream: Optional[Callable[[], Any]] = None,
+        stall_timeout: float = 5.0,
+    ):
+        self.processor = processor
+        self.feed_factory = feed_factory
+        self.frame_size = frame_size
+        self.target_fps = max(float(target_fps), 1.0)
+        # Un BroadcastHub semplice diventa un unico livello a qualita' di default.
+        self.hub = hub if isinstance(hub, TieredHub) else TieredHub.single(hub or BroadcastHub())
+        self.restart_stream = restart_stream
+        self.stall_timeout = float(stall_timeout)
+        self.listeners: List[Callable[[ProcessResult], None]] = []
+        # Consumatori del frame grezzo e di quello elaborato (es. registrazione).
+        self.taps: List[Callable[[FramePacket, ProcessResult], None]] = []
+        # Callback opzionale (stage, secondi) per misurare le fasi della pipeline.
+        self.stage_hook: Optional[Callable[[str, float], None]] = None
+        self.fps = 0.0
+        # Frame decodificati ma mai elaborati (pipeline piu' lenta del decoder).
+        self.skipped_frames = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, callback: Callable[[ProcessResult], None]) -> None:
+        """Registra una callback invocata su ogni frame elaborato."""
+        self.listeners.append(callback)
+
+    def add_tap(self, callback: Callable[[FramePacket, ProcessResult], None]) -> None:
+        """
+        Registra una callback (pacchetto grezzo, risultato) invocata prima
+        dell'overlay FPS e dell'encode. Deve ritornare subito: gira sul
+        thread della pipeline e il frame elaborato va copiato se conservato.
+        """
+        self.taps.append(callback)
+
+    def start(self) -> None:
+        """Avvia il thread della pipeline (idempotente)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="video-pipeline", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def _notify(self, result: ProcessResult) -> None:
+        for callback in self.listeners:
+            try:
+                callback(result)
+            except Exception:
+                # Un listener difettoso non deve fermare lo stream.
+                continue
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._stream_frames(self.feed_factory())
+            except Exception:
+                self._publish_fallback()
+                self._restart_stream()
+
+    def _stream_frames(self, feed: FrameFeed) -> None:
+        min_interval = 1.0 / self.target_fps
+        last_sent = time.perf_counter()
+        last_seq = 0
+        last_frame_at = time.monotonic()
+
+        hook = self.stage_hook
+        clock = time.perf_counter
+
+        while not self._stop.is_set():
+            # Si elaborano solo frame nuovi: in attesa sulla condition del feed.
+            started = clock()
+            packet = feed.wait_next(last_seq, timeout=0.5)
+            if hook is not None:
+                hook("capture", clock() - started)
+            if packet is None:
+                if feed.closed:
+                    raise RuntimeError("Sorgente video chiusa")
+                if time.monotonic() - last_frame_at > self.stall_timeout:
+                    raise TimeoutError("Nessun frame nuovo dal decoder")
+                continue
+
+            if last_seq:
+                self.skipped_frames += max(packet.seq - last_seq - 1, 0)
+            last_seq = packet.seq
+            last_frame_at = time.monotonic()
+
+            # Tutte le elaborazioni del frame sono nel processor.
+            started = clock()
+            result = self.processor.process_frame(packet.frame, size=self.frame_size, timestamp=packet.timestamp)
+            if hook is not None:
+                hook("process", clock() - started)
+            if result.frame is None:
+                continue
+
+            self._notify(result)
+            for tap in self.taps:
+                try:
+                    tap(packet, result)
+                except Exception:
+                    continue
+
+            # Calcolo FPS sulla frequenza reale di pubblicazione.
+            now = time.perf_counter()
+            delta = now - last_sent
+            if delta < min_interval:
+                self._stop.wait(min_interval - delta)
+                now = time.perf_counter()
+                delta = now - last_sent
+
+            self.fps = (0.9 * self.fps) + (0.1 * (1.0 / max(delta, 1e-6)))
+            last_sent = now
+
+            # Solo i livelli con almeno un client vengono codificati.
+            tiers = self.hub.active()
+            if not tiers:
+                continue
+
+            # Overlay FPS (unico overlay fuori dal processor).
+            cv2.putText(
+                result.frame,
+                f"FPS {int(self.fps)}",
+                (12, 22),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (52, 211, 153),
+                2,
+                cv2.LINE_AA,
+            )
+
+            for tier, hub in tiers:
+                started = clock()
+                frame = result.frame
+                if tier.scale < 1.0:
+                    height, width = frame.shape[:2]
+                    size = (max(int(width * tier.scale), 1), max(int(height * tier.scale), 1))
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                params = [cv2.IMWRITE_JPEG_QUALITY, tier.quality] if tier.quality is not None else []
+                ok, buffer = cv2.imencode(".jpg", frame, params)
+                if hook is not None:
+                    hook("encode", clock() - started)
+                if not ok:
+                    continue
+
+                started = clock()
+                hub.publish(mjpeg_part(buffer.tobytes()))
+                if hook is not None:
+                    hook("publish", clock() - started)
+            if hook is not None:
+                hook("frame_age", time.time() - packet.timestamp)
+
+    def _publish_fallback(self) -> None:
+        """Frame di cortesia mentre lo stream non e' disponibile."""
+        width, height = self.frame_size
+        fallback = np.zeros((height, width, 3), dtype=np.uint8)
+        cv2.putText(
+            fallback,
+            "Stream non disponibile",
+            (20, 40),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            (0, 255, 0),
+            2,
+            cv2.LINE_AA,
+        )
+        ok, buffer = cv2.imencode(".jpg", fallback)
+        if ok:
+            self.hub.publish(mjpeg_part(buffer.tobytes()))
+
+    def _restart_stream(self) -> None:
+        if self.restart_stream is not None:
+            try:
+                self.restart_stream()
+            except Exception:
+                pass
+        self._stop.wait(0.5)